@@ -1,15 +1,45 @@
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi import FastAPI, Request, Form, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import os
+import time
 import pandas as pd
 import json
 import uvicorn
-from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+from typing import List
+from pydantic import BaseModel, Field
+from FraudGuard.pipeline.model_registry import model_registry
+from FraudGuard.pipeline.batching import MicroBatcher
+from FraudGuard.config.config import ConfigurationManager
+from FraudGuard.utils.logging import start_async_logging, stop_async_logging
+from FraudGuard.utils.telemetry import REGISTRY, INFERENCE_LATENCY, PREDICTIONS, SampledLogger
+from FraudGuard import logger
 
 app = FastAPI()
 
+MAX_BATCH_ROWS = 50000
+# Per-request details are logged at info level for one request in this many
+REQUEST_LOG_EVERY = 100
+request_log = SampledLogger(logger, every=REQUEST_LOG_EVERY)
+
+
+class Transaction(BaseModel):
+    Transaction_Type: str
+    Device_Used: str
+    Location: str
+    Payment_Method: str
+    Transaction_Amount: float
+    Time_of_Transaction: float
+    Previous_Fraudulent_Transactions: int
+    Account_Age: int
+    Number_of_Transactions_Last_24H: int
+
+
+class BatchPredictionRequest(BaseModel):
+    transactions: List[Transaction] = Field(..., max_length=MAX_BATCH_ROWS)
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
 template_dir = os.path.join(current_dir, 'templates')
 templates = Jinja2Templates(directory=template_dir)
@@ -18,10 +48,39 @@ static_dir = os.path.join(current_dir, 'static')
 if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
+serving_config = ConfigurationManager().get_serving_config()
+batcher = MicroBatcher(
+    score_fn=lambda records: model_registry.get().predict_records(records),
+    max_batch_size=serving_config.max_batch_size,
+    max_wait_ms=serving_config.max_wait_ms,
+    workers=serving_config.batch_workers
+)
+
+@app.on_event("startup")
+async def load_model():
+    """Load the model artifacts once per worker so requests are served from memory."""
+    start_async_logging()
+    try:
+        model_registry.get()
+    except Exception as e:
+        logger.error(f"Model artifacts could not be loaded at startup: {e}")
+    await batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+    stop_async_logging()
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Docker health monitoring"""
-    return {"status": "healthy", "service": "FraudGuard API"}
+    info = model_registry.info()
+    if not info["loaded"]:
+        return JSONResponse(
+            content={"status": "unhealthy", "service": "FraudGuard API", "model": info},
+            status_code=503
+        )
+    return {"status": "healthy", "service": "FraudGuard API", "model": info}
 
 @app.get("/api/placeholder/{width}/{height}")
 async def placeholder_image(width: int, height: int):
@@ -44,6 +103,8 @@ async def predict(
     Account_Age: int = Form(...),
     Number_of_Transactions_Last_24H: int = Form(...)
 ):
+    # Form parsing and validation run before this handler, so timing starts at the record
+    start = time.perf_counter()
     try:
         data = {
             "Transaction_Type": Transaction_Type,
@@ -57,48 +118,84 @@ async def predict(
             "Number_of_Transactions_Last_24H": Number_of_Transactions_Last_24H
         }
 
-        input_df = pd.DataFrame({
-            'Transaction_Type': [Transaction_Type],
-            'Device_Used': [Device_Used],
-            'Location': [Location],
-            'Payment_Method': [Payment_Method],
-            'Transaction_Amount': [Transaction_Amount],
-            'Time_of_Transaction': [Time_of_Transaction],
-            'Previous_Fraudulent_Transactions': [Previous_Fraudulent_Transactions],
-            'Account_Age': [Account_Age],
-            'Number_of_Transactions_Last_24H': [Number_of_Transactions_Last_24H]
-        })
-
-        print(f"Input DataFrame columns: {input_df.columns.tolist()}")
-        print(f"Input DataFrame values: {input_df.iloc[0].tolist()}")
-
-        pipeline = PredictionPipeline()
-        result = pipeline.predict(input_df)
+        # Queue wait plus the micro-batch this record was scored in, as this caller sees it
+        with INFERENCE_LATENCY.time(endpoint="predict", stage="score"):
+            result = await batcher.submit(data)
         
         fraud_status = result['fraud_status']
         fraud_probability = result['fraud_probability']
         threshold_used = result.get('threshold_used', 0.25)
         confidence = result.get('confidence', 'Medium')
-        
-        print(f"Prediction result: {fraud_status}")
-        print(f"Fraud probability: {fraud_probability:.4f}")
-        print(f"Threshold used: {threshold_used}")
-        print(f"Confidence: {confidence}")
+
+        request_log.info(
+            "Prediction result: %s, probability %.4f, threshold %s, confidence %s",
+            fraud_status, fraud_probability, threshold_used, confidence
+        )
 
         encoded_data = json.dumps(data)
-        
+        INFERENCE_LATENCY.observe(time.perf_counter() - start, endpoint="predict", stage="total")
 
         return JSONResponse(content={
             "redirect": f"/results?fraud_status={fraud_status}&fraud_probability={fraud_probability}&threshold_used={threshold_used}&confidence={confidence}&data={encoded_data}"
         })
 
     except Exception as e:
-        import traceback
-        print(f"Error in prediction endpoint: {str(e)}")
-        print(traceback.format_exc())
+        PREDICTIONS.inc(endpoint="predict", outcome="error")
+        logger.exception(f"Error in prediction endpoint: {str(e)}")
         return JSONResponse(content={"error": f"Error during prediction: {str(e)}"}, status_code=500)
     
 
+@app.get("/metrics")
+async def metrics():
+    """Inference latency histograms and prediction counters in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
+
+@app.get("/metrics/batcher")
+async def batcher_metrics():
+    """Queue depth, batch size and wait-time statistics of the /predict micro-batcher."""
+    return batcher.stats()
+
+
+@app.get("/metrics/drift")
+async def drift_metrics():
+    """PSI, out-of-range and unknown-category statistics of the inputs served so far."""
+    try:
+        monitor = model_registry.get().monitor
+    except Exception as e:
+        logger.error(f"Model artifacts could not be loaded for drift metrics: {e}")
+        return JSONResponse(content={"error": f"Model not loaded: {str(e)}"}, status_code=503)
+    if monitor is None:
+        return JSONResponse(content={"error": "No reference profile available"}, status_code=404)
+    return monitor.snapshot()
+
+
+@app.post("/predict/batch")
+async def predict_batch(
+    payload: BatchPredictionRequest,
+    explain: bool = False,
+    top_k: int = Query(None, ge=1, le=50)
+):
+    """Score many transactions in one preprocessing pass and one model call.
+
+    With explain=true every prediction also carries its top_k feature contributions.
+    """
+    start = time.perf_counter()
+    try:
+        with INFERENCE_LATENCY.time(endpoint="batch", stage="parse"):
+            input_df = pd.DataFrame([transaction.model_dump() for transaction in payload.transactions])
+        pipeline = model_registry.get()
+        top_k = (top_k or serving_config.explain_top_k) if explain else 0
+        # Scoring up to MAX_BATCH_ROWS rows is CPU-bound; keep it off the event loop the micro-batcher runs on
+        results = await run_in_threadpool(pipeline.predict_batch, input_df, top_k=top_k)
+        INFERENCE_LATENCY.observe(time.perf_counter() - start, endpoint="batch", stage="total")
+        return JSONResponse(content={"count": len(results), "predictions": results})
+    except Exception as e:
+        PREDICTIONS.inc(endpoint="batch", outcome="error")
+        logger.error(f"Error in batch prediction endpoint: {str(e)}")
+        return JSONResponse(content={"error": f"Error during batch prediction: {str(e)}"}, status_code=500)
+
+
 @app.get("/results")
 async def show_results(
     request: Request, 
@@ -110,18 +207,11 @@ async def show_results(
 ):
     try:
         if fraud_status is None or fraud_probability is None or data is None:
-            print("Missing required parameters for results page")
+            logger.warning("Missing required parameters for results page")
             return RedirectResponse(url="/")
 
-        print(f"Received fraud_status: {fraud_status}")
-        print(f"Received fraud_probability: {fraud_probability}")
-        print(f"Received threshold_used: {threshold_used}")
-        print(f"Received confidence: {confidence}")
-        
         input_data = json.loads(data)
         
-        print(f"Parsed input_data: {input_data}")
-        
         return templates.TemplateResponse("result.html", {
             "request": request,
             "fraud_status": fraud_status,
@@ -131,9 +221,7 @@ async def show_results(
             "transaction_data": input_data
         })
     except Exception as e:
-        import traceback
-        print(f"Error in results handler: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception(f"Error in results handler: {str(e)}")
         return RedirectResponse(url="/")
 
 if __name__ == "__main__":
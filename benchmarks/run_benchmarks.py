@@ -0,0 +1,313 @@
+"""Offline benchmarks of the training and inference hot paths.
+
+Everything runs in a scratch workspace on synthetic data generated from
+config_file/schema.yaml, with no network access:
+
+    python -m benchmarks.run_benchmarks --output benchmarks/results.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/results.json --tolerance 0.25
+
+With --baseline, the run exits with status 1 if any result is worse than
+the baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+from pathlib import Path
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from FraudGuard import logger
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_TOLERANCE = 0.25
+BATCH_SIZES = (1, 100, 10000)
+# Fixed hyperparameters, so the HPO-trial timing is comparable between runs
+HPO_TRIAL_PARAMS = {"max_depth": 6, "learning_rate": 0.1}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class BenchmarkResults:
+    """Named measurements with their unit and whether lower or higher is better."""
+
+    def __init__(self):
+        self.results = {}
+
+    def record(self, name: str, value: float, unit: str, better: str = "lower"):
+        self.results[name] = {"value": float(value), "unit": unit, "better": better}
+        logger.info(f"Benchmark {name}: {value:.6g} {unit}")
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start, "s")
+
+    def record_latencies(self, prefix: str, seconds: list):
+        for percentile in (50, 95, 99):
+            self.record(f"{prefix}_p{percentile}_ms", np.percentile(seconds, percentile) * 1000, "ms")
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Results in both runs that are worse than the baseline by more than tolerance (a fraction)."""
+    regressions = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = (result["value"] - previous["value"]) / abs(previous["value"])
+        worse = change > tolerance if result["better"] == "lower" else change < -tolerance
+        if worse:
+            regressions.append({
+                "name": name,
+                "baseline": previous["value"],
+                "current": result["value"],
+                "unit": result["unit"],
+                "change": change,
+            })
+    return regressions
+
+
+def prepare_workspace(root: Path, n_rows: int, seed: int):
+    """Copy the configs into root, make them offline-friendly and write the synthetic raw data."""
+    from FraudGuard.utils.helpers import read_yaml
+    from benchmarks.synthetic import make_synthetic_transactions
+    import yaml
+
+    shutil.copytree(REPO_ROOT / "config_file", root / "config_file")
+    params_path = root / "config_file" / "params.yaml"
+    params = yaml.safe_load(params_path.read_text())
+    params["rebalance"]["strategy"] = "smote_tomek"
+    params["rebalance"]["trace_memory"] = True
+    params["train_test_split"]["streaming"] = False
+    params["hpo"].update({"storage": "", "n_workers": 1})
+    params["cross_validation"]["cv_folds"] = 3
+    params_path.write_text(yaml.safe_dump(params))
+
+    schema = read_yaml(root / "config_file" / "schema.yaml")
+    data_path = root / "artifacts" / "ingestion" / "Fraud-data.csv"
+    data_path.parent.mkdir(parents=True)
+    make_synthetic_transactions(schema, n_rows, seed=seed).to_csv(data_path, index=False)
+    return schema
+
+
+def bench_preprocess(results: BenchmarkResults):
+    from FraudGuard.config.config import ConfigurationManager
+    from FraudGuard.components.preprocess import Transform
+
+    transform = Transform(ConfigurationManager().get_data_transformation_config())
+    with results.timer("preprocess_seconds"):
+        train, test = transform.train_test_splitting()
+        transform.preprocess_features(train, test)
+
+    report = json.loads((Path(transform.config.root_dir) / "rebalance_report.json").read_text())["smote_tomek"]
+    results.record("smote_tomek_seconds", report["seconds"], "s")
+    results.record("smote_tomek_peak_memory_mb", report["peak_memory_mb"], "MB")
+
+
+def bench_hpo_trial(results: BenchmarkResults):
+    import optuna
+    from FraudGuard.config.config import ConfigurationManager
+    from FraudGuard.components.training import build_cv_folds, cross_validate_trial, load_training_data
+
+    config = ConfigurationManager().get_model_training_config()
+    train_x, train_y = load_training_data(config.train_preprocess)
+    folds = build_cv_folds("XGBoost", train_x, train_y, config)
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.create_study(direction="maximize")
+    study.enqueue_trial(HPO_TRIAL_PARAMS)
+    trial = study.ask()
+    with results.timer("hpo_trial_seconds"):
+        cross_validate_trial(trial, "XGBoost", folds, config, n_threads=os.cpu_count())
+
+
+def train_serving_artifacts():
+    """A fixed-size model with its compiled export, threshold and serving bundle."""
+    from xgboost import XGBClassifier
+    from FraudGuard.utils.helpers import save_bin, save_json
+    from FraudGuard.utils.metrics import find_optimal_threshold
+    from FraudGuard.components.training import load_training_data
+    from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+    from FraudGuard.pipeline.serving_bundle import build_serving_bundle
+
+    train_x, train_y = load_training_data("artifacts/transform/process/train_processed.npy")
+    test_x, test_y = load_training_data("artifacts/transform/process/test_processed.npy")
+    model = XGBClassifier(n_estimators=200, verbosity=0, **HPO_TRIAL_PARAMS).fit(train_x, train_y)
+
+    trainer_dir = Path("artifacts/trainer")
+    trainer_dir.mkdir(parents=True, exist_ok=True)
+    save_bin(data=model, path=trainer_dir / "model.joblib")
+    CompiledTreeEnsemble.from_model(model).save(trainer_dir / "compiled_model.npz")
+    save_json(
+        path=trainer_dir / "optimal_threshold.json",
+        data=find_optimal_threshold(test_y, model.predict_proba(test_x)[:, 1]),
+    )
+    build_serving_bundle()
+
+
+def bench_evaluation(results: BenchmarkResults):
+    """Offline metrics (without MLflow logging) and the serving-path replay of the holdout."""
+    import joblib
+    from FraudGuard.config.config import ConfigurationManager
+    from FraudGuard.utils.helpers import load_json
+    from FraudGuard.utils.metrics import evaluate_scores
+    from FraudGuard.components.evaluation import Evaluation, replay_holdout
+
+    config = ConfigurationManager().get_model_evaluation_config()
+    with results.timer("evaluation_seconds"):
+        manifest = load_json(Path(config.manifest_path))
+        test_data = np.load(config.test_preprocess, mmap_mode="r")
+        target_index = manifest["columns"].index(config.target_column)
+        proba = Evaluation._score(joblib.load(config.model_path), test_data, target_index)
+        evaluate_scores(test_data[:, target_index].astype(int), proba, threshold=0.5)
+
+    replay = replay_holdout(
+        config.test_path, config.label_encoder_path, config.target_column,
+        chunk_rows=config.replay_chunk_rows, offline_proba=proba,
+    )
+    results.record("evaluation_replay_rows_per_second", replay["rows_per_second"], "rows/s", better="higher")
+
+
+def bench_batch_throughput(results: BenchmarkResults, schema: dict, seed: int):
+    from benchmarks.synthetic import make_synthetic_transactions
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+
+    pipeline = PredictionPipeline()
+    dropped = schema["data_cleaning"]["columns_to_drop"] + [schema["target_column"]["name"]]
+    frame = make_synthetic_transactions(schema, max(BATCH_SIZES), seed=seed + 1).drop(columns=dropped)
+    pipeline.predict_batch(frame.iloc[:100])
+
+    for size in BATCH_SIZES:
+        block = frame.iloc[:size]
+        repeats = max(5, min(200, 20000 // size))
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            pipeline.predict_batch(block)
+            seconds.append(time.perf_counter() - start)
+        results.record(f"batch_{size}_rows_per_second", size / np.median(seconds), "rows/s", better="higher")
+        results.record(f"batch_{size}_p50_ms", np.median(seconds) * 1000, "ms")
+
+
+def bench_predict_latency(results: BenchmarkResults, schema: dict, seed: int, n_requests: int):
+    """Single-row /predict round trips through FastAPI's TestClient, micro-batcher included."""
+    from fastapi.testclient import TestClient
+    from benchmarks.synthetic import make_synthetic_transactions
+
+    sys.path.insert(0, str(REPO_ROOT))
+    import app as app_module
+
+    dropped = schema["data_cleaning"]["columns_to_drop"] + [schema["target_column"]["name"]]
+    forms = make_synthetic_transactions(schema, n_requests, seed=seed + 2).drop(columns=dropped).to_dict(orient="records")
+    with TestClient(app_module.app) as client:
+        for form in forms[:20]:
+            client.post("/predict", data=form)
+        seconds = []
+        for form in forms:
+            start = time.perf_counter()
+            response = client.post("/predict", data=form)
+            seconds.append(time.perf_counter() - start)
+            response.raise_for_status()
+    results.record_latencies("predict_latency", seconds)
+
+
+def run_benchmarks(n_rows: int = 50000, seed: int = 0, n_requests: int = 300, workspace: Path = None) -> dict:
+    """Run every benchmark in a scratch workspace and return the results document."""
+    workspace = Path(workspace or tempfile.mkdtemp(prefix="fraudguard-bench-"))
+    workspace.mkdir(parents=True, exist_ok=True)
+    previous_cwd = os.getcwd()
+    previous_cache = os.environ.get("FRAUDGUARD_STAGE_CACHE")
+    os.environ["FRAUDGUARD_STAGE_CACHE"] = "0"
+    results = BenchmarkResults()
+    try:
+        os.chdir(workspace)
+        schema = prepare_workspace(workspace, n_rows, seed)
+        bench_preprocess(results)
+        bench_hpo_trial(results)
+        train_serving_artifacts()
+        bench_evaluation(results)
+        bench_batch_throughput(results, schema, seed)
+        bench_predict_latency(results, schema, seed, n_requests)
+        results.record("peak_rss_mb", peak_rss_mb(), "MB")
+    finally:
+        os.chdir(previous_cwd)
+        if previous_cache is None:
+            os.environ.pop("FRAUDGUARD_STAGE_CACHE", None)
+        else:
+            os.environ["FRAUDGUARD_STAGE_CACHE"] = previous_cache
+
+    return {"meta": _run_metadata(n_rows, seed, n_requests, workspace), "results": results.results}
+
+
+def _run_metadata(n_rows: int, seed: int, n_requests: int, workspace: Path) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "rows": n_rows,
+        "seed": seed,
+        "requests": n_requests,
+        "workspace": str(workspace),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000, help="synthetic raw transactions to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=300, help="timed /predict requests")
+    parser.add_argument("--output", type=Path, default=Path("benchmarks/results.json"))
+    parser.add_argument("--baseline", type=Path, help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a result counts as a regression")
+    parser.add_argument("--workspace", type=Path, help="scratch directory (default: a new temp dir)")
+    args = parser.parse_args(argv)
+
+    output = args.output.resolve()
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    document = run_benchmarks(args.rows, args.seed, args.requests, args.workspace)
+
+    regressions = []
+    if baseline is not None:
+        regressions = compare_results(document["results"], baseline["results"], args.tolerance)
+        document["comparison"] = {
+            "baseline": str(args.baseline),
+            "baseline_commit": baseline.get("meta", {}).get("commit"),
+            "tolerance": args.tolerance,
+            "regressions": regressions,
+        }
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=4))
+    logger.info(f"Benchmark results written to {output}")
+    for regression in regressions:
+        logger.error(
+            f"Regression in {regression['name']}: {regression['baseline']:.6g} -> {regression['current']:.6g} "
+            f"{regression['unit']} ({regression['change']:+.1%})"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+# Categories generated per categorical column when the schema sets no max_cardinality
+DEFAULT_CARDINALITY = 8
+# Upper bound for numeric columns without a max constraint
+DEFAULT_NUMERIC_SPAN = 100
+
+
+def make_synthetic_transactions(schema: dict, n_rows: int, fraud_rate: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """Raw transactions with the columns, dtypes and constraints declared in schema.yaml.
+
+    Categorical columns draw from "<column>_<i>" labels with a skewed
+    frequency. Numeric columns respect the schema's min/max constraints.
+    Identifier columns are unique strings or integers. The target is drawn
+    from a logistic function of the numeric columns and one category, so
+    a model has signal to learn, at roughly fraud_rate positives.
+    """
+    rng = np.random.default_rng(seed)
+    constraints = schema.get("constraints", {})
+    categorical = set(schema["categorical_columns"])
+    numeric = set(schema["numeric_columns"])
+    target = schema["target_column"]["name"]
+
+    data = {}
+    for column, dtype in schema["columns"].items():
+        if column == target:
+            continue
+        limits = constraints.get(column, {})
+        if column in categorical:
+            cardinality = min(limits.get("max_cardinality", DEFAULT_CARDINALITY), DEFAULT_CARDINALITY)
+            weights = 1.0 / np.arange(1, cardinality + 1)
+            data[column] = rng.choice([f"{column}_{i}" for i in range(cardinality)], n_rows, p=weights / weights.sum())
+        elif column in numeric:
+            low = limits.get("min", 0)
+            high = limits.get("max", low + DEFAULT_NUMERIC_SPAN)
+            if str(dtype).startswith("int"):
+                data[column] = rng.integers(low, high + 1, n_rows)
+            elif "max" in limits:
+                data[column] = rng.uniform(low, high, n_rows).round(2)
+            else:
+                # Heavy-tailed, like transaction amounts
+                data[column] = (low + rng.gamma(2.0, high / 4, n_rows)).round(2)
+        elif str(dtype) == "object":
+            data[column] = [f"{column}-{i}" for i in range(n_rows)]
+        else:
+            data[column] = rng.integers(1000, 1000 + 10 * n_rows, n_rows)
+
+    frame = pd.DataFrame(data)
+    standardized = [
+        (frame[column] - frame[column].mean()) / (frame[column].std() or 1.0) for column in sorted(numeric)
+    ]
+    risk = np.sum(standardized[:2], axis=0) if standardized else np.zeros(n_rows)
+    if categorical:
+        first = sorted(categorical)[0]
+        risk = risk + (frame[first] == f"{first}_0").to_numpy() * 0.5
+    bias = np.log(fraud_rate / (1 - fraud_rate))
+    frame[target] = (rng.random(n_rows) < 1 / (1 + np.exp(-(bias + 1.5 * risk)))).astype(int)
+    return frame[list(schema["columns"].keys())]
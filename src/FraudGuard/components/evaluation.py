@@ -1,5 +1,6 @@
 import os
 import json
+import time
 import joblib
 import mlflow
 import shap
@@ -7,12 +8,84 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import pyarrow.parquet as pq
 from pathlib import Path
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_curve, auc, confusion_matrix
 
 from FraudGuard import logger
-from FraudGuard.utils.helpers import save_json, init_mlflow_tracking
+from FraudGuard.utils.helpers import save_json, load_json, init_mlflow_tracking
+from FraudGuard.utils import metrics
+from FraudGuard.utils.metrics import evaluate_scores
+from FraudGuard.utils.stage_cache import StageCache
+from FraudGuard.utils.telemetry import INFERENCE_LATENCY
+from FraudGuard.components.explanation import load_shap_values
 from FraudGuard.entity.config_entity import ModelEvaluationConfig
+from FraudGuard.pipeline import inference_pipeline, compiled_model, serving_bundle, drift_monitor
+
+# Rows scored per predict_proba call, so a large holdout is never copied whole out of the memory map
+SCORE_CHUNK_ROWS = 262144
+# Points kept per curve in curves.json; the areas are computed on the full curves
+MAX_CURVE_POINTS = 1000
+# Probability differences above this between the replay and the offline scores are reported as a mismatch
+REPLAY_TOLERANCE = 1e-4
+REPLAY_STAGES = ("preprocess", "model", "postprocess")
+
+
+def replay_holdout(test_path: Path, label_encoder_path: Path, target_column: str, chunk_rows: int = 50000,
+                   offline_proba: np.ndarray = None) -> dict:
+    """Score the raw holdout through the production batch path and time every stage.
+
+    The test split is stored label-encoded, so each chunk is decoded back to
+    the raw category strings with the training encoders and then handed to
+    PredictionPipeline.predict_batch, exactly as /predict/batch would be.
+    Returns metrics at the served threshold, rows/sec, seconds per stage
+    and, when offline scores are given, the largest probability gap
+    between the two paths.
+    """
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+
+    pipeline = PredictionPipeline()
+    label_encoders = joblib.load(label_encoder_path)
+    stage_before = {stage: INFERENCE_LATENCY.total(endpoint="replay", stage=stage) for stage in REPLAY_STAGES}
+
+    labels, probabilities = [], []
+    decode_seconds = 0.0
+    start = time.perf_counter()
+    for batch in pq.ParquetFile(test_path).iter_batches(batch_size=chunk_rows):
+        decode_start = time.perf_counter()
+        chunk = batch.to_pandas()
+        labels.append(chunk.pop(target_column).to_numpy(dtype=np.int64))
+        for column, encoder in label_encoders.items():
+            if column in chunk.columns:
+                chunk[column] = encoder.classes_[chunk[column].to_numpy(dtype=np.int64)]
+        decode_seconds += time.perf_counter() - decode_start
+
+        results = pipeline.predict_batch(chunk, endpoint="replay")
+        probabilities.append(np.fromiter((r["fraud_probability"] for r in results), dtype=np.float64, count=len(results)))
+    seconds = time.perf_counter() - start
+
+    y = np.concatenate(labels) if labels else np.array([], dtype=np.int64)
+    proba = np.concatenate(probabilities) if probabilities else np.array([], dtype=np.float64)
+    stage_seconds = {"decode": decode_seconds}
+    stage_seconds.update({
+        stage: INFERENCE_LATENCY.total(endpoint="replay", stage=stage) - stage_before[stage] for stage in REPLAY_STAGES
+    })
+
+    report = {
+        "rows": int(len(y)),
+        "seconds": seconds,
+        "rows_per_second": len(y) / seconds if seconds else 0.0,
+        "stage_seconds": stage_seconds,
+        "metrics": evaluate_scores(y, proba, threshold=pipeline.optimal_threshold)["metrics"],
+    }
+    if offline_proba is not None and len(offline_proba) == len(proba):
+        report["max_probability_gap"] = float(np.max(np.abs(proba - offline_proba))) if len(proba) else 0.0
+        if report["max_probability_gap"] > REPLAY_TOLERANCE:
+            logger.warning(f"Serving path differs from offline scoring by up to {report['max_probability_gap']:.6f}")
+    logger.info(
+        f"Replayed {report['rows']} raw holdout rows through the serving path at "
+        f"{report['rows_per_second']:.0f} rows/s: {stage_seconds}"
+    )
+    return report
 
 
 class Evaluation:
@@ -27,57 +100,62 @@ class Evaluation:
 
 
     def evaluation(self):
-        if not os.path.exists(self.config.test_path):
-            raise FileNotFoundError(f"Test data not found: {self.config.test_path}")
+        if not os.path.exists(self.config.test_preprocess):
+            raise FileNotFoundError(f"Test data not found: {self.config.test_preprocess}")
         if not os.path.exists(self.config.model_path):
             raise FileNotFoundError(f"Model not found: {self.config.model_path}")
         if not os.path.exists(self.config.preprocess_path):
             raise FileNotFoundError(f"Preprocessor not found: {self.config.preprocess_path}")
 
-        test_df = pd.read_csv(self.config.test_path)
+        # The preprocess stage already scaled the test split; map it instead of re-parsing and re-transforming
+        manifest = load_json(Path(self.config.manifest_path))
+        test_data = np.load(self.config.test_preprocess, mmap_mode="r")
         model = joblib.load(self.config.model_path)
-        preprocessor = joblib.load(self.config.preprocess_path)
-
-        target_column = self.config.target_column
-        X_test = test_df.drop(columns=[target_column])
-        y_test = test_df[target_column]
-        X_test_transformed = preprocessor.transform(X_test)
-
-        preds = model.predict(X_test_transformed)
-        proba = model.predict_proba(X_test_transformed)[:, 1] if hasattr(model, "predict_proba") else None
-
-        metrics = {
-            "accuracy": accuracy_score(y_test, preds),
-            "precision_weighted": precision_score(y_test, preds, average="weighted"),
-            "recall_weighted": recall_score(y_test, preds, average="weighted"),
-            "f1_weighted": f1_score(y_test, preds, average="weighted"),
-            "precision_macro": precision_score(y_test, preds, average="macro"),
-            "recall_macro": recall_score(y_test, preds, average="macro"),
-            "f1_macro": f1_score(y_test, preds, average="macro"),
-        }
 
-        if proba is not None:
-            fpr, tpr, _ = roc_curve(y_test, proba)
-            metrics["auc"] = auc(fpr, tpr)
+        target_index = manifest["columns"].index(self.config.target_column)
+        y_test = test_data[:, target_index].astype(int)
+        proba = self._score(model, test_data, target_index)
+        threshold = self._load_threshold()
+
+        evaluation = evaluate_scores(y_test, proba, threshold=threshold)
+        metrics = evaluation["metrics"]
+        cm = evaluation["confusion_matrix"]
+        fpr, tpr = evaluation["roc"]["fpr"], evaluation["roc"]["tpr"]
+        logger.info(f"Evaluated {len(y_test)} rows at threshold {threshold:.4f}: {cm}")
 
         os.makedirs(self.config.root_dir, exist_ok=True)
         save_json(path=Path(self.config.metrics_path), data=metrics)
+        save_json(path=Path(self.config.curves_path), data=self._curves_report(evaluation))
+
+        replay = None
+        if self.config.replay:
+            replay = replay_holdout(
+                Path(self.config.test_path), Path(self.config.label_encoder_path), self.config.target_column,
+                chunk_rows=self.config.replay_chunk_rows, offline_proba=proba,
+            )
+            save_json(path=Path(self.config.replay_path), data=replay)
 
-        
         with mlflow.start_run(run_name="Model Evaluation"):
             mlflow.log_metrics({k: float(v) for k, v in metrics.items()})
             mlflow.set_tag("stage", "evaluation")
 
             # Log artifacts
             mlflow.log_artifact(self.config.metrics_path)
+            mlflow.log_artifact(self.config.curves_path)
+            if replay is not None:
+                mlflow.log_metrics({
+                    "replay_rows_per_second": replay["rows_per_second"],
+                    **{f"replay_{stage}_seconds": value for stage, value in replay["stage_seconds"].items()},
+                    **{f"replay_{name}": value for name, value in replay["metrics"].items()},
+                })
+                mlflow.log_artifact(self.config.replay_path)
             mlflow.log_artifact(self.config.model_path)
             mlflow.log_artifact(self.config.preprocess_path)
 
             # Confusion Matrix
-            cm = confusion_matrix(y_test, preds)
             plt.figure(figsize=(6, 4))
-            sns.heatmap(cm, annot=True, fmt="d", cmap="Blues")
-            plt.title("Confusion Matrix")
+            sns.heatmap([[cm["tn"], cm["fp"]], [cm["fn"], cm["tp"]]], annot=True, fmt="d", cmap="Blues")
+            plt.title(f"Confusion Matrix (threshold {threshold:.2f})")
             plt.xlabel("Predicted")
             plt.ylabel("Actual")
             plt.tight_layout()
@@ -86,44 +164,83 @@ class Evaluation:
             mlflow.log_artifact(self.config.cm_path)
 
             # ROC Curve
-            if proba is not None:
-                plt.figure(figsize=(6, 4))
-                plt.plot(fpr, tpr, label=f"AUC = {metrics['auc']:.2f}")
-                plt.plot([0, 1], [0, 1], linestyle="--", color="gray")
-                plt.xlabel("False Positive Rate")
-                plt.ylabel("True Positive Rate")
-                plt.title("ROC Curve")
-                plt.legend()
-                plt.tight_layout()
-                plt.savefig(self.config.roc_path, bbox_inches="tight")
-                plt.close()
-                mlflow.log_artifact(self.config.roc_path)
+            plt.figure(figsize=(6, 4))
+            plt.plot(fpr, tpr, label=f"AUC = {metrics['auc']:.2f}")
+            plt.plot([0, 1], [0, 1], linestyle="--", color="gray")
+            plt.xlabel("False Positive Rate")
+            plt.ylabel("True Positive Rate")
+            plt.title("ROC Curve")
+            plt.legend()
+            plt.tight_layout()
+            plt.savefig(self.config.roc_path, bbox_inches="tight")
+            plt.close()
+            mlflow.log_artifact(self.config.roc_path)
 
             # SHAP Feature Importance (Model Interpretability)
-            self._generate_shap_plots(model, X_test_transformed, X_test.columns)
+            self._generate_shap_plots()
 
         logger.info("Model evaluation complete. Metrics and plots logged.")
         return metrics
 
-    def _generate_shap_plots(self, model, X_test, feature_names):
-        """Generate SHAP plots for model interpretability."""
+    @staticmethod
+    def _score(model, test_data, target_index: int) -> np.ndarray:
+        """Fraud probabilities from one predict_proba pass over the holdout, in chunks."""
+        proba = np.empty(len(test_data), dtype=np.float64)
+        for start in range(0, len(test_data), SCORE_CHUNK_ROWS):
+            features = np.delete(test_data[start:start + SCORE_CHUNK_ROWS], target_index, axis=1)
+            proba[start:start + len(features)] = model.predict_proba(features)[:, 1]
+        return proba
+
+    def _load_threshold(self) -> float:
+        """Decision threshold chosen at training time, so metrics match what serving flags."""
+        if not os.path.exists(self.config.threshold_path):
+            logger.warning(f"Threshold artifact not found at {self.config.threshold_path}. Using 0.5")
+            return 0.5
+        return float(load_json(Path(self.config.threshold_path))["optimal_threshold"])
+
+    @staticmethod
+    def _curves_report(evaluation: dict) -> dict:
+        """ROC/PR curves thinned to MAX_CURVE_POINTS, plus the confusion matrix and calibration bins."""
+        def thin(curve: dict) -> dict:
+            length = len(next(iter(curve.values())))
+            keep = np.unique(np.linspace(0, length - 1, min(length, MAX_CURVE_POINTS)).astype(int)) if length else []
+            # JSON has no infinity; the first ROC threshold stands for "flag nothing"
+            return {name: np.nan_to_num(np.asarray(values)[keep], posinf=1.0).tolist() for name, values in curve.items()}
+
+        return {
+            "threshold": evaluation["metrics"]["threshold"],
+            "confusion_matrix": evaluation["confusion_matrix"],
+            "roc": thin(evaluation["roc"]),
+            "pr": thin(evaluation["pr"]),
+            "calibration": evaluation["calibration"],
+        }
+
+    def run(self):
+        """Evaluate unless the stage cache is fresh; returns the metrics either way."""
+        cache = StageCache(
+            "evaluation",
+            inputs=[self.config.test_preprocess, self.config.manifest_path, self.config.model_path,
+                    self.config.preprocess_path, self.config.shap_values_path, self.config.threshold_path,
+                    self.config.test_path, self.config.label_encoder_path],
+            config=self.config.model_dump(exclude={"mlflow_username", "mlflow_password"}),
+            code=[__file__, metrics.__file__, inference_pipeline.__file__, compiled_model.__file__,
+                  serving_bundle.__file__, drift_monitor.__file__],
+            outputs=[self.config.metrics_path, self.config.curves_path, self.config.cm_path, self.config.roc_path]
+                    + ([self.config.replay_path] if self.config.replay else []),
+        )
+        return cache.run(self.evaluation, load=lambda: load_json(Path(self.config.metrics_path)))
+
+    def _generate_shap_plots(self):
+        """Plot the SHAP values cached by the explanation stage."""
         try:
+            if not os.path.exists(self.config.shap_values_path):
+                logger.warning(f"No SHAP values at {self.config.shap_values_path}; run the explanation stage first")
+                return
             logger.info("Generating SHAP feature importance plots...")
-            
-            # Use TreeExplainer for tree-based models (XGBoost, LightGBM, CatBoost)
-            explainer = shap.TreeExplainer(model)
-            
-            # Calculate SHAP values (use sample for speed)
-            sample_size = min(500, len(X_test))
-            X_sample = X_test[:sample_size]
-            shap_values = explainer.shap_values(X_sample)
-            
-            # Handle different output formats
-            if isinstance(shap_values, list):
-                shap_values = shap_values[1]  # For binary classification, use class 1
-            
-            # Create DataFrame with feature names
-            X_sample_df = pd.DataFrame(X_sample, columns=feature_names)
+
+            shap_data = load_shap_values(Path(self.config.shap_values_path))
+            shap_values = shap_data["values"]
+            X_sample_df = pd.DataFrame(shap_data["X"], columns=shap_data["feature_names"].tolist())
             
             # Summary Plot (Bar)
             plt.figure(figsize=(10, 6))
@@ -157,5 +274,5 @@ if __name__ == "__main__":
     logger.info(">>>>>> Stage: Evaluation started <<<<<<")
     config = ConfigurationManager()
     evaluation = Evaluation(config=config.get_model_evaluation_config())
-    evaluation.evaluation()
+    evaluation.run()
     logger.info(">>>>>> Stage: Evaluation completed <<<<<<")
\ No newline at end of file
@@ -0,0 +1,158 @@
+import os
+import hashlib
+import joblib
+import multiprocessing
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from FraudGuard import logger
+from FraudGuard.utils.helpers import load_json, get_file_hash
+from FraudGuard.entity.config_entity import ModelExplanationConfig
+
+# Per-worker explainer, built once by the pool initializer
+_explainer = None
+
+
+def _positive_class(values):
+    """SHAP output for the fraud class, whatever shape the explainer returned it in."""
+    if isinstance(values, list):
+        return values[1]
+    values = np.asarray(values)
+    return values[:, :, 1] if values.ndim == 3 else values
+
+
+def _init_worker(model_path: str):
+    global _explainer
+    import shap
+
+    _explainer = shap.TreeExplainer(joblib.load(model_path))
+
+
+def _base_value() -> float:
+    # A scalar, or one value per class with the fraud class last
+    return float(np.ravel(_explainer.expected_value)[-1])
+
+
+def _explain_chunk(chunk: np.ndarray):
+    """SHAP values of one chunk and the worker explainer's base value, so the parent builds no explainer."""
+    return np.asarray(_positive_class(_explainer.shap_values(chunk)), dtype=np.float32), _base_value()
+
+
+def stratified_sample_indices(y, sample_size: int, min_per_class: int = 0, random_state: int = 42) -> np.ndarray:
+    """Sorted row indices of a class-stratified sample.
+
+    Every class gets its share of sample_size in proportion to its
+    frequency, raised to min_per_class (or all of its rows, if fewer) so
+    that rare fraud cases are always represented.
+    """
+    y = np.asarray(y)
+    if sample_size >= len(y):
+        return np.arange(len(y))
+    rng = np.random.default_rng(random_state)
+    indices = []
+    for label in np.unique(y):
+        rows = np.flatnonzero(y == label)
+        share = max(int(round(sample_size * len(rows) / len(y))), min_per_class)
+        indices.append(rng.choice(rows, size=min(share, len(rows)), replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def compute_shap_values(model_path: Path, X: np.ndarray, chunk_size: int = 250, n_workers: int = 1):
+    """SHAP values of the fraud class for X and the explainer's base value.
+
+    Rows are explained in chunks of chunk_size on a spawn process pool of
+    n_workers; each worker loads the model and builds its TreeExplainer
+    once. With one worker, or a single chunk, everything runs in-process.
+    The base value is read from those same explainers.
+    """
+    chunks = [X[start:start + chunk_size] for start in range(0, len(X), chunk_size)]
+    n_workers = min(n_workers, len(chunks))
+    if n_workers <= 1:
+        _init_worker(str(model_path))
+        return np.concatenate([_explain_chunk(chunk)[0] for chunk in chunks]), _base_value()
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(model_path),),
+    ) as pool:
+        values, base_values = zip(*pool.map(_explain_chunk, chunks))
+    return np.concatenate(values), base_values[0]
+
+
+class Explanation:
+    def __init__(self, config: ModelExplanationConfig):
+        self.config = config
+
+    def _load_sample(self):
+        manifest = load_json(Path(self.config.manifest_path))
+        test_data = np.load(self.config.test_preprocess, mmap_mode="r")
+        target_index = manifest["columns"].index(self.config.target_column)
+        y = test_data[:, target_index].astype(int)
+
+        indices = stratified_sample_indices(
+            y, self.config.sample_size, self.config.min_per_class, self.config.random_state
+        )
+        X = np.ascontiguousarray(np.delete(test_data[indices], target_index, axis=1), dtype=np.float32)
+        return X, y[indices], indices, manifest["feature_columns"]
+
+    def _cache_key(self, X: np.ndarray) -> str:
+        digest = hashlib.sha256(get_file_hash(self.config.model_path).encode())
+        digest.update(hashlib.sha256(X.tobytes()).hexdigest().encode())
+        return digest.hexdigest()
+
+    def _cached(self, key: str) -> bool:
+        path = Path(self.config.shap_values_path)
+        if not path.exists():
+            return False
+        with np.load(path) as cached:
+            return str(cached["key"]) == key
+
+    def explain(self) -> Path:
+        """Write SHAP values for a stratified test sample, reusing them when model and sample are unchanged."""
+        X, y, indices, feature_names = self._load_sample()
+        key = self._cache_key(X)
+        path = Path(self.config.shap_values_path)
+        if self._cached(key):
+            logger.info(f"SHAP values for model/sample {key[:12]} already at {path}, skipping computation")
+            return path
+
+        logger.info(
+            f"Computing SHAP values for {len(X)} rows ({int(y.sum())} fraud) in chunks of "
+            f"{self.config.chunk_size} on {self.config.n_workers} workers"
+        )
+        values, base_value = compute_shap_values(
+            Path(self.config.model_path), X, chunk_size=self.config.chunk_size, n_workers=self.config.n_workers
+        )
+
+        os.makedirs(self.config.root_dir, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp_path, key=key, values=values, X=X, y=y, indices=indices,
+            feature_names=np.asarray(feature_names), base_value=base_value,
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"SHAP values saved to {path}")
+        return path
+
+    def run(self):
+        # explain() is already keyed on the model and sample content
+        return self.explain()
+
+
+def load_shap_values(path: Path) -> dict:
+    """Arrays written by the explanation stage: values, X, y, indices, feature_names, base_value."""
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+if __name__ == "__main__":
+    from FraudGuard.config.config import ConfigurationManager
+
+    logger.info(">>>>>> Stage: Explanation started <<<<<<")
+    config = ConfigurationManager()
+    explanation = Explanation(config=config.get_model_explanation_config())
+    explanation.run()
+    logger.info(">>>>>> Stage: Explanation completed <<<<<<")
@@ -1,30 +1,78 @@
 import os
+import shutil
 import zipfile
 from urllib import request
 from pathlib import Path
+from botocore.exceptions import ClientError
 from FraudGuard import logger
 from FraudGuard.utils.helpers import *
+from FraudGuard.utils.s3_transfer import S3Downloader, MiB
+from FraudGuard.utils.stage_cache import StageCache
 from FraudGuard.entity.config_entity import DataIngestionConfig
 
 class Ingestion:
     def __init__(self, config: DataIngestionConfig):
         self.config = config
 
-    def download_file(self):
+    def download_file(self, downloader: S3Downloader = None):
+        """Fetch the dataset; a data_path ending in "/" is a prefix of CSV partitions to combine."""
         local_csv_path = self.config.download_data
-        if not os.path.exists(local_csv_path):
-            success = download_from_s3(
-                bucket=self.config.bucket,
-                s3_path=self.config.data_path,
-                local_path=local_csv_path,
-                aws_region=self.config.region
-            )
-            if success:
-                logger.info(f"Downloaded file: {local_csv_path}")
-            else:
-                raise Exception(f"Failed to download {self.config.data_path} from S3")
-        else:
+        if os.path.exists(local_csv_path):
             logger.info(f"File already exists: {local_csv_path} ({get_size(local_csv_path)})")
+            return
+
+        downloader = downloader or S3Downloader(
+            region=self.config.region,
+            part_size=self.config.part_size_mb * MiB,
+            max_concurrency=self.config.max_concurrency,
+            max_parallel_objects=self.config.max_parallel_objects
+        )
+        try:
+            if self.config.data_path.endswith("/"):
+                self.download_partitions(downloader)
+            else:
+                downloader.download(self.config.bucket, self.config.data_path, local_csv_path)
+        except (ClientError, IOError) as e:
+            raise Exception(f"Failed to download {self.config.data_path} from S3: {e}") from e
+        logger.info(f"Downloaded file: {local_csv_path} ({get_size(local_csv_path)})")
+
+    def download_partitions(self, downloader: S3Downloader):
+        """Download every CSV under the prefix in parallel and append them into download_data.
+
+        The partition files are removed once combined; after a failure they
+        stay, so the next run only fetches what is missing.
+        """
+        prefix = self.config.data_path
+        keys = [key for key in downloader.list_keys(self.config.bucket, prefix) if key.endswith(".csv")]
+        if not keys:
+            raise IOError(f"No CSV objects under s3://{self.config.bucket}/{prefix}")
+        logger.info(f"Downloading {len(keys)} partitions from s3://{self.config.bucket}/{prefix}")
+        partitions_dir = Path(self.config.root_dir) / "partitions"
+        paths = downloader.download_many(self.config.bucket, keys, partitions_dir, prefix)
+
+        combined_path = self.config.download_data.with_name(self.config.download_data.name + ".tmp")
+        header = None
+        with open(combined_path, "wb") as out:
+            for path in paths:
+                with open(path, "rb") as f:
+                    first_line = f.readline()
+                    if header is None:
+                        header = first_line
+                        out.write(header)
+                    elif first_line != header:
+                        raise IOError(f"Partition {path} has a different header than {paths[0]}")
+                    shutil.copyfileobj(f, out, length=MiB)
+        os.replace(combined_path, self.config.download_data)
+        shutil.rmtree(partitions_dir)
+
+    def run(self):
+        cache = StageCache(
+            "ingestion",
+            config=self.config.model_dump(),
+            code=[__file__],
+            outputs=[self.config.download_data],
+        )
+        cache.run(self.download_file)
 
 
 if __name__ == "__main__":
@@ -33,5 +81,5 @@ if __name__ == "__main__":
     logger.info(">>>>>> Stage: Ingestion started <<<<<<")
     config = ConfigurationManager()
     ingestion = Ingestion(config=config.get_data_ingestion_config())
-    ingestion.download_file()
+    ingestion.run()
     logger.info(">>>>>> Stage: Ingestion completed <<<<<<")
\ No newline at end of file
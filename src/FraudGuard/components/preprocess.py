@@ -1,17 +1,24 @@
 import os
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from imblearn.under_sampling import TomekLinks
-from imblearn.combine import SMOTETomek
 import joblib
 from FraudGuard import logger
 from FraudGuard.entity.config_entity import DataTransformationConfig
-from FraudGuard.utils.helpers import create_directories, save_bin
+from FraudGuard.utils.helpers import create_directories, save_bin, save_json
+from FraudGuard.utils.resampling import rebalance, class_weight_params, update_rebalance_report
+from FraudGuard.utils import resampling
+from FraudGuard.utils.stage_cache import StageCache
+from FraudGuard.pipeline import drift_monitor
+from FraudGuard.pipeline.drift_monitor import ReferenceProfileBuilder
+
+PROCESSED_DTYPE = np.float32
 
 
 class Transform:
@@ -24,6 +31,8 @@ class Transform:
         self.numerical_columns = config.numeric_columns
         self.test_size = config.test_size
         self.random_state = config.random_state
+        # Extra model parameters requested by the rebalancing strategy (e.g. scale_pos_weight)
+        self.model_params = {}
 
     def preprocess_data(self, data):
         """Preprocess data: drop columns, encode categoricals."""
@@ -46,7 +55,7 @@ class Transform:
         return data
 
     def train_test_splitting(self):
-        """Split data into train/test sets, then apply SMOTE-Tomek to train only (no leakage)."""
+        """Split data into train/test sets, then rebalance the train set only (no leakage)."""
         logger.info(f"Loading data from {self.config.data_path}")
         data = pd.read_csv(self.config.data_path)
 
@@ -63,10 +72,23 @@ class Transform:
             X, y, test_size=self.test_size, random_state=self.random_state
         )
 
-        # Apply SMOTE-Tomek to train only
-        logger.info("Applying SMOTE-Tomek resampling to training set only...")
-        smote = SMOTETomek(tomek=TomekLinks(sampling_strategy='majority'), random_state=self.random_state)
-        X_train_resampled, y_train_resampled = smote.fit_resample(X_train, y_train)
+        # Serving-time drift is measured against the real (not resampled) training distribution
+        reference = ReferenceProfileBuilder(self.numerical_columns, self.label_encoders, self.config.reference_bins)
+        reference.update(X_train)
+        self._save_reference_profile(reference)
+
+        # Rebalance train only
+        logger.info(f"Applying {self.config.rebalance_strategy} rebalancing to training set only...")
+        X_train_resampled, y_train_resampled, self.model_params, report = rebalance(
+            X_train, y_train,
+            strategy=self.config.rebalance_strategy,
+            random_state=self.random_state,
+            k_neighbors=self.config.k_neighbors,
+            n_jobs=self.config.rebalance_n_jobs,
+            working_memory_mb=self.config.working_memory_mb,
+            trace_memory=self.config.trace_memory
+        )
+        update_rebalance_report(Path(self.config.root_dir) / "rebalance_report.json", report)
 
         # Reconstruct dataframes
         train = pd.DataFrame(X_train_resampled, columns=X.columns)
@@ -78,8 +100,8 @@ class Transform:
         split_dir = os.path.join(self.config.root_dir, "split")
         create_directories([split_dir])
 
-        train.to_csv(os.path.join(split_dir, "train.csv"), index=False)
-        test.to_csv(os.path.join(split_dir, "test.csv"), index=False)
+        train.to_parquet(os.path.join(split_dir, "train.parquet"), index=False)
+        test.to_parquet(os.path.join(split_dir, "test.parquet"), index=False)
 
         logger.info(f"Training data shape: {train.shape}")
         logger.info(f"Test data shape: {test.shape}")
@@ -102,30 +124,216 @@ class Transform:
 
         train_x = train.drop(columns=[self.target_column])
         test_x = test.drop(columns=[self.target_column])
-        train_y = train[self.target_column].values.reshape(-1, 1)
-        test_y = test[self.target_column].values.reshape(-1, 1)
 
         train_processed = preprocessor.fit_transform(train_x)
         test_processed = preprocessor.transform(test_x)
 
-        train_combined = np.hstack((train_processed, train_y))
-        test_combined = np.hstack((test_processed, test_y))
-
         # Save preprocessor
         save_bin(data=preprocessor, path=Path(self.config.preprocessor_path))
 
-        # Save processed data
+        # Save processed data as float32 .npy (features + target as last column) for zero-copy memmap loading
         process_dir = os.path.join(self.config.root_dir, "process")
         create_directories([process_dir])
 
-        np.save(os.path.join(process_dir, "train_processed.npy"), train_combined)
-        np.save(os.path.join(process_dir, "test_processed.npy"), test_combined)
+        for name, features, target in (("train", train_processed, train[self.target_column]),
+                                       ("test", test_processed, test[self.target_column])):
+            combined = np.empty((len(features), features.shape[1] + 1), dtype=PROCESSED_DTYPE)
+            combined[:, :-1] = features
+            combined[:, -1] = target.to_numpy()
+            np.save(os.path.join(process_dir, f"{name}_processed.npy"), combined)
+            logger.info(f"Preprocessed {name} shape: {combined.shape}")
 
-        logger.info(f"Preprocessed train shape: {train_combined.shape}")
-        logger.info(f"Preprocessed test shape: {test_combined.shape}")
+        self._save_processed_manifest(preprocessor, {"train": len(train_processed), "test": len(test_processed)})
 
         return train_processed, test_processed
 
+    def _save_processed_manifest(self, preprocessor, row_counts: dict):
+        """Describe the processed arrays so downstream stages can map them without guessing the layout."""
+        feature_names = [name.split("__", 1)[-1] for name in preprocessor.get_feature_names_out()]
+        manifest = {
+            "dtype": np.dtype(PROCESSED_DTYPE).name,
+            "columns": feature_names + [self.target_column],
+            "feature_columns": feature_names,
+            "target_column": self.target_column,
+            "model_params": self.model_params,
+            "splits": {
+                name: {"file": f"{name}_processed.npy", "rows": int(rows)} for name, rows in row_counts.items()
+            },
+        }
+        save_json(path=Path(self.config.root_dir) / "process" / "manifest.json", data=manifest)
+
+    def _save_reference_profile(self, reference: ReferenceProfileBuilder):
+        process_dir = Path(self.config.root_dir) / "process"
+        create_directories([process_dir])
+        save_json(path=process_dir / "reference_profile.json", data=reference.result())
+
+    def _read_chunks(self, path):
+        if str(path).endswith(".parquet"):
+            return (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=self.config.chunk_size))
+        return pd.read_csv(path, chunksize=self.config.chunk_size)
+
+    def _is_test_row(self, keys: pd.Series) -> np.ndarray:
+        """Deterministic hash split on the split key, stable across runs and chunk boundaries."""
+        hash_key = f"{self.random_state:016d}"[-16:]
+        hashes = pd.util.hash_pandas_object(keys.astype(str), index=False, hash_key=hash_key).to_numpy()
+        return (hashes % 10000) < int(round(self.test_size * 10000))
+
+    def fit_label_encoders_streaming(self):
+        """Fit label encoders from the category sets seen across all chunks."""
+        categories = {column: set() for column in self.categorical_columns}
+        for chunk in self._read_chunks(self.config.data_path):
+            for column in categories:
+                if column in chunk.columns:
+                    categories[column].update(chunk[column].astype(str).unique())
+
+        # LabelEncoder.fit on the unique values gives the same classes_ as fitting on the full column
+        self.label_encoders = {
+            column: LabelEncoder().fit(sorted(values)) for column, values in categories.items() if values
+        }
+        create_directories([os.path.dirname(self.config.label_encoder)])
+        save_bin(data=self.label_encoders, path=Path(self.config.label_encoder))
+
+    def streaming_transform(self):
+        """Out-of-core version of train_test_splitting + preprocess_features.
+
+        Three passes over chunks of the raw CSV: fit the label encoders, then
+        encode, split by a hash of the split key, append the splits to Parquet
+        and partial_fit the scaler on the train rows, then scale the splits
+        into preallocated .npy memmaps. Peak memory is bounded by chunk_size.
+        Resampling needs the whole train set in memory, so streaming mode
+        writes the un-resampled train split; the class_weight strategy still
+        applies.
+        """
+        logger.info(f"Streaming preprocess of {self.config.data_path} in chunks of {self.config.chunk_size}")
+        if self.config.rebalance_strategy not in ("class_weight", "none"):
+            logger.warning(f"Streaming mode skips {self.config.rebalance_strategy} resampling of the train split")
+        self.fit_label_encoders_streaming()
+
+        split_dir = os.path.join(self.config.root_dir, "split")
+        process_dir = os.path.join(self.config.root_dir, "process")
+        create_directories([split_dir, process_dir])
+        split_paths = {name: os.path.join(split_dir, f"{name}.parquet") for name in ("train", "test")}
+        split_writers = {}
+        row_counts = {"train": 0, "test": 0}
+
+        preprocessor = None
+        scaler = None
+        reference = ReferenceProfileBuilder(self.numerical_columns, self.label_encoders, self.config.reference_bins)
+        for chunk in self._read_chunks(self.config.data_path):
+            keys = chunk[self.config.split_key]
+            chunk = chunk.drop(columns=self.columns_to_drop, errors='ignore')
+            # Same order as preprocess_data + dropna: missing categories become the 'nan' class
+            for column, encoder in self.label_encoders.items():
+                if column in chunk.columns:
+                    chunk[column] = encoder.transform(chunk[column].astype(str))
+            valid = chunk.notna().all(axis=1)
+            chunk, keys = chunk[valid], keys[valid]
+
+            is_test = self._is_test_row(keys)
+            for name, part in (("train", chunk[~is_test]), ("test", chunk[is_test])):
+                if part.empty:
+                    continue
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                if name not in split_writers:
+                    split_writers[name] = pq.ParquetWriter(split_paths[name], table.schema)
+                else:
+                    table = table.cast(split_writers[name].schema)
+                split_writers[name].write_table(table)
+                row_counts[name] += len(part)
+
+            train_x = chunk[~is_test].drop(columns=[self.target_column])
+            if train_x.empty:
+                continue
+            reference.update(train_x)
+            if preprocessor is None:
+                numeric_cols = train_x.select_dtypes(include=[np.number]).columns.tolist()
+                preprocessor = ColumnTransformer(
+                    transformers=[("num", Pipeline(steps=[("scaler", StandardScaler())]), numeric_cols)],
+                    remainder="passthrough"
+                )
+                preprocessor.fit(train_x)
+                scaler = preprocessor.named_transformers_["num"].named_steps["scaler"]
+            else:
+                scaler.partial_fit(train_x[scaler.feature_names_in_])
+
+        for writer in split_writers.values():
+            writer.close()
+
+        if preprocessor is None:
+            raise ValueError(f"No training rows found in {self.config.data_path}")
+        save_bin(data=preprocessor, path=Path(self.config.preprocessor_path))
+        self._save_reference_profile(reference)
+
+        n_columns = len(preprocessor.feature_names_in_) + 1
+        for name in ("train", "test"):
+            output = np.lib.format.open_memmap(
+                os.path.join(process_dir, f"{name}_processed.npy"), mode="w+",
+                dtype=PROCESSED_DTYPE, shape=(row_counts[name], n_columns)
+            )
+            offset = 0
+            if row_counts[name]:
+                for chunk in self._read_chunks(split_paths[name]):
+                    rows = slice(offset, offset + len(chunk))
+                    output[rows, :-1] = preprocessor.transform(chunk.drop(columns=[self.target_column]))
+                    output[rows, -1] = chunk[self.target_column].to_numpy()
+                    offset += len(chunk)
+            if name == "train":
+                if self.config.rebalance_strategy == "class_weight":
+                    self.model_params = class_weight_params(output[:, -1])
+                self._report_streaming_rebalance(output[:, -1])
+            output.flush()
+            del output
+            logger.info(f"Preprocessed {name} shape: ({row_counts[name]}, {n_columns})")
+
+        self._save_processed_manifest(preprocessor, row_counts)
+        return row_counts
+
+    def _report_streaming_rebalance(self, y):
+        """Rebalance report entry for the un-resampled streaming train split, under the strategy actually applied."""
+        strategy = "class_weight" if self.config.rebalance_strategy == "class_weight" else "none"
+        labels, counts = np.unique(np.asarray(y).astype(int), return_counts=True)
+        class_counts = {str(label): int(count) for label, count in zip(labels, counts)}
+        update_rebalance_report(Path(self.config.root_dir) / "rebalance_report.json", {
+            "strategy": strategy,
+            "streaming": True,
+            "seconds": 0.0,
+            "peak_memory_mb": None,
+            "rows_before": len(y),
+            "rows_after": len(y),
+            "class_counts_before": class_counts,
+            "class_counts_after": class_counts,
+            "model_params": self.model_params,
+        })
+
+    def run(self):
+        """Split, rebalance and scale (in memory or streaming), unless the stage cache is fresh."""
+        root_dir = Path(self.config.root_dir)
+        cache = StageCache(
+            "preprocess",
+            inputs=[self.config.data_path],
+            config=self.config.model_dump(),
+            code=[__file__, resampling.__file__, drift_monitor.__file__],
+            outputs=[
+                root_dir / "split" / "train.parquet",
+                root_dir / "split" / "test.parquet",
+                root_dir / "process" / "train_processed.npy",
+                root_dir / "process" / "test_processed.npy",
+                root_dir / "process" / "manifest.json",
+                root_dir / "process" / "reference_profile.json",
+                root_dir / "rebalance_report.json",
+                self.config.preprocessor_path,
+                self.config.label_encoder,
+            ],
+        )
+        cache.run(self._transform)
+
+    def _transform(self):
+        if self.config.streaming:
+            self.streaming_transform()
+        else:
+            train, test = self.train_test_splitting()
+            self.preprocess_features(train, test)
+
 
 if __name__ == "__main__":
     from FraudGuard.config.config import ConfigurationManager
@@ -133,6 +341,5 @@ if __name__ == "__main__":
     logger.info(">>>>>> Stage: Preprocess started <<<<<<")
     config = ConfigurationManager()
     transform = Transform(config=config.get_data_transformation_config())
-    train, test = transform.train_test_splitting()
-    transform.preprocess_features(train, test)
+    transform.run()
     logger.info(">>>>>> Stage: Preprocess completed <<<<<<")
\ No newline at end of file
@@ -1,18 +1,216 @@
 import os
 import json
 import joblib
+import hashlib
+import inspect
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 import mlflow
 import pandas as pd
 import numpy as np
 import optuna
 from pathlib import Path
 import matplotlib.pyplot as plt
-from sklearn.model_selection import StratifiedKFold, cross_val_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+import xgboost as xgb
 from xgboost import XGBClassifier
-from catboost import CatBoostClassifier
+from catboost import CatBoostClassifier, Pool
 from FraudGuard import logger
-from FraudGuard.utils.helpers import save_json, save_bin, init_mlflow_tracking
+from FraudGuard.utils.helpers import save_json, load_json, save_bin, get_file_hash, init_mlflow_tracking
+from FraudGuard.utils import metrics
+from FraudGuard.utils.metrics import find_optimal_threshold, score_predictions
+from FraudGuard.utils.stage_cache import StageCache
 from FraudGuard.entity.config_entity import ModelTrainerConfig
+from FraudGuard.pipeline import compiled_model
+from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+
+
+def xgboost_search_space(trial):
+    # The number of boosting rounds is not searched: early stopping picks it under hpo.max_estimators
+    return {
+        "max_depth": trial.suggest_int("max_depth", 3, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
+    }
+
+
+def catboost_search_space(trial):
+    return {
+        "max_depth": trial.suggest_int("max_depth", 5, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
+    }
+
+
+def xgboost_dataset(x, y):
+    return xgb.DMatrix(x, label=y)
+
+
+def catboost_dataset(x, y):
+    return Pool(x, label=y)
+
+
+def xgboost_fit_fold(params, fold, max_rounds, early_stopping_rounds, n_threads):
+    """Train on the fold with the native API, stopping on the fold-local validation split.
+
+    Returns probabilities for the held-out fold and the number of trees kept.
+    """
+    booster = xgb.train(
+        {**params, "objective": "binary:logistic", "eval_metric": "logloss", "nthread": n_threads, "verbosity": 0},
+        fold["train"],
+        num_boost_round=max_rounds,
+        evals=[(fold["valid"], "valid")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False,
+    )
+    n_trees = booster.best_iteration + 1
+    return booster.predict(fold["test"], iteration_range=(0, n_trees)), n_trees
+
+
+def catboost_fit_fold(params, fold, max_rounds, early_stopping_rounds, n_threads):
+    model = CatBoostClassifier(
+        **params, iterations=max_rounds, early_stopping_rounds=early_stopping_rounds, use_best_model=True,
+        thread_count=n_threads, verbose=0, allow_writing_files=False,
+    )
+    model.fit(fold["train"], eval_set=fold["valid"])
+    return model.predict_proba(fold["test"])[:, 1], model.get_best_iteration() + 1
+
+
+def xgboost_fit_final(params, train_x, train_y):
+    # The sklearn wrapper has no public way to adopt a prebuilt DMatrix or Booster, so it builds its own
+    return XGBClassifier(**params).fit(train_x, train_y)
+
+
+def catboost_fit_final(params, train_x, train_y):
+    return CatBoostClassifier(**params).fit(catboost_dataset(train_x, train_y))
+
+
+# Module level (not built in Trainer.__init__) so HPO worker processes can look models up by name
+MODELS = {
+    "XGBoost": {
+        "class": XGBClassifier,
+        "search_space": xgboost_search_space,
+        "dataset": xgboost_dataset,
+        "fit_fold": xgboost_fit_fold,
+        "fit_final": xgboost_fit_final,
+        "final_params": {"verbosity": 1},
+        "mlflow_module": mlflow.xgboost,
+    },
+    "CatBoost": {
+        "class": CatBoostClassifier,
+        "search_space": catboost_search_space,
+        "dataset": catboost_dataset,
+        "fit_fold": catboost_fit_fold,
+        "fit_final": catboost_fit_final,
+        "final_params": {"verbose": 100, "allow_writing_files": False},
+        "mlflow_module": mlflow.catboost,
+    },
+}
+
+FINISHED_STATES = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+
+def open_study_storage(storage: str):
+    """Optuna storage from config: '' for in-memory, a URL (e.g. sqlite:///...) or a journal file path."""
+    if not storage:
+        return None
+    if "://" in storage:
+        return storage
+    os.makedirs(os.path.dirname(storage) or ".", exist_ok=True)
+    return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(storage))
+
+
+def make_pruner(warmup_folds: int):
+    return optuna.pruners.MedianPruner(n_startup_trials=2, n_warmup_steps=warmup_folds)
+
+
+def build_cv_folds(model_name, train_x, train_y, config: ModelTrainerConfig) -> list:
+    """Native datasets for every CV fold, built once and shared by all trials.
+
+    Each fold holds the fold's training rows minus a stratified
+    early-stopping split ("train"/"valid") and the held-out rows ("test")
+    with their labels, which are only used for scoring.
+    """
+    make_dataset = MODELS[model_name]["dataset"]
+    cv = StratifiedKFold(n_splits=config.cv_folds, shuffle=True, random_state=42)
+
+    folds = []
+    for train_idx, test_idx in cv.split(train_x, train_y):
+        fit_idx, valid_idx = train_test_split(
+            train_idx, test_size=config.validation_fraction, stratify=train_y[train_idx], random_state=42
+        )
+        folds.append({
+            "train": make_dataset(train_x[fit_idx], train_y[fit_idx]),
+            "valid": make_dataset(train_x[valid_idx], train_y[valid_idx]),
+            "test": make_dataset(train_x[test_idx], train_y[test_idx]),
+            "test_y": train_y[test_idx],
+        })
+    return folds
+
+
+def cross_validate_trial(trial, model_name, folds, config: ModelTrainerConfig, n_threads, fixed_params=None):
+    """K-fold score of one trial, reporting the running mean after every fold for pruning."""
+    model_info = MODELS[model_name]
+    params = {**model_info["search_space"](trial), **(fixed_params or {})}
+
+    scores, n_trees = [], []
+    for fold_number, fold in enumerate(folds):
+        proba, trees = model_info["fit_fold"](
+            params, fold, config.max_estimators, config.early_stopping_rounds, n_threads
+        )
+        scores.append(score_predictions(config.scoring, fold["test_y"], proba))
+        n_trees.append(int(trees))
+
+        # Kept on the trial so the best trial's mean and spread need no second CV pass
+        trial.set_user_attr("fold_scores", scores)
+        trial.set_user_attr("fold_best_iterations", n_trees)
+        trial.report(float(np.mean(scores)), fold_number)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+    return float(np.mean(scores))
+
+
+def load_training_data(path):
+    """Features as one contiguous float32 block (reused by every fold and the final fit) and int labels."""
+    data = np.load(path, mmap_mode="r")
+    return np.ascontiguousarray(data[:, :-1], dtype=np.float32), data[:, -1].astype(int)
+
+
+def load_fixed_params(config: ModelTrainerConfig) -> dict:
+    """Model parameters the preprocess stage asks for (e.g. scale_pos_weight from the class_weight strategy)."""
+    manifest_path = Path(config.train_preprocess).parent / "manifest.json"
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f).get("model_params", {})
+
+
+def fold_score_std(trial) -> float:
+    scores = trial.user_attrs.get("fold_scores")
+    return float(np.std(scores)) if scores else 0.0
+
+
+def final_n_estimators(trial, default: int) -> int:
+    """Tree count for the full-data refit: the mean early-stopped size over the trial's folds."""
+    n_trees = trial.user_attrs.get("fold_best_iterations")
+    return int(np.ceil(np.mean(n_trees))) if n_trees else default
+
+
+def _run_hpo_worker(config: ModelTrainerConfig, study_name, model_name, n_trials, n_threads):
+    """Process-pool entry point: attach to the shared study and run trials until it holds n_iter."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    train_x, train_y = load_training_data(config.train_preprocess)
+    folds = build_cv_folds(model_name, train_x, train_y, config)
+    fixed_params = load_fixed_params(config)
+
+    study = optuna.load_study(
+        study_name=study_name, storage=open_study_storage(config.hpo_storage),
+        pruner=make_pruner(config.pruner_warmup_folds),
+    )
+    study.optimize(
+        lambda trial: cross_validate_trial(trial, model_name, folds, config, n_threads, fixed_params),
+        n_trials=n_trials,
+        callbacks=[optuna.study.MaxTrialsCallback(config.n_iter, states=FINISHED_STATES)],
+    )
 
 
 class Trainer:
@@ -25,65 +223,107 @@ class Trainer:
             mlflow_password=self.config.mlflow_password
         )
 
+        self.models = MODELS
 
-        self.models = {
-            "XGBoost": {
-                "class": XGBClassifier,
-                "search_space": lambda trial: {
-                    "n_estimators": trial.suggest_int("n_estimators", 50, 300),
-                    "max_depth": trial.suggest_int("max_depth", 3, 10),
-                    "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
-                    "verbosity": 0,
-                    "use_label_encoder": False
-                },
-                "mlflow_module": mlflow.xgboost,
-            },
-            "CatBoost": {
-                "class": CatBoostClassifier,
-                "search_space": lambda trial: {
-                    "n_estimators": trial.suggest_int("n_estimators", 50, 300),
-                    "max_depth": trial.suggest_int("max_depth", 5, 10),
-                    "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
-                    "verbose": 0,
-                    "allow_writing_files": False
-                },
-                "mlflow_module": mlflow.catboost,
-            },
+    def _data_fingerprint(self) -> str:
+        """Hash of the training data and of the model parameters the preprocess stage fixed for it."""
+        data_hash = get_file_hash(Path(self.config.train_preprocess))
+        fixed_params = load_fixed_params(self.config)
+        if not fixed_params:
+            return data_hash
+        return hashlib.sha256(f"{data_hash}:{json.dumps(fixed_params, sort_keys=True)}".encode()).hexdigest()
+
+    def _study_name(self, model_name: str, data_hash: str) -> str:
+        # Keyed on the training data and CV setup so a resumed study never mixes scores from other data
+        # or from trials that searched a different space or stopped under a different round cap
+        search_setup = {
+            "max_estimators": self.config.max_estimators,
+            "validation_fraction": self.config.validation_fraction,
+            "search_space": inspect.getsource(self.models[model_name]["search_space"]),
         }
+        setup_hash = hashlib.sha256(json.dumps(search_setup, sort_keys=True).encode()).hexdigest()
+        return (
+            f"{model_name}-{data_hash[:12]}-cv{self.config.cv_folds}-{self.config.scoring}"
+            f"-es{self.config.early_stopping_rounds}-{setup_hash[:8]}"
+        )
 
-    def train(self):
-        train_data = np.load(self.config.train_preprocess, allow_pickle=True)
-        test_data = np.load(self.config.test_preprocess, allow_pickle=True)
+    def _warm_start(self, study, model_name: str, storage):
+        """Seed a fresh study with the best parameters of the latest previous study of the same model."""
+        previous = [
+            summary for summary in optuna.get_all_study_summaries(storage)
+            if summary.study_name.startswith(f"{model_name}-")
+            and summary.study_name != study.study_name
+            and summary.best_trial is not None
+        ]
+        if not previous:
+            return
+        latest = max(previous, key=lambda summary: summary.datetime_start or datetime.min)
+        study.enqueue_trial(latest.best_trial.params, skip_if_exists=True)
+        logger.info(f"Warm-starting {study.study_name} from {latest.study_name}: {latest.best_trial.params}")
+
+    def optimize(self, model_name: str, train_x, train_y, data_hash: str):
+        """Run (or resume) the HPO study for one model and return it."""
+        storage = open_study_storage(self.config.hpo_storage)
+        workers = self.config.hpo_workers if storage is not None else 1
+        n_threads = self.config.n_jobs if self.config.n_jobs > 0 else max(1, (os.cpu_count() or 1) // workers)
+
+        study = optuna.create_study(
+            study_name=self._study_name(model_name, data_hash),
+            storage=storage,
+            direction="maximize",
+            load_if_exists=True,
+            pruner=make_pruner(self.config.pruner_warmup_folds),
+        )
+        finished = len(study.get_trials(deepcopy=False, states=FINISHED_STATES))
+        if finished:
+            logger.info(f"Resuming {study.study_name}: {finished}/{self.config.n_iter} trials already finished")
+        elif storage is not None and self.config.warm_start:
+            self._warm_start(study, model_name, storage)
 
-        train_x = train_data[:, :-1]
-        train_y = train_data[:, -1]
+        remaining = self.config.n_iter - finished
+        if remaining <= 0:
+            return study
+
+        if workers <= 1:
+            folds = build_cv_folds(model_name, train_x, train_y, self.config)
+            fixed_params = load_fixed_params(self.config)
+            study.optimize(
+                lambda trial: cross_validate_trial(trial, model_name, folds, self.config, n_threads, fixed_params),
+                n_trials=remaining,
+            )
+            return study
+
+        logger.info(f"Running {remaining} {model_name} trials across {workers} processes ({n_threads} threads each)")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_run_hpo_worker, self.config, study.study_name, model_name, remaining, n_threads)
+                for _ in range(workers)
+            ]
+            for future in futures:
+                future.result()
+
+        return optuna.load_study(study_name=study.study_name, storage=storage)
+
+    def train(self):
+        # float32 .npy written by the preprocess stage: memory-mapped, no unpickling or text parsing
+        train_x, train_y = load_training_data(self.config.train_preprocess)
+        test_data = np.load(self.config.test_preprocess, mmap_mode="r")
+        data_hash = self._data_fingerprint()
 
         best_overall = {"model_name": None, "score": 0, "std": 0, "params": None}
 
         for model_name, model_info in self.models.items():
             logger.info(f"Starting HPO for: {model_name}")
 
-            def objective(trial):
-                params = model_info["search_space"](trial)
-                model = model_info["class"](**params)
-                cv = StratifiedKFold(n_splits=self.config.cv_folds, shuffle=True, random_state=42)
-                scores = cross_val_score(
-                    model, train_x, train_y,
-                    scoring=self.config.scoring,
-                    cv=cv,
-                    n_jobs=self.config.n_jobs
-                )
-                return scores.mean()
-
-            study = optuna.create_study(direction="maximize")
-            study.optimize(objective, n_trials=self.config.n_iter)
-
-            best_params = study.best_params
+            study = self.optimize(model_name, train_x, train_y, data_hash)
+
+            best_params = {
+                **study.best_params,
+                **load_fixed_params(self.config),
+                "n_estimators": final_n_estimators(study.best_trial, self.config.max_estimators),
+            }
             best_score = study.best_value
-            best_model = model_info["class"](**best_params)
-            cv = StratifiedKFold(n_splits=self.config.cv_folds, shuffle=True, random_state=42)
-            best_scores = cross_val_score(best_model, train_x, train_y, scoring=self.config.scoring, cv=cv)
-            best_std = best_scores.std()
+            best_std = fold_score_std(study.best_trial)
 
             # Log best model per algorithm
             with mlflow.start_run(run_name=f"{model_name}_best"):
@@ -107,18 +347,11 @@ class Trainer:
                 })
 
         # Final best model
-        best_model_class = self.models[best_overall["model_name"]]["class"]
-        final_params = best_overall["params"]
-
+        best_model_info = self.models[best_overall["model_name"]]
         # Adjust verbosity for final model training
-        if best_overall["model_name"] == "XGBoost":
-            final_params["verbosity"] = 1
-        elif best_overall["model_name"] == "CatBoost":
-            final_params["verbose"] = 100
-
+        final_params = {**best_overall["params"], **best_model_info["final_params"]}
 
-        best_model = best_model_class(**final_params)
-        best_model.fit(train_x, train_y)
+        best_model = best_model_info["fit_final"](final_params, train_x, train_y)
 
         # Find optimal threshold using validation (here, use test_data for simplicity)
         # In real projects, use a separate validation set
@@ -129,15 +362,25 @@ class Trainer:
         else:
             proba = best_model.predict(test_x)
 
-        from sklearn.metrics import precision_recall_curve, f1_score
-        precisions, recalls, thresholds = precision_recall_curve(test_y, proba)
-        f1s = [f1_score(test_y, proba >= t) for t in thresholds]
-        best_idx = int(np.argmax(f1s))
-        optimal_threshold = float(thresholds[best_idx]) if len(thresholds) > 0 else 0.5
+        threshold_info = find_optimal_threshold(
+            test_y, proba,
+            objective=self.config.threshold_objective,
+            fp_cost=self.config.fp_cost,
+            fn_cost=self.config.fn_cost,
+            max_fpr=self.config.max_fpr
+        )
+        optimal_threshold = threshold_info["optimal_threshold"]
+        if threshold_info.get("feasible") is False:
+            logger.warning(
+                f"No threshold keeps the false positive rate within {self.config.max_fpr}; "
+                f"using {optimal_threshold}, which flags no transactions"
+            )
 
         # Save threshold as artifact
         threshold_path = os.path.join(self.config.root_dir, "optimal_threshold.json")
-        save_json(path=Path(threshold_path), data={"optimal_threshold": optimal_threshold})
+        save_json(path=Path(threshold_path), data=threshold_info)
+
+        compiled_path = self.export_compiled_model(best_model, test_x)
 
         # Log & register the final best model
         with mlflow.start_run(run_name=f"{best_overall['model_name']}_final"):
@@ -159,11 +402,55 @@ class Trainer:
             save_json(path=Path(best_model_info_path), data=best_overall)
             mlflow.log_artifact(best_model_info_path)
             mlflow.log_artifact(threshold_path)
+            if compiled_path is not None:
+                mlflow.log_artifact(compiled_path)
 
         logger.info(f"Best model overall in the Model Training: {best_overall}")
-        logger.info(f"Optimal threshold saved at {threshold_path}: {optimal_threshold}")
+        logger.info(f"Optimal threshold ({threshold_info['objective']}) saved at {threshold_path}: {optimal_threshold}")
         return best_overall
 
+    def export_compiled_model(self, model, reference_x):
+        """Flatten the trained ensemble into NumPy arrays for library-free inference.
+
+        The compiled scores are checked against model.predict_proba on
+        reference_x. If they disagree or the model cannot be compiled, an
+        "unavailable" marker is written instead, so the file the pipeline
+        tracks always exists, and serving falls back to the joblib model.
+        """
+        compiled_path = os.path.join(self.config.root_dir, self.config.compiled_model_name)
+        try:
+            compiled = CompiledTreeEnsemble.from_model(model)
+            max_diff = compiled.verify(model, reference_x)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping compiled model export: {e}")
+            CompiledTreeEnsemble.save_unavailable(Path(compiled_path), str(e))
+            return None
+
+        compiled.save(Path(compiled_path))
+        logger.info(f"Compiled model matches predict_proba within {max_diff:.2e}")
+        return compiled_path
+
+    def run(self):
+        """Train unless the stage cache is fresh; returns the best model info either way."""
+        root_dir = Path(self.config.root_dir)
+        cache = StageCache(
+            "training",
+            inputs=[
+                self.config.train_preprocess,
+                self.config.test_preprocess,
+                Path(self.config.train_preprocess).parent / "manifest.json",
+            ],
+            config=self.config.model_dump(exclude={"mlflow_username", "mlflow_password"}),
+            code=[__file__, metrics.__file__, compiled_model.__file__],
+            outputs=[
+                root_dir / self.config.model_name,
+                root_dir / self.config.compiled_model_name,
+                root_dir / "optimal_threshold.json",
+                root_dir / "best_model_info.json",
+            ],
+        )
+        return cache.run(self.train, load=lambda: load_json(root_dir / "best_model_info.json"))
+
 
 if __name__ == "__main__":
     from FraudGuard.config.config import ConfigurationManager
@@ -171,5 +458,5 @@ if __name__ == "__main__":
     logger.info(">>>>>> Stage: Training started <<<<<<")
     config = ConfigurationManager()
     trainer = Trainer(config=config.get_model_training_config())
-    trainer.train()
+    trainer.run()
     logger.info(">>>>>> Stage: Training completed <<<<<<")
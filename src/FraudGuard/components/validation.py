@@ -1,32 +1,127 @@
 import json
+import numpy as np
 import pandas as pd
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from FraudGuard.entity.config_entity import DataValidationConfig
+from FraudGuard.utils.stage_cache import StageCache
 from FraudGuard import logger
 
+TYPE_MAPPING = {
+    'int': ['int64', 'int32'],
+    'float': ['float64', 'float32'],
+    'object': ['object'],
+    'str': ['object'],
+}
+# Distinct values kept per text column; beyond this the cardinality is reported as a lower bound
+MAX_TRACKED_CATEGORIES = 10000
+# Text columns with at most this many values get their categories listed in the report
+MAX_LISTED_CATEGORIES = 100
+
+
+def profile_chunk(chunk: pd.DataFrame, constraints: dict) -> dict:
+    """Mergeable per-column statistics of one chunk."""
+    profiles = {}
+    for column in chunk.columns:
+        values = chunk[column]
+        rules = constraints.get(column, {})
+        present = values.dropna()
+        profile = {"dtype": str(values.dtype), "count": int(len(values)), "nulls": int(len(values) - len(present))}
+
+        if pd.api.types.is_numeric_dtype(values):
+            numbers = present.to_numpy(dtype=np.float64)
+            profile.update({
+                "min": float(numbers.min()) if len(numbers) else None,
+                "max": float(numbers.max()) if len(numbers) else None,
+                "sum": float(numbers.sum()),
+                "sum_sq": float(np.square(numbers).sum()),
+            })
+            if "min" in rules:
+                profile["below_min"] = int((numbers < rules["min"]).sum())
+            if "max" in rules:
+                profile["above_max"] = int((numbers > rules["max"]).sum())
+        else:
+            profile["distinct"] = set(present.astype(str).unique()[:MAX_TRACKED_CATEGORIES + 1])
+
+        if "allowed" in rules:
+            profile["not_allowed"] = int((~present.isin(rules["allowed"])).sum())
+        profiles[column] = profile
+    return profiles
+
+
+def merge_profiles(total: dict, chunk_profiles: dict):
+    """Fold one chunk's profiles into the running totals, in place."""
+    for column, profile in chunk_profiles.items():
+        if column not in total:
+            total[column] = {**profile, "dtypes_seen": {profile["dtype"]}}
+            continue
+        merged = total[column]
+        merged["dtypes_seen"].add(profile["dtype"])
+        for key in ("count", "nulls", "sum", "sum_sq", "below_min", "above_max", "not_allowed"):
+            if key in profile:
+                merged[key] = merged.get(key, 0) + profile[key]
+        for key, pick in (("min", min), ("max", max)):
+            if profile.get(key) is not None:
+                merged[key] = profile[key] if merged.get(key) is None else pick(merged[key], profile[key])
+        if "distinct" in profile:
+            merged.setdefault("distinct", set())
+            if len(merged["distinct"]) <= MAX_TRACKED_CATEGORIES:
+                merged["distinct"].update(profile["distinct"])
+
+
+def finalize_profile(profile: dict) -> dict:
+    """JSON-ready summary of a merged column profile."""
+    seen = profile["dtypes_seen"]
+    # A column parsed as int in one chunk and float (nulls) or object in another takes the widest type
+    if "object" in seen:
+        dtype = "object"
+    elif any(dtype.startswith("float") for dtype in seen):
+        dtype = "float64"
+    else:
+        dtype = sorted(seen)[0]
+
+    count, nulls = profile["count"], profile["nulls"]
+    summary = {
+        "dtype": dtype,
+        "count": count,
+        "nulls": nulls,
+        "null_rate": nulls / count if count else 0.0,
+    }
+    present = count - nulls
+    if "sum" in profile and dtype != "object":
+        mean = profile["sum"] / present if present else None
+        summary.update({
+            "min": profile["min"],
+            "max": profile["max"],
+            "mean": mean,
+            "std": float(np.sqrt(max(profile["sum_sq"] / present - mean ** 2, 0.0))) if present else None,
+        })
+    if "distinct" in profile:
+        summary["cardinality"] = len(profile["distinct"])
+        summary["cardinality_capped"] = len(profile["distinct"]) > MAX_TRACKED_CATEGORIES
+        if summary["cardinality"] <= MAX_LISTED_CATEGORIES:
+            summary["categories"] = sorted(profile["distinct"])
+    for key in ("below_min", "above_max", "not_allowed"):
+        if key in profile:
+            summary[key] = profile[key]
+    return summary
+
 class Validation:
     def __init__(self, config: DataValidationConfig):
         self.config = config
 
     def validate_data_types(self, data: pd.DataFrame, schema: dict) -> bool:
-        """Validates the data types of columns against the schema."""
-        type_mapping = {
-            'int': ['int64', 'int32'],
-            'float': ['float64', 'float32'],
-            'object': ['object'],
-            'str': ['object'], 
-        }
-
+        """Validates the data types of columns against the schema, logging every mismatch."""
+        is_valid = True
         for col, expected_type in schema.items():
             if col not in data.columns:
                 continue 
                 
             actual_dtype = str(data[col].dtype)
-            allowed_dtypes = type_mapping.get(expected_type, [expected_type])
-
-            if actual_dtype not in allowed_dtypes:
+            if not self._dtype_allowed(actual_dtype, expected_type):
                 logger.error(f"Column '{col}': Expected type '{expected_type}', got '{actual_dtype}'")
-                return False
-        return True
+                is_valid = False
+        return is_valid
 
     def validate_column_presence(self, data: pd.DataFrame, schema: dict) -> bool:
         """Validates that all required columns are present in the data."""
@@ -41,27 +136,106 @@ class Validation:
 
 
     def validation(self) -> bool:
-            data = pd.read_csv(self.config.unzip_file, low_memory=False)
-            schema = self.config.all_schema
-
-            logger.info(f"Starting validation for data with shape: {data.shape}")
-            
-            validation_results = {}
-            
-            validation_results['column_presence'] = self.validate_column_presence(data, schema)
-            validation_results['data_types'] = self.validate_data_types(data, schema)
-            
-            is_valid = all(validation_results.values())
-            
-            for check, result in validation_results.items():
-                logger.info(f"{check}: {'PASSED' if result else 'FAILED'}")
-            
-            logger.info(f"Overall validation status: {'PASSED' if is_valid else 'FAILED'}")
-            
-            with open(self.config.status_file, 'w') as f:
-                json.dump({"validation_status": is_valid}, f)
-                
-            return is_valid
+        """Stream the CSV in chunks, profile every column and write the full report to status_file.
+
+        Chunks are parsed one at a time and profiled on a thread pool with
+        at most 2 * n_workers chunks in flight, so memory is bounded by
+        chunk_size whatever the file size. Every check runs on the merged
+        profiles and every failure is reported, not just the first.
+        """
+        schema = self.config.all_schema
+        profiles = {}
+        rows = chunks = 0
+
+        with ThreadPoolExecutor(max_workers=self.config.n_workers, thread_name_prefix="validation") as pool:
+            in_flight = deque()
+            for chunk in pd.read_csv(self.config.unzip_file, chunksize=self.config.chunk_size):
+                rows += len(chunk)
+                chunks += 1
+                in_flight.append(pool.submit(profile_chunk, chunk, self.config.constraints))
+                if len(in_flight) >= 2 * self.config.n_workers:
+                    merge_profiles(profiles, in_flight.popleft().result())
+            while in_flight:
+                merge_profiles(profiles, in_flight.popleft().result())
+
+        logger.info(f"Starting validation for data with shape: ({rows}, {len(profiles)}) in {chunks} chunks")
+        columns = {column: finalize_profile(profile) for column, profile in profiles.items()}
+        # Zero-row frame with the whole-file dtypes, so the existing checks apply unchanged
+        typed_header = pd.DataFrame({column: pd.Series(dtype=profile["dtype"]) for column, profile in columns.items()})
+
+        errors = [f"Missing column '{column}'" for column in schema if column not in columns]
+        errors.extend(
+            f"Column '{column}': expected type '{expected}', got '{columns[column]['dtype']}'"
+            for column, expected in schema.items()
+            if column in columns and not self._dtype_allowed(columns[column]['dtype'], expected)
+        )
+        validation_results = {
+            'column_presence': self.validate_column_presence(typed_header, schema),
+            'data_types': self.validate_data_types(typed_header, schema),
+            'constraints': self.validate_constraints(columns, self.config.constraints, errors),
+        }
+
+        is_valid = all(validation_results.values())
+
+        for check, result in validation_results.items():
+            logger.info(f"{check}: {'PASSED' if result else 'FAILED'}")
+
+        logger.info(f"Overall validation status: {'PASSED' if is_valid else 'FAILED'}")
+
+        report = {
+            "validation_status": is_valid,
+            "checks": validation_results,
+            "errors": errors,
+            "rows": rows,
+            "chunks": chunks,
+            "columns": columns,
+        }
+        with open(self.config.status_file, 'w') as f:
+            json.dump(report, f, indent=4, default=str)
+
+        return is_valid
+
+    def validate_constraints(self, columns: dict, constraints: dict, errors: list) -> bool:
+        """Check the merged column profiles against schema.yaml constraints, collecting every violation."""
+        start = len(errors)
+        for column, rules in constraints.items():
+            profile = columns.get(column)
+            if profile is None:
+                continue
+            if "max_null_rate" in rules and profile["null_rate"] > rules["max_null_rate"]:
+                errors.append(f"Column '{column}': null rate {profile['null_rate']:.4f} > {rules['max_null_rate']}")
+            if profile.get("below_min"):
+                errors.append(f"Column '{column}': {profile['below_min']} values below min {rules['min']}")
+            if profile.get("above_max"):
+                errors.append(f"Column '{column}': {profile['above_max']} values above max {rules['max']}")
+            if profile.get("not_allowed"):
+                errors.append(f"Column '{column}': {profile['not_allowed']} values outside {rules['allowed']}")
+            if "max_cardinality" in rules and profile.get("cardinality", 0) > rules["max_cardinality"]:
+                errors.append(
+                    f"Column '{column}': cardinality {profile['cardinality']} > {rules['max_cardinality']}"
+                )
+
+        for error in errors[start:]:
+            logger.error(error)
+        return len(errors) == start
+
+    @staticmethod
+    def _dtype_allowed(actual_dtype: str, expected_type: str) -> bool:
+        return actual_dtype in TYPE_MAPPING.get(expected_type, [expected_type])
+
+    def run(self) -> bool:
+        cache = StageCache(
+            "validation",
+            inputs=[self.config.unzip_file],
+            config=self.config.model_dump(),
+            code=[__file__],
+            outputs=[self.config.status_file],
+        )
+        return cache.run(self.validation, load=self._load_status)
+
+    def _load_status(self) -> bool:
+        with open(self.config.status_file) as f:
+            return json.load(f)["validation_status"]
 
 
 if __name__ == "__main__":
@@ -70,5 +244,5 @@ if __name__ == "__main__":
     logger.info(">>>>>> Stage: Validation started <<<<<<")
     config = ConfigurationManager()
     validation = Validation(config=config.get_data_validation_config())
-    validation.validation()
+    validation.run()
     logger.info(">>>>>> Stage: Validation completed <<<<<<")
\ No newline at end of file
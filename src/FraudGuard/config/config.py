@@ -1,6 +1,6 @@
 from FraudGuard.constants.paths import *
 from FraudGuard.utils.helpers import *
-from FraudGuard.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig
+from FraudGuard.entity.config_entity import DataIngestionConfig, DataValidationConfig, DataTransformationConfig, ModelTrainerConfig, ModelEvaluationConfig, ModelExplanationConfig, ServingConfig
 
 
 
@@ -20,6 +20,7 @@ class ConfigurationManager:
     
     def get_data_ingestion_config(self) -> DataIngestionConfig:
         config = self.config['ingestion']
+        params = self.params['ingestion']
 
         create_directories([config['root_dir']])
 
@@ -28,7 +29,10 @@ class ConfigurationManager:
             bucket=config['bucket'],
             region=config['region'],
             data_path=config['data_path'],
-            download_data=Path(config['download_data'])
+            download_data=Path(config['download_data']),
+            part_size_mb=params['part_size_mb'],
+            max_concurrency=params['max_concurrency'],
+            max_parallel_objects=params['max_parallel_objects']
         )
         return data_ingestion_config
     
@@ -36,6 +40,7 @@ class ConfigurationManager:
     def get_data_validation_config(self) -> DataValidationConfig:
         config = self.config['validation']
         schema = self.schema['columns']
+        params = self.params['validation']
         
         create_directories([config['root_dir']])
         
@@ -44,6 +49,9 @@ class ConfigurationManager:
             status_file=config['status_file'],
             unzip_file=config['unzip_file'],
             all_schema=schema,
+            constraints=self.schema.get('constraints', {}),
+            chunk_size=params['chunk_size'],
+            n_workers=params['n_workers'],
         )
         return data_validation_config
     
@@ -52,6 +60,7 @@ class ConfigurationManager:
         config = self.config['transform']
         schema = self.schema
         params = self.params['train_test_split']
+        rebalance_params = self.params['rebalance']
 
         create_directories([config['root_dir']])
         
@@ -65,7 +74,16 @@ class ConfigurationManager:
             numeric_columns=schema['numeric_columns'],
             columns_to_drop=schema['data_cleaning']['columns_to_drop'],
             test_size=params['test_size'],
-            random_state=params['random_state']
+            random_state=params['random_state'],
+            streaming=params['streaming'],
+            chunk_size=params['chunk_size'],
+            split_key=params['split_key'],
+            reference_bins=self.params['monitoring']['reference_bins'],
+            rebalance_strategy=rebalance_params['strategy'],
+            k_neighbors=rebalance_params['k_neighbors'],
+            rebalance_n_jobs=rebalance_params['n_jobs'],
+            working_memory_mb=rebalance_params['working_memory_mb'],
+            trace_memory=rebalance_params['trace_memory']
         )
         
         return data_transformation_config
@@ -76,6 +94,8 @@ class ConfigurationManager:
         config = self.config['trainer']
         schema = self.schema
         cv_params = self.params['cross_validation']
+        hpo_params = self.params['hpo']
+        threshold_params = self.params['threshold']
         mlflow_params = self.params['mlflow']
 
         create_directories([config['root_dir']])
@@ -85,11 +105,23 @@ class ConfigurationManager:
             train_preprocess=config['train_preprocess'],
             test_preprocess=config['test_preprocess'],
             model_name=config['model_name'],
+            compiled_model_name=config['compiled_model_name'],
             target_column=schema['target_column']['name'],
             cv_folds=cv_params['cv_folds'],            
             scoring=cv_params['scoring'],             
             n_jobs=cv_params['n_jobs'],
             n_iter=cv_params['n_iter'],
+            hpo_storage=hpo_params['storage'],
+            hpo_workers=hpo_params['n_workers'],
+            pruner_warmup_folds=hpo_params['pruner_warmup_folds'],
+            warm_start=hpo_params['warm_start'],
+            max_estimators=hpo_params['max_estimators'],
+            early_stopping_rounds=hpo_params['early_stopping_rounds'],
+            validation_fraction=hpo_params['validation_fraction'],
+            threshold_objective=threshold_params['objective'],
+            fp_cost=threshold_params['fp_cost'],
+            fn_cost=threshold_params['fn_cost'],
+            max_fpr=threshold_params['max_fpr'],
             mlflow_username= mlflow_params['mlflow_username'],
             mlflow_password= mlflow_params['mlflow_password'],          
         )
@@ -99,6 +131,7 @@ class ConfigurationManager:
 
     def get_model_evaluation_config(self) -> ModelEvaluationConfig:
         config = self.config['evaluation']
+        params = self.params['evaluation']
         schema = self.schema['target_column']
         mlflow_params = self.params['mlflow']
 
@@ -107,12 +140,21 @@ class ConfigurationManager:
         model_evaluation_config = ModelEvaluationConfig(
             root_dir= config['root_dir'],
             test_path= config['test_path'],
+            test_preprocess= config['test_preprocess'],
+            manifest_path= config['manifest_path'],
             model_path= config['model_path'],
             preprocess_path= config['preprocess_path'],
             metrics_path= config['metrics_path'],
             target_column= schema['name'],
             cm_path= config['cm_path'],
             roc_path= config['roc_path'],
+            shap_values_path= config['shap_values_path'],
+            threshold_path= config['threshold_path'],
+            curves_path= config['curves_path'],
+            label_encoder_path= config['label_encoder_path'],
+            replay_path= config['replay_path'],
+            replay= params['replay'],
+            replay_chunk_rows= params['replay_chunk_rows'],
             mlflow_username= mlflow_params['mlflow_username'],
             mlflow_password= mlflow_params['mlflow_password'],
             experiment_name= mlflow_params['experiment_name'],
@@ -120,3 +162,44 @@ class ConfigurationManager:
         )
 
         return model_evaluation_config
+
+
+    def get_model_explanation_config(self) -> ModelExplanationConfig:
+        config = self.config['explanation']
+        params = self.params['shap']
+        schema = self.schema['target_column']
+
+        create_directories([config['root_dir']])
+
+        model_explanation_config = ModelExplanationConfig(
+            root_dir=config['root_dir'],
+            test_preprocess=config['test_preprocess'],
+            manifest_path=config['manifest_path'],
+            model_path=config['model_path'],
+            shap_values_path=config['shap_values_path'],
+            target_column=schema['name'],
+            sample_size=params['sample_size'],
+            min_per_class=params['min_per_class'],
+            chunk_size=params['chunk_size'],
+            n_workers=params['n_workers'],
+            random_state=params['random_state']
+        )
+
+        return model_explanation_config
+
+
+    def get_serving_config(self) -> ServingConfig:
+        params = self.params['serving']
+        monitoring_params = self.params['monitoring']
+
+        serving_config = ServingConfig(
+            max_batch_size=params['max_batch_size'],
+            max_wait_ms=params['max_wait_ms'],
+            batch_workers=params['batch_workers'],
+            explain_top_k=params['explain_top_k'],
+            explain_cache_size=params['explain_cache_size'],
+            explain_budget_ms=params['explain_budget_ms'],
+            drift_psi_threshold=monitoring_params['psi_threshold']
+        )
+
+        return serving_config
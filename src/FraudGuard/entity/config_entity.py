@@ -10,6 +10,9 @@ class DataIngestionConfig(BaseModel):
     region: str = "us-east-1"
     data_path: str
     download_data: Path
+    part_size_mb: int = 8
+    max_concurrency: int = 8
+    max_parallel_objects: int = 4
 
     class Config:
         frozen = True
@@ -21,6 +24,9 @@ class DataValidationConfig(BaseModel):
     unzip_file: Path
     status_file: Path
     all_schema: Dict[str, Any]
+    constraints: Dict[str, Any] = {}
+    chunk_size: int = 100000
+    n_workers: int = 4
 
     class Config:
         frozen = True
@@ -38,6 +44,15 @@ class DataTransformationConfig(BaseModel):
     columns_to_drop: List[str]
     test_size: float = 0.2
     random_state: int = 42
+    streaming: bool = False
+    chunk_size: int = 100000
+    split_key: str = "Transaction_ID"
+    reference_bins: int = 10
+    rebalance_strategy: str = "smote_tomek"
+    k_neighbors: int = 5
+    rebalance_n_jobs: int = -1
+    working_memory_mb: int = 256
+    trace_memory: bool = False
 
     class Config:
         frozen = True
@@ -50,10 +65,22 @@ class ModelTrainerConfig(BaseModel):
     test_preprocess: Path
     model_name: str
     target_column: str
+    compiled_model_name: str = "compiled_model.npz"
     n_iter: int = 10
     cv_folds: int = 5
     scoring: str = "f1"
     n_jobs: int = -1
+    hpo_storage: str = ""
+    hpo_workers: int = 1
+    pruner_warmup_folds: int = 1
+    warm_start: bool = True
+    max_estimators: int = 1000
+    early_stopping_rounds: int = 30
+    validation_fraction: float = 0.15
+    threshold_objective: str = "f1"
+    fp_cost: float = 1.0
+    fn_cost: float = 1.0
+    max_fpr: float = 0.01
     mlflow_username: str = ""
     mlflow_password: str = ""
 
@@ -65,16 +92,57 @@ class ModelEvaluationConfig(BaseModel):
     """Configuration for model evaluation stage."""
     root_dir: Path
     test_path: Path
+    test_preprocess: Path
+    manifest_path: Path
     preprocess_path: Path
     model_path: Path
     metrics_path: str
     target_column: str
     cm_path: Path
     roc_path: Path
+    shap_values_path: Path = Path("artifacts/explanation/shap_values.npz")
+    threshold_path: Path = Path("artifacts/trainer/optimal_threshold.json")
+    curves_path: Path = Path("artifacts/evaluation/curves.json")
+    label_encoder_path: Path = Path("artifacts/transform/preprocess/label_encoders.pkl")
+    replay_path: Path = Path("artifacts/evaluation/replay_report.json")
+    replay: bool = True
+    replay_chunk_rows: int = 50000
     mlflow_username: str = ""
     mlflow_password: str = ""
     experiment_name: str = "Fraud-Detection"
     tracking_uri: str = ""
 
     class Config:
-        frozen = True
\ No newline at end of file
+        frozen = True
+
+
+class ModelExplanationConfig(BaseModel):
+    """Configuration for the SHAP explanation stage."""
+    root_dir: Path
+    test_preprocess: Path
+    manifest_path: Path
+    model_path: Path
+    shap_values_path: Path
+    target_column: str
+    sample_size: int = 2000
+    min_per_class: int = 200
+    chunk_size: int = 250
+    n_workers: int = 4
+    random_state: int = 42
+
+    class Config:
+        frozen = True
+
+
+class ServingConfig(BaseModel):
+    """Configuration for the online scoring service."""
+    max_batch_size: int = 64
+    max_wait_ms: float = 2.0
+    batch_workers: int = 1
+    drift_psi_threshold: float = 0.2
+    explain_top_k: int = 5
+    explain_cache_size: int = 10000
+    explain_budget_ms: float = 5.0
+
+    class Config:
+        frozen = True
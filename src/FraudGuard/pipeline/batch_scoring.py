@@ -0,0 +1,139 @@
+import time
+import queue
+import argparse
+import threading
+import pandas as pd
+from pathlib import Path
+from FraudGuard import logger
+from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+
+_END = object()
+
+
+class BatchScorer:
+    """Stream a CSV or Parquet file through PredictionPipeline in fixed-size chunks.
+
+    A reader thread parses the next chunks while the current one is being
+    scored, and each chunk's predictions are appended to the output
+    before the next one is taken. At most ``prefetch + 1`` chunks are in
+    memory at once, whatever the file size.
+    """
+
+    def __init__(self, pipeline: PredictionPipeline = None, chunk_size: int = 100000, prefetch: int = 2,
+                 id_columns: list = None):
+        self.pipeline = pipeline or PredictionPipeline()
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        # Identifier columns copied to the output next to the predictions
+        if id_columns is None:
+            id_columns = self.pipeline.schema['data_cleaning']['columns_to_drop']
+        self.id_columns = list(id_columns)
+
+    def _read_chunks(self, input_path: Path):
+        suffix = input_path.suffix.lower()
+        if suffix == ".csv":
+            yield from pd.read_csv(input_path, chunksize=self.chunk_size)
+        elif suffix in (".parquet", ".pq"):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(input_path).iter_batches(batch_size=self.chunk_size):
+                yield batch.to_pandas()
+        else:
+            raise ValueError(f"Unsupported input format: {input_path}")
+
+    def _prefetch_chunks(self, input_path: Path):
+        """Yield chunks parsed ahead of time on a reader thread."""
+        chunks = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def reader():
+            try:
+                for chunk in self._read_chunks(input_path):
+                    if not put(chunk):
+                        return
+                put(_END)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=reader, name="batch-scoring-reader", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            thread.join()
+
+    def score_file(self, input_path: Path, output_path: Path) -> dict:
+        """Score input_path into output_path (CSV or Parquet, chosen by suffix) and return throughput stats."""
+        input_path, output_path = Path(input_path), Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        out_format = output_path.suffix.lower()
+        if out_format not in (".csv", ".parquet", ".pq"):
+            raise ValueError(f"Unsupported output format: {output_path}")
+
+        writer = None
+        rows = chunks = 0
+        start = time.perf_counter()
+        try:
+            for chunk in self._prefetch_chunks(input_path):
+                predictions = self.pipeline.score_frame(chunk)
+                ids = [column for column in self.id_columns if column in chunk.columns]
+                result = pd.concat([chunk[ids], predictions], axis=1)
+
+                if out_format == ".csv":
+                    result.to_csv(output_path, mode="w" if chunks == 0 else "a", header=chunks == 0, index=False)
+                else:
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+                    table = pa.Table.from_pandas(result, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output_path, table.schema)
+                    writer.write_table(table)
+
+                rows += len(chunk)
+                chunks += 1
+                elapsed = time.perf_counter() - start
+                logger.info(f"Scored chunk {chunks}: {rows} rows, {rows / elapsed:,.0f} rows/s")
+        finally:
+            if writer is not None:
+                writer.close()
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "rows": rows,
+            "chunks": chunks,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        logger.info(f"Batch scoring of {input_path} complete: {stats}")
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file of transactions in streaming chunks.")
+    parser.add_argument("input", type=Path, help="CSV or Parquet file of raw transactions")
+    parser.add_argument("output", type=Path, help="destination .csv or .parquet for the predictions")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="rows per chunk")
+    parser.add_argument("--prefetch", type=int, default=2, help="chunks read ahead while scoring")
+    args = parser.parse_args(argv)
+
+    scorer = BatchScorer(chunk_size=args.chunk_size, prefetch=args.prefetch)
+    return scorer.score_file(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
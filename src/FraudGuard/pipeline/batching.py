@@ -0,0 +1,179 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from FraudGuard import logger
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row requests into one scoring call.
+
+    Requests are queued on the event loop. A background task takes up to
+    ``max_batch_size`` of them, waiting at most ``max_wait_ms`` after the
+    first one arrives. It scores them as one block on a worker thread and
+    resolves each caller's future with its own row's result. Up to
+    ``workers`` batches are scored concurrently; while they all are, new
+    requests keep queueing, so batches grow with load.
+    """
+
+    BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+    def __init__(self, score_fn, max_batch_size: int = 64, max_wait_ms: float = 2.0, workers: int = 1):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.workers = workers
+        self._queue = None
+        self._task = None
+        self._executor = None
+        self._in_flight = set()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self._batches = 0
+        self._rows = 0
+        self._errors = 0
+        self._max_batch = 0
+        self._wait_seconds = 0.0
+        self._max_wait_seconds = 0.0
+        self._score_seconds = 0.0
+        self._size_histogram = [0] * (len(self.BATCH_SIZE_BUCKETS) + 1)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="micro-batcher")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Micro-batcher started (max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:g})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Batches already handed to the executor finish and answer their callers
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def submit(self, record: dict) -> dict:
+        """Queue one record and wait for its result."""
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((record, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        # Up to `workers` batches are scored at once; while all are busy, new requests keep queueing
+        slots = asyncio.Semaphore(self.workers)
+        while True:
+            await slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                slots.release()
+                raise
+            task = asyncio.get_running_loop().create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        dispatched = time.perf_counter()
+        records = [record for record, _, _ in batch]
+        try:
+            results = await loop.run_in_executor(self._executor, self.score_fn, records)
+        except Exception as e:
+            self._errors += 1
+            logger.error(f"Micro-batch of {len(batch)} rows failed, rescoring rows one at a time: {e}")
+            # Isolate the failure so only the callers whose own record is bad get an error
+            outcomes = (
+                await loop.run_in_executor(self._executor, self._score_each, records)
+                if len(records) > 1 else [(None, e)]
+            )
+            for (_, future, _), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+            return
+
+        self._record(batch, dispatched, time.perf_counter() - dispatched)
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _score_each(self, records: list) -> list:
+        """(result, exception) per record, scoring each on its own."""
+        outcomes = []
+        for record in records:
+            try:
+                outcomes.append((self.score_fn([record])[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    def _record(self, batch: list, dispatched: float, score_seconds: float):
+        size = len(batch)
+        self._batches += 1
+        self._rows += size
+        self._max_batch = max(self._max_batch, size)
+        self._score_seconds += score_seconds
+        for _, _, enqueued in batch:
+            waited = dispatched - enqueued
+            self._wait_seconds += waited
+            self._max_wait_seconds = max(self._max_wait_seconds, waited)
+        bucket = next((i for i, bound in enumerate(self.BATCH_SIZE_BUCKETS) if size <= bound), len(self.BATCH_SIZE_BUCKETS))
+        self._size_histogram[bucket] += 1
+
+    def stats(self) -> dict:
+        """Queue depth, batch size and wait-time metrics for tuning max_batch_size/max_wait_ms."""
+        labels = [f"<={bound}" for bound in self.BATCH_SIZE_BUCKETS] + [f">{self.BATCH_SIZE_BUCKETS[-1]}"]
+        return {
+            "running": self.running,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "rows": self._rows,
+            "errors": self._errors,
+            "mean_batch_size": self._rows / self._batches if self._batches else 0.0,
+            "max_batch_size_seen": self._max_batch,
+            "batch_size_histogram": dict(zip(labels, self._size_histogram)),
+            "mean_wait_ms": 1000 * self._wait_seconds / self._rows if self._rows else 0.0,
+            "max_wait_ms_seen": 1000 * self._max_wait_seconds,
+            "mean_score_ms": 1000 * self._score_seconds / self._batches if self._batches else 0.0,
+        }
@@ -0,0 +1,269 @@
+import os
+import json
+import tempfile
+import numpy as np
+from pathlib import Path
+from FraudGuard import logger
+
+
+class CompiledTreeEnsemble:
+    """Tree ensemble flattened into NumPy node arrays and scored without the training library.
+
+    Every node of every tree lives in one set of arrays. A row goes to
+    ``left`` when ``x < threshold`` (or, for a missing value, when
+    ``default_left`` is set). Leaves point back at themselves and have
+    ``feature == -1``, so all trees can be walked in lockstep for
+    ``max_depth`` steps with no per-tree branching. The fraud
+    probability is ``sigmoid(base_margin + sum of leaf values)``.
+    """
+
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "default_left", "roots")
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 base_margin: float, max_depth: int, n_features: int, source: str = "", children=None):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float32)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float32)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.base_margin = float(base_margin)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.source = source
+        self.classes_ = np.array([0, 1])
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        if children is None:
+            children = np.column_stack([self.left, self.right]).ravel()
+        self.children = np.asarray(children, dtype=np.int32)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_model(cls, model) -> "CompiledTreeEnsemble":
+        """Export a fitted XGBClassifier or CatBoostClassifier."""
+        if hasattr(model, "get_booster"):
+            return cls.from_xgboost(model)
+        if hasattr(model, "get_all_params") and hasattr(model, "save_model"):
+            return cls.from_catboost(model)
+        raise TypeError(f"Cannot compile model of type {type(model).__name__}")
+
+    @classmethod
+    def from_xgboost(cls, model) -> "CompiledTreeEnsemble":
+        booster = model.get_booster() if hasattr(model, "get_booster") else model
+        learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Only binary:logistic XGBoost models can be compiled, got {objective}")
+        if learner["gradient_booster"]["name"] != "gbtree":
+            raise ValueError(f"Only gbtree boosters can be compiled, got {learner['gradient_booster']['name']}")
+
+        trees = learner["gradient_booster"]["model"]["trees"]
+        best_iteration = booster.attr("best_iteration")
+        if best_iteration is not None:
+            # predict_proba only uses trees up to best_iteration after early stopping
+            per_round = int(learner["gradient_booster"]["model"]["gbtree_model_param"]["num_parallel_tree"])
+            trees = trees[: (int(best_iteration) + 1) * per_round]
+
+        base_score = float(learner["learner_model_param"]["base_score"])
+        arrays = {name: [] for name in cls.ARRAYS}
+        max_depth = 0
+        offset = 0
+        for tree in trees:
+            left = np.asarray(tree["left_children"], dtype=np.int64)
+            right = np.asarray(tree["right_children"], dtype=np.int64)
+            is_leaf = left == -1
+            nodes = np.arange(len(left))
+
+            arrays["feature"].append(np.where(is_leaf, -1, tree["split_indices"]))
+            arrays["threshold"].append(np.where(is_leaf, 0.0, tree["split_conditions"]))
+            arrays["left"].append(np.where(is_leaf, nodes, left) + offset)
+            arrays["right"].append(np.where(is_leaf, nodes, right) + offset)
+            # leaf values are stored in split_conditions for leaf nodes
+            arrays["value"].append(np.where(is_leaf, tree["split_conditions"], 0.0))
+            arrays["default_left"].append(np.asarray(tree["default_left"], dtype=bool))
+            arrays["roots"].append([offset])
+
+            max_depth = max(max_depth, _tree_depth(left, right))
+            offset += len(left)
+
+        return cls(
+            **{name: np.concatenate(parts) if parts else [] for name, parts in arrays.items()},
+            base_margin=np.log(base_score / (1.0 - base_score)),
+            max_depth=max_depth,
+            n_features=int(learner["learner_model_param"]["num_feature"]),
+            source="xgboost",
+        )
+
+    @classmethod
+    def from_catboost(cls, model) -> "CompiledTreeEnsemble":
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_path = os.path.join(tmp_dir, "model.json")
+            model.save_model(json_path, format="json")
+            with open(json_path) as f:
+                dump = json.load(f)
+
+        if dump["features_info"].get("categorical_features"):
+            raise ValueError("CatBoost models with categorical features cannot be compiled")
+
+        float_features = {
+            f["feature_index"]: f for f in dump["features_info"].get("float_features", [])
+        }
+        scale, biases = dump["scale_and_bias"]
+        bias = biases[0] if isinstance(biases, list) else biases
+
+        arrays = {name: [] for name in cls.ARRAYS}
+        max_depth = 0
+        offset = 0
+        for tree in dump["oblivious_trees"]:
+            splits = tree["splits"]
+            leaf_values = np.asarray(tree["leaf_values"], dtype=np.float64) * scale
+            depth = len(splits)
+            n_internal = 2 ** depth - 1
+
+            # Expand the oblivious tree into a complete binary tree in breadth-first
+            # order. Level d tests splits[d]; going right sets bit d of the leaf index.
+            feature, threshold, default_left = [], [], []
+            for level in range(depth):
+                split = splits[level]
+                info = float_features[split["float_feature_index"]]
+                border = np.float32(split["border"])
+                feature.extend([info["flat_feature_index"]] * 2 ** level)
+                # CatBoost goes right when x > border, i.e. left when x < nextafter(border)
+                with np.errstate(over="ignore"):
+                    threshold.extend([np.nextafter(border, np.float32(np.inf))] * 2 ** level)
+                default_left.extend([info.get("nan_value_treatment") != "AsTrue"] * 2 ** level)
+
+            nodes = np.arange(n_internal)
+            leaf_nodes = np.arange(n_internal, 2 * n_internal + 1)
+            levels = np.floor(np.log2(nodes + 1)).astype(np.int64)
+            position = nodes + 1 - 2 ** levels
+            leaf_position = leaf_nodes - n_internal
+            # position in level encodes the decisions so far, most recent decision last
+            leaf_index = np.array([_reverse_bits(p, depth) for p in leaf_position], dtype=np.int64)
+
+            arrays["feature"].append(np.concatenate([feature, np.full(len(leaf_nodes), -1)]))
+            arrays["threshold"].append(np.concatenate([threshold, np.zeros(len(leaf_nodes))]))
+            arrays["left"].append(np.concatenate([_child(levels, position, 0), leaf_nodes]) + offset)
+            arrays["right"].append(np.concatenate([_child(levels, position, 1), leaf_nodes]) + offset)
+            arrays["value"].append(np.concatenate([np.zeros(n_internal), leaf_values[leaf_index]]))
+            arrays["default_left"].append(np.concatenate([default_left, np.ones(len(leaf_nodes), dtype=bool)]))
+            arrays["roots"].append([offset])
+
+            max_depth = max(max_depth, depth)
+            offset += 2 * n_internal + 1
+
+        return cls(
+            **{name: np.concatenate(parts) if parts else [] for name, parts in arrays.items()},
+            base_margin=bias,
+            max_depth=max_depth,
+            n_features=len(float_features),
+            source="catboost",
+        )
+
+    def decision_function(self, X, chunk_size: int = 4096) -> np.ndarray:
+        """Raw margin for every row, walking all trees at once in row chunks."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+
+        children = self.children
+        margin = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            block = X[start:start + chunk_size]
+            flat = block.ravel()
+            row_offset = (np.arange(len(block), dtype=np.int64) * self.n_features)[:, np.newaxis]
+            has_nan = bool(np.isnan(flat).any())
+            nodes = np.repeat(self.roots[np.newaxis, :], len(block), axis=0)
+            for _ in range(self.max_depth):
+                # leaves have feature -1 and point at themselves, so the value read for them is irrelevant
+                x = flat.take(row_offset + self.feature.take(nodes))
+                go_right = x >= self.threshold.take(nodes)
+                if has_nan:
+                    go_right = np.where(np.isnan(x), ~self.default_left.take(nodes), go_right)
+                nodes = children.take(2 * nodes + go_right)
+            margin[start:start + chunk_size] = self.value.take(nodes).sum(axis=1, dtype=np.float64)
+        return margin + self.base_margin
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities shaped like the sklearn API: column 1 is the fraud class."""
+        fraud = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - fraud, fraud])
+
+    def verify(self, model, X, atol: float = 1e-5) -> float:
+        """Check the compiled scores against the source model and return the max abs difference."""
+        expected = model.predict_proba(X)[:, 1]
+        actual = self.predict_proba(X)[:, 1]
+        max_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+        if max_diff > atol:
+            raise ValueError(f"Compiled model deviates from {self.source} predict_proba by {max_diff:.2e} (atol={atol})")
+        return max_diff
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            **{name: getattr(self, name) for name in self.ARRAYS},
+            meta=np.array(json.dumps({
+                "base_margin": self.base_margin,
+                "max_depth": self.max_depth,
+                "n_features": self.n_features,
+                "source": self.source,
+            })),
+        )
+        logger.info(f"Compiled {self.source} ensemble ({self.n_trees} trees, {self.n_nodes} nodes) saved at: {path}")
+
+    @staticmethod
+    def save_unavailable(path: Path, reason: str):
+        """Write a marker in place of the export, so the file always exists for the pipeline to track."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, meta=np.array(json.dumps({"unavailable": reason})))
+        logger.info(f"No compiled ensemble exported ({reason}); marker saved at: {path}")
+
+    @staticmethod
+    def available(path: Path) -> bool:
+        """True when path holds a compiled ensemble rather than nothing or an unavailable marker."""
+        if not Path(path).exists():
+            return False
+        with np.load(path, allow_pickle=False) as data:
+            return "unavailable" not in json.loads(str(data["meta"]))
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledTreeEnsemble":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if "unavailable" in meta:
+                raise ValueError(f"{path} holds no compiled ensemble: {meta['unavailable']}")
+            return cls(**{name: data[name] for name in cls.ARRAYS}, **meta)
+
+
+def _tree_depth(left, right) -> int:
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [child for node in frontier if left[node] != -1 for child in (left[node], right[node])]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def _child(levels, position, direction):
+    """Breadth-first index of the child of (level, position) in a complete binary tree."""
+    return 2 ** (levels + 1) - 1 + 2 * position + direction
+
+
+def _reverse_bits(value: int, width: int) -> int:
+    result = 0
+    for _ in range(width):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
@@ -0,0 +1,271 @@
+import math
+import json
+import bisect
+import threading
+import numpy as np
+import pandas as pd
+from FraudGuard import logger
+
+PROFILE_VERSION = 1
+# Floor for empty bins so PSI stays finite
+PSI_EPSILON = 1e-4
+# Distinct unknown values remembered per column, for the metrics endpoint only
+MAX_UNKNOWN_EXAMPLES = 20
+
+
+def psi(expected_counts, actual_counts) -> float:
+    """Population stability index between two histograms over the same bins."""
+    expected = np.asarray(expected_counts, dtype=np.float64)
+    actual = np.asarray(actual_counts, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return 0.0
+    expected = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    actual = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def category_positions(index: pd.Index, values: pd.Series) -> np.ndarray:
+    """Position of every value in a precompiled category index, -1 for values not in it."""
+    if not pd.api.types.is_object_dtype(values) and not pd.api.types.is_string_dtype(values):
+        values = values.astype(str)
+    return index.get_indexer(values)
+
+
+class ReferenceProfileBuilder:
+    """Training-time distribution of every model input, for drift monitoring at serving time.
+
+    Numeric columns get quantile bin edges from the first block passed to
+    update(), and every block adds to the bin counts. Calling update()
+    once with the whole train split gives exact quantile bins; the
+    streaming preprocess calls it once per chunk. Categorical columns get
+    a count per known category. Category codes are mapped back to the raw
+    strings with the fitted label encoders.
+    """
+
+    def __init__(self, numeric_columns: list, label_encoders: dict, bins: int = 10):
+        self.numeric_columns = list(numeric_columns)
+        self.label_encoders = label_encoders
+        self.bins = bins
+        self.rows = 0
+        self.numeric = {}
+        self.categorical = {
+            column: {"categories": [str(c) for c in encoder.classes_], "counts": np.zeros(len(encoder.classes_), np.int64)}
+            for column, encoder in label_encoders.items()
+        }
+
+    def update(self, frame: pd.DataFrame):
+        self.rows += len(frame)
+        for column in self.numeric_columns:
+            if column not in frame.columns:
+                continue
+            values = frame[column].to_numpy(dtype=np.float64)
+            present = values[~np.isnan(values)]
+            if column not in self.numeric:
+                quantiles = np.linspace(0, 1, self.bins + 1)[1:-1]
+                edges = np.unique(np.quantile(present, quantiles)) if len(present) else np.array([])
+                self.numeric[column] = {
+                    "edges": edges,
+                    "counts": np.zeros(len(edges) + 1, np.int64),
+                    "nulls": 0,
+                    "min": math.inf,
+                    "max": -math.inf,
+                }
+            profile = self.numeric[column]
+            profile["counts"] += np.bincount(
+                np.searchsorted(profile["edges"], present, side="right"), minlength=len(profile["counts"])
+            )
+            profile["nulls"] += int(len(values) - len(present))
+            if len(present):
+                profile["min"] = min(profile["min"], float(present.min()))
+                profile["max"] = max(profile["max"], float(present.max()))
+
+        for column, profile in self.categorical.items():
+            if column in frame.columns:
+                codes = frame[column].to_numpy(dtype=np.int64)
+                profile["counts"] += np.bincount(codes, minlength=len(profile["counts"]))[: len(profile["counts"])]
+
+    def result(self) -> dict:
+        return {
+            "version": PROFILE_VERSION,
+            "rows": self.rows,
+            "numeric": {
+                column: {
+                    "edges": profile["edges"].tolist(),
+                    "counts": profile["counts"].tolist(),
+                    "nulls": profile["nulls"],
+                    "min": profile["min"],
+                    "max": profile["max"],
+                }
+                for column, profile in self.numeric.items()
+            },
+            "categorical": {
+                column: {"categories": profile["categories"], "counts": profile["counts"].tolist()}
+                for column, profile in self.categorical.items()
+            },
+        }
+
+
+class DriftMonitor:
+    """Fixed-size online histograms of serving inputs, compared with the training reference.
+
+    For each numeric feature it keeps one counter per reference bin plus
+    counts of values outside the training [min, max] and of missing or
+    non-finite values. For each categorical feature it keeps one counter
+    per known category plus an unknown counter and a few example unknown
+    values. Memory does not grow with traffic. A single record costs one
+    bisect or dict lookup per feature under a lock. snapshot() computes
+    PSI against the reference.
+    """
+
+    def __init__(self, reference: dict, psi_threshold: float = 0.2):
+        if reference.get("version") != PROFILE_VERSION:
+            raise ValueError(f"Unsupported reference profile version {reference.get('version')}")
+        self.reference = reference
+        self.psi_threshold = psi_threshold
+        self._lock = threading.Lock()
+        self._numeric = {
+            column: (profile["edges"], profile["min"], profile["max"])
+            for column, profile in reference["numeric"].items()
+        }
+        self._category_index = {
+            column: {category: i for i, category in enumerate(profile["categories"])}
+            for column, profile in reference["categorical"].items()
+        }
+        # Frames are looked up with Index.get_indexer instead of a per-row dict lookup
+        self.category_lookup = {
+            column: pd.Index(profile["categories"]) for column, profile in reference["categorical"].items()
+        }
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rows = 0
+            self.counts = {column: [0] * (len(edges) + 1) for column, (edges, _, _) in self._numeric.items()}
+            self.out_of_range = {column: 0 for column in self._numeric}
+            self.invalid = {column: 0 for column in self._numeric}
+            self.category_counts = {column: [0] * len(index) for column, index in self._category_index.items()}
+            self.unknown = {column: 0 for column in self._category_index}
+            self.unknown_examples = {column: set() for column in self._category_index}
+
+    def observe_record(self, record: dict):
+        """Count one transaction dict."""
+        with self._lock:
+            self.rows += 1
+            for column, (edges, low, high) in self._numeric.items():
+                value = record.get(column)
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    value = math.nan
+                if not math.isfinite(value):
+                    self.invalid[column] += 1
+                    continue
+                self.counts[column][bisect.bisect_right(edges, value)] += 1
+                if value < low or value > high:
+                    self.out_of_range[column] += 1
+
+            for column, index in self._category_index.items():
+                category = str(record.get(column))
+                position = index.get(category)
+                if position is None:
+                    self._count_unknown(column, [category])
+                else:
+                    self.category_counts[column][position] += 1
+
+    def observe_frame(self, frame: pd.DataFrame, positions: dict = None):
+        """Count a block of raw transactions with one vectorised pass per feature.
+
+        positions maps a categorical column to the position of each row's
+        value in the reference categories (-1 when unknown), for callers
+        that have already encoded the block. Other categorical columns are
+        looked up in category_lookup here.
+        """
+        if len(frame) == 0:
+            return
+        positions = positions or {}
+        numeric_updates = {}
+        for column, (edges, low, high) in self._numeric.items():
+            if column not in frame.columns:
+                continue
+            values = pd.to_numeric(frame[column], errors="coerce").to_numpy(dtype=np.float64)
+            finite = values[np.isfinite(values)]
+            bins = np.bincount(np.searchsorted(edges, finite, side="right"), minlength=len(edges) + 1)
+            numeric_updates[column] = (bins, int(((finite < low) | (finite > high)).sum()), len(values) - len(finite))
+
+        category_updates = {}
+        for column, index in self.category_lookup.items():
+            if column not in frame.columns:
+                continue
+            codes = positions.get(column)
+            if codes is None:
+                codes = category_positions(index, frame[column])
+            unknown = codes < 0
+            # Only the (rare) unknown rows are stringified, for the examples
+            unknown_values = frame[column][unknown].astype(str) if unknown.any() else frame[column][:0]
+            category_updates[column] = (np.bincount(codes[~unknown], minlength=len(index)), unknown_values)
+
+        with self._lock:
+            self.rows += len(frame)
+            for column, (bins, out_of_range, invalid) in numeric_updates.items():
+                self.counts[column] = [a + int(b) for a, b in zip(self.counts[column], bins)]
+                self.out_of_range[column] += out_of_range
+                self.invalid[column] += invalid
+            for column, (bins, unknown_values) in category_updates.items():
+                self.category_counts[column] = [a + int(b) for a, b in zip(self.category_counts[column], bins)]
+                if len(unknown_values):
+                    self._count_unknown(column, unknown_values.unique()[:MAX_UNKNOWN_EXAMPLES], len(unknown_values))
+
+    def _count_unknown(self, column: str, values, count: int = None):
+        self.unknown[column] += len(values) if count is None else count
+        examples = self.unknown_examples[column]
+        for value in values:
+            if len(examples) >= MAX_UNKNOWN_EXAMPLES:
+                break
+            examples.add(value)
+
+    def snapshot(self) -> dict:
+        """Per-feature PSI, out-of-range and unknown-category statistics since the last reset."""
+        with self._lock:
+            rows = self.rows
+            counts = {column: list(values) for column, values in self.counts.items()}
+            category_counts = {column: list(values) for column, values in self.category_counts.items()}
+            out_of_range, invalid = dict(self.out_of_range), dict(self.invalid)
+            unknown = dict(self.unknown)
+            unknown_examples = {column: sorted(values) for column, values in self.unknown_examples.items()}
+
+        features = {}
+        for column, profile in self.reference["numeric"].items():
+            features[column] = {
+                "type": "numeric",
+                "psi": psi(profile["counts"], counts[column]),
+                "histogram": counts[column],
+                "out_of_range": out_of_range[column],
+                "invalid": invalid[column],
+            }
+        for column, profile in self.reference["categorical"].items():
+            observed = category_counts[column]
+            # Unknown values form an extra bin that the reference never saw
+            features[column] = {
+                "type": "categorical",
+                "psi": psi(profile["counts"] + [0], observed + [unknown[column]]),
+                "counts": dict(zip(profile["categories"], observed)),
+                "unknown": unknown[column],
+                "unknown_rate": unknown[column] / rows if rows else 0.0,
+                "unknown_examples": unknown_examples[column],
+            }
+
+        drifted = sorted(column for column, stats in features.items() if stats["psi"] > self.psi_threshold)
+        return {
+            "rows": rows,
+            "reference_rows": self.reference["rows"],
+            "psi_threshold": self.psi_threshold,
+            "drifted_features": drifted,
+            "features": features,
+        }
+
+    @classmethod
+    def from_file(cls, path, psi_threshold: float = 0.2):
+        with open(path) as f:
+            reference = json.load(f)
+        logger.info(f"Drift monitor loaded reference profile from {path} ({reference['rows']} rows)")
+        return cls(reference, psi_threshold=psi_threshold)
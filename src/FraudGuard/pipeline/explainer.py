@@ -0,0 +1,131 @@
+import time
+import threading
+import joblib
+import numpy as np
+from pathlib import Path
+from collections import OrderedDict
+from FraudGuard.utils.telemetry import REGISTRY, SampledLogger
+from FraudGuard import logger
+
+EXPLAIN_BUDGET_EXCEEDED = REGISTRY.counter(
+    "fraudguard_explain_budget_exceeded_total",
+    "Contribution calls whose per-row latency exceeded the configured explanation budget.",
+)
+budget_log = SampledLogger(logger, every=100)
+
+
+class ContributionCache:
+    """Thread-safe LRU of per-row contributions, keyed on the preprocessed float32 feature row."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return row
+
+    def put(self, key: bytes, row: np.ndarray):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._rows[key] = row
+            self._rows.move_to_end(key)
+            while len(self._rows) > self.maxsize:
+                self._rows.popitem(last=False)
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class NativeExplainer:
+    """Per-row feature contributions from the trained model's own TreeSHAP.
+
+    XGBoost's pred_contribs and CatBoost's ShapValues return, for every
+    row, one additive contribution per feature plus the bias in log-odds,
+    so their sum is the model margin and its sigmoid is the fraud
+    probability. Scoring and explaining therefore take one native call.
+    Rows seen before are served from an LRU cache; only the misses of a
+    block go to the model, as one batch.
+    """
+
+    def __init__(self, model, feature_names: list, cache_size: int = 10000, budget_ms: float = 5.0):
+        self.model = model
+        self.feature_names = list(feature_names)
+        self.cache = ContributionCache(cache_size)
+        self.budget_ms = budget_ms
+        if hasattr(model, "get_booster"):
+            self._contributions = self._xgboost_contributions
+        elif hasattr(model, "get_feature_importance"):
+            self._contributions = self._catboost_contributions
+        else:
+            raise TypeError(f"No native contribution output for {type(model).__name__}")
+
+    @classmethod
+    def from_file(cls, model_path: Path, feature_names: list, **kwargs) -> "NativeExplainer":
+        model_path = Path(model_path)
+        if not model_path.exists():
+            raise FileNotFoundError(f"Explanations need the trained model at {model_path}")
+        start = time.perf_counter()
+        explainer = cls(joblib.load(model_path), feature_names, **kwargs)
+        logger.info(f"Loaded {type(explainer.model).__name__} for explanations in {time.perf_counter() - start:.3f}s")
+        return explainer
+
+    def _xgboost_contributions(self, X: np.ndarray) -> np.ndarray:
+        import xgboost as xgb
+
+        return self.model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True)
+
+    def _catboost_contributions(self, X: np.ndarray) -> np.ndarray:
+        from catboost import Pool
+
+        return self.model.get_feature_importance(Pool(X), type="ShapValues")
+
+    def contributions(self, X: np.ndarray):
+        """Fraud probabilities and (rows, features + 1) contributions, the last column being the bias."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        keys = [row.tobytes() for row in X]
+        contributions = np.empty((len(X), len(self.feature_names) + 1), dtype=np.float64)
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                contributions[i] = cached
+
+        if missing:
+            start = time.perf_counter()
+            computed = np.asarray(self._contributions(X[missing]), dtype=np.float64)
+            per_row_ms = (time.perf_counter() - start) * 1000 / len(missing)
+            if per_row_ms > self.budget_ms:
+                EXPLAIN_BUDGET_EXCEEDED.inc()
+                budget_log.info("Explanations took %.2f ms per row, over the %.2f ms budget", per_row_ms, self.budget_ms)
+            contributions[missing] = computed
+            for i, row in zip(missing, computed):
+                self.cache.put(keys[i], row)
+
+        probabilities = 1.0 / (1.0 + np.exp(-contributions.sum(axis=1)))
+        return probabilities, contributions
+
+    def top_contributions(self, contributions: np.ndarray, top_k: int) -> list:
+        """The top_k features of each row by absolute contribution, largest first."""
+        features = contributions[:, :-1]
+        top_k = min(top_k, features.shape[1])
+        # argpartition then a sort of only k entries per row
+        top = np.argpartition(-np.abs(features), top_k - 1, axis=1)[:, :top_k]
+        order = np.take_along_axis(-np.abs(features), top, axis=1).argsort(axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        return [
+            [{"feature": self.feature_names[j], "contribution": float(row[j])} for j in indices]
+            for row, indices in zip(features, top.tolist())
+        ]
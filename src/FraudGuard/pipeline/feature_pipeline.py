@@ -13,15 +13,14 @@ class FeaturePipeline:
 
         data_ingestion_config = config.get_data_ingestion_config()
         data_ingestion = Ingestion(config=data_ingestion_config)
-        data_ingestion.download_file()
+        data_ingestion.run()
 
         data_validation_config = config.get_data_validation_config()
         data_validation = Validation(data_validation_config)
-        data_validation.validation()
+        data_validation.run()
 
         data_transformation_config = config.get_data_transformation_config()
         data_transformation = Transform(config=data_transformation_config)
-        train, test = data_transformation.train_test_splitting()
-        train_processed, test_processed = data_transformation.preprocess_features(train, test)
+        data_transformation.run()
 
 
@@ -1,36 +1,133 @@
 import os
 import json
 import joblib
+import threading
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from FraudGuard.utils.helpers import *
+from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+from FraudGuard.pipeline.serving_bundle import ServingBundle
+from FraudGuard.pipeline.drift_monitor import DriftMonitor, category_positions
+from FraudGuard.pipeline.explainer import NativeExplainer
+from FraudGuard.utils.telemetry import INFERENCE_LATENCY, PREDICTIONS, SampledLogger
 from FraudGuard import logger
 
+# Unknown categories share the code of encoder.classes_[0], which is what the
+# model has always been served for values it never saw during training.
+UNKNOWN_CATEGORY_CODE = 0
+
+# One in this many single predictions is logged at info level
+PREDICTION_LOG_EVERY = 100
+prediction_log = SampledLogger(logger, every=PREDICTION_LOG_EVERY)
+
 
 class PredictionPipeline:
-    def __init__(self):
+    def __init__(self, use_bundle: bool = True):
         self.schema = read_yaml(Path('config_file/schema.yaml'))
         self.preprocessor_path = Path('artifacts/transform/preprocess/preprocessor.pkl')
         self.model_path = Path('artifacts/trainer/model.joblib')
+        self.compiled_model_path = Path('artifacts/trainer/compiled_model.npz')
         self.label_encoders_path = Path('artifacts/transform/preprocess/label_encoders.pkl')
         self.threshold_path = Path('artifacts/trainer/optimal_threshold.json')
+        self.bundle_dir = Path('artifacts/serving')
+        self.reference_profile_path = Path('artifacts/transform/process/reference_profile.json')
 
         self.numerical_columns = self.schema['numeric_columns']
         self.categorical_columns = self.schema['categorical_columns']
         self.target_column = self.schema['target_column']['name']
+        self.monitor = self._load_monitor()
+        self._explainer = None
+        self._explainer_lock = threading.Lock()
 
-        # Validate required files exist
-        for path in [self.preprocessor_path, self.model_path, self.label_encoders_path]:
+        self.bundle = None
+        if use_bundle and ServingBundle.exists(self.bundle_dir):
+            stale = ServingBundle.stale_sources(self.bundle_dir)
+            if not stale:
+                self._load_bundle()
+                return
+            # e.g. retrained without rebuilding the bundle: serve the new artifacts, not the old bundle
+            logger.warning(f"Serving bundle at {self.bundle_dir} is out of date with {stale}; loading the training artifacts")
+
+        # Validate required files exist; the joblib model is only needed when no compiled export exists
+        model_path = self.compiled_model_path if CompiledTreeEnsemble.available(self.compiled_model_path) else self.model_path
+        for path in [self.preprocessor_path, model_path, self.label_encoders_path]:
             if not path.exists():
                 raise Exception(f'File {path} not found')
             
         self.preprocessor = joblib.load(self.preprocessor_path)
-        self.model = joblib.load(self.model_path)
+        if model_path == self.compiled_model_path:
+            self.model = CompiledTreeEnsemble.load(self.compiled_model_path)
+        else:
+            self.model = joblib.load(self.model_path)
         self.label_encoders = joblib.load(self.label_encoders_path)
+        self.category_tables = self._compile_label_encoders(self.label_encoders)
+        self.category_index = self._compile_category_index(self.category_tables)
+        self.feature_layout = self._compile_feature_layout()
         
         # Load optimal threshold from training artifact (with fallback)
         self.optimal_threshold = self._load_optimal_threshold()
-    
+
+    def _load_bundle(self):
+        """Map the serving bundle read-only instead of unpickling the training artifacts."""
+        self.bundle = ServingBundle.load(self.bundle_dir)
+        self.preprocessor = None
+        self.label_encoders = None
+        self.model = self.bundle.compiled_model()
+        self.category_tables = {
+            column: {str(category): code for code, category in enumerate(self.bundle.categories(column))}
+            for column in self.bundle.manifest["categorical_columns"]
+        }
+        self.category_index = self._compile_category_index(self.category_tables)
+        columns = self.bundle.feature_columns
+        self.feature_layout = {
+            "columns": columns,
+            "tables": [self.category_tables.get(column) for column in columns],
+            "mean": self.bundle.arrays["scaler.mean"],
+            "scale": self.bundle.arrays["scaler.scale"],
+        }
+        self.optimal_threshold = self.bundle.threshold
+        logger.info(f"Loaded serving bundle from {self.bundle_dir}")
+
+    def _load_monitor(self):
+        """Drift monitor over the training reference profile, or None when there is no profile."""
+        if not self.reference_profile_path.exists():
+            logger.warning(f"No reference profile at {self.reference_profile_path}; drift monitoring disabled")
+            return None
+        from FraudGuard.config.config import ConfigurationManager
+
+        serving_config = ConfigurationManager().get_serving_config()
+        return DriftMonitor.from_file(self.reference_profile_path, psi_threshold=serving_config.drift_psi_threshold)
+
+    @property
+    def explainer(self) -> NativeExplainer:
+        """Native-model explainer, loaded on the first request that asks for contributions."""
+        if self._explainer is None:
+            with self._explainer_lock:
+                if self._explainer is None:
+                    from FraudGuard.config.config import ConfigurationManager
+
+                    serving_config = ConfigurationManager().get_serving_config()
+                    self._explainer = NativeExplainer.from_file(
+                        self.model_path, self._feature_names(),
+                        cache_size=serving_config.explain_cache_size,
+                        budget_ms=serving_config.explain_budget_ms,
+                    )
+        return self._explainer
+
+    def _feature_names(self) -> list:
+        """Names of the model's input columns, in the order preprocessing emits them."""
+        if self.feature_layout is not None:
+            return list(self.feature_layout["columns"])
+        return [name.split("__", 1)[-1] for name in self.preprocessor.get_feature_names_out()]
+
+    @property
+    def artifact_paths(self):
+        """Artifacts this pipeline was built from, in load order."""
+        if self.bundle is not None:
+            return [self.bundle.manifest_path]
+        return [self.preprocessor_path, self.model_path, self.compiled_model_path, self.label_encoders_path, self.threshold_path]
+
     def _load_optimal_threshold(self) -> float:
         """Load optimal threshold from training artifact, fallback to default if not found."""
         default_threshold = 0.25
@@ -49,22 +146,99 @@ class PredictionPipeline:
             logger.warning(f"Threshold artifact not found at {self.threshold_path}. Using default: {default_threshold}")
             return default_threshold
 
+    @staticmethod
+    def _compile_label_encoders(label_encoders: dict) -> dict:
+        """Turn fitted LabelEncoders into plain category -> code lookup tables."""
+        return {
+            column: {str(category): code for code, category in enumerate(encoder.classes_)}
+            for column, encoder in label_encoders.items()
+        }
+
+    @staticmethod
+    def _compile_category_index(category_tables: dict) -> dict:
+        """Category lookup tables as pd.Index objects, whose positions are the codes, for encoding whole frames."""
+        return {column: pd.Index(list(table)) for column, table in category_tables.items()}
+
+    def _compile_feature_layout(self):
+        """Flatten the fitted ColumnTransformer into per-output-column scaling parameters.
+
+        Returns None when the preprocessor contains anything other than
+        StandardScaler/passthrough blocks, in which case the fast path
+        falls back to preprocess_data.
+        """
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import StandardScaler
+
+        if not hasattr(self.preprocessor, 'transformers_') or not hasattr(self.preprocessor, 'feature_names_in_'):
+            return None
+
+        input_columns = list(self.preprocessor.feature_names_in_)
+        columns, means, scales = [], [], []
+        for _, transformer, selection in self.preprocessor.transformers_:
+            if isinstance(transformer, str) and transformer == 'drop':
+                continue
+            selected = [input_columns[c] if isinstance(c, (int, np.integer)) else c for c in selection]
+
+            if isinstance(transformer, str) and transformer == 'passthrough':
+                mean, scale = np.zeros(len(selected)), np.ones(len(selected))
+            else:
+                steps = [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+                if len(steps) != 1 or not isinstance(steps[0], StandardScaler):
+                    return None
+                scaler = steps[0]
+                mean = scaler.mean_ if scaler.with_mean else np.zeros(len(selected))
+                scale = scaler.scale_ if scaler.with_std else np.ones(len(selected))
+
+            columns.extend(selected)
+            means.append(np.asarray(mean, dtype=np.float64))
+            scales.append(np.asarray(scale, dtype=np.float64))
+
+        return {
+            "columns": columns,
+            "tables": [self.category_tables.get(column) for column in columns],
+            "mean": np.concatenate(means),
+            "scale": np.concatenate(scales),
+        }
+
+    def transform_record(self, record: dict) -> np.ndarray:
+        """Pandas-free preprocessing of one validated transaction into a float32 feature row.
+
+        Applies the same category codes and StandardScaler arithmetic as
+        preprocess_data, in the ColumnTransformer's output order, so the row
+        equals preprocess_data(...).astype(np.float32) bit for bit.
+        """
+        layout = self.feature_layout
+        if layout is None:
+            return self.preprocess_data(pd.DataFrame([record])).astype(np.float32)[0]
+        if self.monitor is not None:
+            self.monitor.observe_record(record)
+
+        row = np.empty(len(layout["columns"]), dtype=np.float64)
+        for i, (column, table) in enumerate(zip(layout["columns"], layout["tables"])):
+            value = record[column]
+            row[i] = table.get(str(value), UNKNOWN_CATEGORY_CODE) if table is not None else value
+
+        row -= layout["mean"]
+        row /= layout["scale"]
+        return row.astype(np.float32)
+
     def preprocess_data(self, input_data):
         """Preprocess input data for prediction."""
         if not isinstance(input_data, pd.DataFrame):
             raise TypeError("Input data must be a pandas DataFrame")
         
         data = input_data.copy()
-        
+
         # Encode categorical features
+        positions = {}
         for column in self.categorical_columns:
-            if column in data.columns and column in self.label_encoders:
-                encoder = self.label_encoders[column]
-                known_categories = set(encoder.classes_)
-                data[column] = data[column].astype(str).apply(
-                    lambda x: x if x in known_categories else encoder.classes_[0]
-                )
-                data[column] = encoder.transform(data[column].astype(str))
+            if column in data.columns and column in self.category_index:
+                positions[column] = category_positions(self.category_index[column], data[column])
+                data[column] = np.where(positions[column] >= 0, positions[column], UNKNOWN_CATEGORY_CODE)
+
+        # Codes and reference categories both follow encoder.classes_, so the monitor reuses them
+        if self.monitor is not None:
+            self.monitor.observe_frame(input_data, positions=positions)
 
         # Convert to numeric
         for column in self.numerical_columns:
@@ -72,6 +246,14 @@ class PredictionPipeline:
                 data[column] = data[column].astype(float)
 
         try:
+            if self.preprocessor is None:
+                # Serving bundle: same StandardScaler arithmetic, applied to the mapped parameters
+                layout = self.feature_layout
+                matrix = data[layout["columns"]].to_numpy(dtype=np.float64)
+                matrix -= layout["mean"]
+                matrix /= layout["scale"]
+                return matrix
+
             if hasattr(self.preprocessor, 'feature_names_in_'):
                 required_columns = list(self.preprocessor.feature_names_in_)
                 data = data[required_columns]
@@ -80,26 +262,109 @@ class PredictionPipeline:
         except Exception as e:
             raise RuntimeError(f'Error during preprocessing: {str(e)}')
 
-    def predict(self, input_data):
-        processed_data = self.preprocess_data(input_data)
-        
-        # Get prediction probabilities
-        prediction_proba = self.model.predict_proba(processed_data)[0]
-        
+    def _score(self, processed_data) -> np.ndarray:
+        """Fraud-class probability for every row of a preprocessed block."""
+        prediction_proba = self.model.predict_proba(processed_data)
+
         # Correct probability extraction for fraud class (class 1)
-        fraud_probability = prediction_proba[1] if len(prediction_proba) > 1 else prediction_proba[0]
-        
-        # Use optimal threshold loaded from training artifact
-        prediction = 1 if fraud_probability >= self.optimal_threshold else 0
-        
-        fraud_status = "Yes" if prediction == 1 else "No"
-        
-        # Debug information
-        logger.info(f"Fraud probability: {fraud_probability:.4f}, Threshold: {self.optimal_threshold}, Prediction: {fraud_status}")
+        return prediction_proba[:, 1] if prediction_proba.shape[1] > 1 else prediction_proba[:, 0]
 
-        return {
+    def _decide(self, fraud_probabilities: np.ndarray):
+        """Vectorised fraud status and confidence for an array of probabilities."""
+        threshold = float(self.optimal_threshold)
+        distance = np.abs(fraud_probabilities - threshold)
+        confidence = np.where(distance > 0.2, "High", np.where(distance > 0.1, "Medium", "Low"))
+        fraud_status = np.where(fraud_probabilities >= threshold, "Yes", "No")
+        return fraud_status, confidence
+
+    def _format_results(self, fraud_probabilities: np.ndarray, endpoint: str = "single") -> list:
+        """Turn fraud probabilities into per-row status/confidence dicts."""
+        threshold = float(self.optimal_threshold)
+        fraud_status, confidence = self._decide(fraud_probabilities)
+        fraud_count = int(np.count_nonzero(fraud_status == "Yes"))
+        PREDICTIONS.inc(fraud_count, endpoint=endpoint, outcome="fraud")
+        PREDICTIONS.inc(len(fraud_status) - fraud_count, endpoint=endpoint, outcome="legit")
+
+        return [
+            {
+                "fraud_status": status,
+                "fraud_probability": probability,
+                "threshold_used": threshold,
+                "confidence": level,
+            }
+            for status, probability, level in zip(
+                fraud_status.tolist(), fraud_probabilities.astype(float).tolist(), confidence.tolist()
+            )
+        ]
+
+    def _timed_results(self, preprocess, endpoint: str, top_k: int = 0) -> list:
+        """Run preprocess, model and postprocess for one call, recording each stage's latency.
+
+        With top_k, the native model scores and explains the block in one
+        call (recorded as the "explain" stage) and every result carries its
+        top_k feature contributions in log-odds.
+        """
+        with INFERENCE_LATENCY.time(endpoint=endpoint, stage="preprocess"):
+            processed_data = preprocess()
+        if top_k:
+            with INFERENCE_LATENCY.time(endpoint=endpoint, stage="explain"):
+                fraud_probabilities, contributions = self.explainer.contributions(processed_data)
+        else:
+            with INFERENCE_LATENCY.time(endpoint=endpoint, stage="model"):
+                fraud_probabilities = self._score(processed_data)
+        with INFERENCE_LATENCY.time(endpoint=endpoint, stage="postprocess"):
+            results = self._format_results(fraud_probabilities, endpoint=endpoint)
+            if top_k:
+                top = self.explainer.top_contributions(contributions, top_k)
+                for result, features, base_value in zip(results, top, contributions[:, -1].tolist()):
+                    result["base_value"] = base_value
+                    result["top_contributions"] = features
+            return results
+
+    def score_frame(self, input_data) -> pd.DataFrame:
+        """Columnar predictions for a DataFrame block, aligned with its index."""
+        fraud_probabilities = self._score(self.preprocess_data(input_data))
+        fraud_status, confidence = self._decide(fraud_probabilities)
+        return pd.DataFrame({
+            "fraud_probability": fraud_probabilities,
             "fraud_status": fraud_status,
-            "fraud_probability": float(fraud_probability),
-            "threshold_used": float(self.optimal_threshold),
-            "confidence": "High" if abs(fraud_probability - self.optimal_threshold) > 0.2 else "Medium" if abs(fraud_probability - self.optimal_threshold) > 0.1 else "Low"
-        }
+            "confidence": confidence,
+        }, index=input_data.index)
+
+    def predict(self, input_data):
+        # Use optimal threshold loaded from training artifact
+        result = self._timed_results(lambda: self.preprocess_data(input_data)[:1], endpoint="single")[0]
+
+        prediction_log.info(
+            "Fraud probability: %.4f, Threshold: %s, Prediction: %s",
+            result['fraud_probability'], self.optimal_threshold, result['fraud_status']
+        )
+
+        return result
+
+    def predict_record(self, record: dict) -> dict:
+        """Score a single transaction dict through the fast path."""
+        return self._timed_results(lambda: self.transform_record(record)[np.newaxis, :], endpoint="single")[0]
+
+    def predict_records(self, records: list, endpoint: str = "predict", top_k: int = 0) -> list:
+        """Score a list of transaction dicts as one matrix through the fast path."""
+        if not records:
+            return []
+
+        if self.feature_layout is None:
+            return self.predict_batch(pd.DataFrame(records), endpoint=endpoint, top_k=top_k)
+
+        def transform():
+            matrix = np.empty((len(records), len(self.feature_layout["columns"])), dtype=np.float32)
+            for i, record in enumerate(records):
+                matrix[i] = self.transform_record(record)
+            return matrix
+
+        return self._timed_results(transform, endpoint=endpoint, top_k=top_k)
+
+    def predict_batch(self, input_data, endpoint: str = "batch", top_k: int = 0) -> list:
+        """Score a block of transactions with one preprocessing pass and one model call."""
+        if len(input_data) == 0:
+            return []
+
+        return self._timed_results(lambda: self.preprocess_data(input_data), endpoint=endpoint, top_k=top_k)
@@ -1,7 +1,9 @@
 from FraudGuard.utils.logging import logger
 from FraudGuard.config.config import ConfigurationManager
 from FraudGuard.components.training import Trainer
+from FraudGuard.components.explanation import Explanation
 from FraudGuard.components.evaluation import Evaluation
+from FraudGuard.pipeline.serving_bundle import build_serving_bundle
 
 class ModelPipeline:
     def __init__(self):
@@ -12,8 +14,15 @@ class ModelPipeline:
 
         model_training_config = config.get_model_training_config()
         model_trainer = Trainer(config=model_training_config)
-        model_trainer.train()
+        model_trainer.run()
+
+        # Rebuild the serving bundle so the API does not keep scoring with the previous model
+        build_serving_bundle()
+
+        model_explanation_config = config.get_model_explanation_config()
+        model_explanation = Explanation(config=model_explanation_config)
+        model_explanation.run()
 
         model_evaluation_config = config.get_model_evaluation_config()
         model_evaluation = Evaluation(config=model_evaluation_config)
-        model_evaluation.evaluation()
+        model_evaluation.run()
@@ -0,0 +1,63 @@
+import time
+import threading
+from datetime import datetime, timezone
+from FraudGuard.utils.helpers import get_file_hash
+from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+from FraudGuard import logger
+
+
+class ModelRegistry:
+    """Process-wide holder that loads the inference artifacts once and shares them across requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pipeline = None
+        self._load_seconds = None
+        self._loaded_at = None
+        self._fingerprints = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._pipeline is not None
+
+    def get(self) -> PredictionPipeline:
+        """Return the shared pipeline, loading the artifacts on first use."""
+        if self._pipeline is None:
+            with self._lock:
+                if self._pipeline is None:
+                    self._load()
+        return self._pipeline
+
+    def reload(self) -> PredictionPipeline:
+        """Force a reload, e.g. after a new model has been trained."""
+        with self._lock:
+            self._load()
+        return self._pipeline
+
+    def _load(self):
+        start = time.perf_counter()
+        pipeline = PredictionPipeline()
+        load_seconds = time.perf_counter() - start
+
+        fingerprints = {}
+        for path in pipeline.artifact_paths:
+            if path.exists():
+                fingerprints[str(path)] = get_file_hash(path)[:16]
+
+        self._pipeline = pipeline
+        self._load_seconds = load_seconds
+        self._loaded_at = datetime.now(timezone.utc).isoformat()
+        self._fingerprints = fingerprints
+        logger.info(f"Model artifacts loaded in {load_seconds:.3f}s: {fingerprints}")
+
+    def info(self) -> dict:
+        """Load metadata for health reporting."""
+        return {
+            "loaded": self.is_loaded,
+            "loaded_at": self._loaded_at,
+            "load_seconds": round(self._load_seconds, 4) if self._load_seconds is not None else None,
+            "artifacts": dict(self._fingerprints),
+        }
+
+
+model_registry = ModelRegistry()
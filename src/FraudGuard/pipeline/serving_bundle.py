@@ -0,0 +1,195 @@
+import os
+import json
+import shutil
+import numpy as np
+from pathlib import Path
+from FraudGuard import logger
+from FraudGuard.utils.helpers import get_file_hash
+from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+
+BUNDLE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def _source_record(path: Path) -> dict:
+    stat = path.stat()
+    return {"sha256": get_file_hash(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class ServingBundle:
+    """Directory of raw .npy arrays plus a JSON manifest, opened with np.load(mmap_mode='r').
+
+    It holds everything the online path needs: the compiled trees, the
+    scaler parameters in feature order, and one array of known categories
+    per categorical column. Uvicorn workers that map the same files share
+    one copy in the page cache. Loading only reads the manifest, so cold
+    start does not grow with model size.
+    """
+
+    def __init__(self, root_dir: Path, manifest: dict, arrays: dict):
+        self.root_dir = Path(root_dir)
+        self.manifest = manifest
+        self.arrays = arrays
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root_dir / MANIFEST_NAME
+
+    @property
+    def feature_columns(self) -> list:
+        return self.manifest["feature_columns"]
+
+    @property
+    def threshold(self) -> float:
+        return float(self.manifest["optimal_threshold"])
+
+    def categories(self, column: str) -> np.ndarray:
+        return self.arrays[f"categories.{column}"]
+
+    def compiled_model(self) -> CompiledTreeEnsemble:
+        """Tree scorer backed by the mapped arrays (no copy for matching dtypes)."""
+        trees = {name: self.arrays[f"trees.{name}"] for name in CompiledTreeEnsemble.ARRAYS}
+        return CompiledTreeEnsemble(**trees, children=self.arrays["trees.children"], **self.manifest["trees"])
+
+    @classmethod
+    def exists(cls, root_dir: Path) -> bool:
+        return (Path(root_dir) / MANIFEST_NAME).exists()
+
+    @classmethod
+    def stale_sources(cls, root_dir: Path) -> list:
+        """Source artifacts whose size or mtime differs from when the bundle was built.
+
+        Only stat() calls, so the check costs the same whatever the model
+        size; the content hashes in the manifest are for build and deploy
+        tooling. Sources that are no longer on disk are not reported, so a
+        deployment that ships only the bundle still serves it.
+        """
+        with open(Path(root_dir) / MANIFEST_NAME) as f:
+            sources = json.load(f).get("sources", {})
+        stale = []
+        for path, recorded in sources.items():
+            if not Path(path).exists():
+                continue
+            stat = Path(path).stat()
+            # Bundles written before sizes and mtimes were recorded hold a bare hash: treat them as stale
+            if not isinstance(recorded, dict) or (stat.st_size, stat.st_mtime_ns) != (recorded.get("size"), recorded.get("mtime_ns")):
+                stale.append(path)
+        return stale
+
+    @classmethod
+    def write(cls, root_dir: Path, feature_columns: list, mean: np.ndarray, scale: np.ndarray,
+              categories: dict, model: CompiledTreeEnsemble, threshold: float, sources: list = ()) -> "ServingBundle":
+        """Build a bundle next to root_dir, then swap it in with two renames.
+
+        The previous bundle is renamed aside before the new one takes its
+        place, so root_dir is only missing between two renames, never while
+        files are written. A pipeline created in that instant finds no
+        manifest and loads the training artifacts instead. Workers that
+        still map the previous bundle keep reading the unlinked files until
+        they reload.
+        """
+        root_dir = Path(root_dir)
+        staging_dir = root_dir.with_name(root_dir.name + ".tmp")
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+
+        arrays = {
+            "scaler.mean": np.asarray(mean, dtype=np.float64),
+            "scaler.scale": np.asarray(scale, dtype=np.float64),
+            "trees.children": model.children,
+        }
+        arrays.update({f"trees.{name}": getattr(model, name) for name in CompiledTreeEnsemble.ARRAYS})
+        arrays.update({f"categories.{column}": np.asarray(values, dtype=str) for column, values in categories.items()})
+
+        manifest = {
+            "version": BUNDLE_VERSION,
+            "feature_columns": list(feature_columns),
+            "categorical_columns": list(categories),
+            "optimal_threshold": float(threshold),
+            "trees": {
+                "base_margin": model.base_margin,
+                "max_depth": model.max_depth,
+                "n_features": model.n_features,
+                "source": model.source,
+            },
+            "arrays": {},
+            "sources": {str(path): _source_record(Path(path)) for path in sources if Path(path).exists()},
+        }
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            file_name = f"{name}.npy"
+            np.save(staging_dir / file_name, array, allow_pickle=False)
+            manifest["arrays"][name] = {"file": file_name, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+        with open(staging_dir / MANIFEST_NAME, "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        previous_dir = root_dir.with_name(root_dir.name + ".old")
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if root_dir.exists():
+            os.replace(root_dir, previous_dir)
+        os.replace(staging_dir, root_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        logger.info(f"Serving bundle written at: {root_dir} ({len(arrays)} arrays)")
+        return cls.load(root_dir)
+
+    @classmethod
+    def load(cls, root_dir: Path, mmap: bool = True) -> "ServingBundle":
+        root_dir = Path(root_dir)
+        with open(root_dir / MANIFEST_NAME) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported serving bundle version {manifest.get('version')} in {root_dir}")
+
+        arrays = {
+            name: np.load(root_dir / spec["file"], mmap_mode="r" if mmap else None, allow_pickle=False)
+            for name, spec in manifest["arrays"].items()
+        }
+        return cls(root_dir, manifest, arrays)
+
+
+def build_serving_bundle(root_dir: Path = Path("artifacts/serving")):
+    """Build the bundle from the preprocess and training artifacts in the working directory.
+
+    When the model has no compiled export or the preprocessor cannot be
+    expressed as scaler arrays, root_dir is left as an empty directory
+    (no manifest) and None is returned; serving then loads the training
+    artifacts instead of a previous, now stale, bundle.
+    """
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+
+    pipeline = PredictionPipeline(use_bundle=False)
+    reason = None
+    if not isinstance(pipeline.model, CompiledTreeEnsemble):
+        reason = f"{pipeline.compiled_model_path} holds no compiled ensemble"
+    elif pipeline.feature_layout is None:
+        reason = "the fitted preprocessor cannot be expressed as scaler arrays"
+    if reason is not None:
+        root_dir = Path(root_dir)
+        shutil.rmtree(root_dir, ignore_errors=True)
+        root_dir.mkdir(parents=True)
+        logger.warning(f"No serving bundle built at {root_dir}: {reason}; serving loads the training artifacts")
+        return None
+
+    layout = pipeline.feature_layout
+    categories = {
+        column: encoder.classes_
+        for column, encoder in pipeline.label_encoders.items()
+        if column in layout["columns"]
+    }
+    return ServingBundle.write(
+        root_dir,
+        feature_columns=layout["columns"],
+        mean=layout["mean"],
+        scale=layout["scale"],
+        categories=categories,
+        model=pipeline.model,
+        threshold=pipeline.optimal_threshold,
+        sources=pipeline.artifact_paths,
+    )
+
+
+if __name__ == "__main__":
+    logger.info(">>>>>> Stage: Serving bundle started <<<<<<")
+    build_serving_bundle()
+    logger.info(">>>>>> Stage: Serving bundle completed <<<<<<")
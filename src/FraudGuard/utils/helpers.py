@@ -1,10 +1,8 @@
 import os
 import json
+import hashlib
 import joblib
-import boto3
 import yaml
-import mlflow
-import dagshub
 from typing import Any
 from pathlib import Path
 from FraudGuard.utils.logging import logger
@@ -14,23 +12,13 @@ from ensure import ensure_annotations
 
 @ensure_annotations
 def download_from_s3(bucket: str, s3_path: str, local_path: Path, aws_region: str = None) -> bool:
-    """Download a file from an S3 bucket."""
+    """Download a file from an S3 bucket (parallel ranged parts, resumable, size/ETag verified)."""
+    from FraudGuard.utils.s3_transfer import S3Downloader
+
     try:
-        profile = os.getenv('AWS_PROFILE')
-        if profile:
-            session = boto3.Session(profile_name=profile)
-        else:
-            session = boto3.Session()
-
-        s3_client = session.client(
-            's3',
-            region_name=aws_region or os.getenv('AWS_REGION', 'us-east-1')
-        )
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        s3_client.download_file(bucket, s3_path, str(local_path))
-        logger.info(f"Downloaded s3://{bucket}/{s3_path} to {local_path}")
+        S3Downloader(region=aws_region).download(bucket, s3_path, local_path)
         return True
-    except ClientError as e:
+    except (ClientError, IOError) as e:
         logger.error(f"Failed to download s3://{bucket}/{s3_path}: {str(e)}")
         return False
 
@@ -121,6 +109,24 @@ def get_size(path: Path) -> str:
     return f"~ {size_in_kb} KB"
 
 
+@ensure_annotations
+def get_file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """sha256 of a file's contents
+
+    Args:
+        path (Path): path of the file
+        chunk_size (int, optional): bytes read per iteration. Defaults to 1 MiB.
+
+    Returns:
+        str: hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 _mlflow_initialized = False
 
 @ensure_annotations
@@ -131,6 +137,10 @@ def init_mlflow_tracking(mlflow_username: str = None, mlflow_password: str = Non
     global _mlflow_initialized
     if _mlflow_initialized:
         return
+
+    # Imported here so inference code that only needs the other helpers stays light
+    import mlflow
+    import dagshub
     
     if mlflow_username:
         os.environ["MLFLOW_TRACKING_USERNAME"] = mlflow_username
@@ -19,3 +19,42 @@ logging.basicConfig(
 )
 
 logger = logging.getLogger("mlProjectLogger")
+
+_listener = None
+
+
+def start_async_logging():
+    """Move the root handlers behind a QueueHandler so callers never block on file or stdout writes.
+
+    A QueueListener thread does the formatting and I/O. Intended for the
+    serving process; call stop_async_logging() on shutdown to flush.
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    log_queue = queue.SimpleQueue()
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_async_logging():
+    """Flush queued records and restore the synchronous handlers."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener = None
@@ -0,0 +1,207 @@
+import numpy as np
+from sklearn import metrics
+
+THRESHOLD_OBJECTIVES = ("f1", "cost", "recall_at_fpr")
+
+# sklearn scoring names that are computed from hard labels (probability > 0.5) ...
+LABEL_SCORES = {
+    "f1": metrics.f1_score,
+    "precision": metrics.precision_score,
+    "recall": metrics.recall_score,
+    "accuracy": metrics.accuracy_score,
+    "balanced_accuracy": metrics.balanced_accuracy_score,
+}
+# ... and the ones computed from the fraud probability itself
+PROBABILITY_SCORES = {
+    "roc_auc": metrics.roc_auc_score,
+    "average_precision": metrics.average_precision_score,
+    "neg_log_loss": lambda y_true, proba: -metrics.log_loss(y_true, proba, labels=[0, 1]),
+    "neg_brier_score": lambda y_true, proba: -metrics.brier_score_loss(y_true, proba),
+}
+
+
+def score_predictions(scoring: str, y_true, proba) -> float:
+    """Value of an sklearn scoring name from already computed positive-class probabilities.
+
+    Matches get_scorer(scoring)(model, X, y) for a binary classifier whose
+    predict() thresholds predict_proba at 0.5, without predicting twice.
+    """
+    proba = np.asarray(proba, dtype=np.float64).ravel()
+    if scoring in PROBABILITY_SCORES:
+        return float(PROBABILITY_SCORES[scoring](y_true, proba))
+    if scoring in LABEL_SCORES:
+        kwargs = {} if scoring in ("accuracy", "balanced_accuracy") else {"zero_division": 0}
+        return float(LABEL_SCORES[scoring](y_true, (proba > 0.5).astype(int), **kwargs))
+    raise ValueError(f"Unsupported scoring '{scoring}', expected one of {sorted({**LABEL_SCORES, **PROBABILITY_SCORES})}")
+
+
+def threshold_curve(y_true, scores):
+    """Confusion counts at every distinct score, from one sort and two cumulative sums.
+
+    A row counts as positive at threshold t when its score >= t. Thresholds
+    come back in decreasing order, with true/false positive counts for
+    each. The total positives and negatives are returned as well.
+    """
+    y_true = np.asarray(y_true).astype(bool).ravel()
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+
+    order = np.argsort(scores, kind="mergesort")[::-1]
+    sorted_scores = scores[order]
+    sorted_true = y_true[order]
+
+    # last index of every run of equal scores
+    boundaries = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1] if len(scores) else np.array([], dtype=int)
+    tps = np.cumsum(sorted_true, dtype=np.int64)[boundaries]
+    fps = boundaries + 1 - tps
+    positives = int(sorted_true.sum())
+    return sorted_scores[boundaries], tps, fps, positives, len(scores) - positives
+
+
+def find_optimal_threshold(y_true, scores, objective: str = "f1", fp_cost: float = 1.0,
+                           fn_cost: float = 1.0, max_fpr: float = 0.01) -> dict:
+    """Single-pass threshold search over the sorted scores.
+
+    Objectives:
+        f1: maximise F1 of the positive class.
+        cost: minimise fp_cost * FP + fn_cost * FN.
+        recall_at_fpr: maximise recall subject to FPR <= max_fpr. When even
+            the top score breaks the limit, the result has feasible=False and
+            a threshold just above the top score, which flags nothing.
+    """
+    if objective not in THRESHOLD_OBJECTIVES:
+        raise ValueError(f"Unknown threshold objective '{objective}', expected one of {THRESHOLD_OBJECTIVES}")
+
+    thresholds, tps, fps, positives, negatives = threshold_curve(y_true, scores)
+    if len(thresholds) == 0:
+        return {"optimal_threshold": 0.5, "objective": objective, "objective_value": None}
+
+    fns = positives - tps
+    if objective == "f1":
+        denominator = 2 * tps + fps + fns
+        values = np.divide(2 * tps, denominator, out=np.zeros(len(tps)), where=denominator > 0)
+        best = int(np.argmax(values))
+    elif objective == "cost":
+        values = fp_cost * fps + fn_cost * fns
+        best = int(np.argmin(values))
+    else:
+        fpr = fps / negatives if negatives else np.zeros(len(fps))
+        values = tps / positives if positives else np.zeros(len(tps))
+        feasible = np.flatnonzero(fpr <= max_fpr)
+        if not len(feasible):
+            return {
+                "optimal_threshold": float(np.nextafter(thresholds[0], np.inf)),
+                "objective": objective,
+                "objective_value": 0.0,
+                "precision": 0.0,
+                "recall": 0.0,
+                "fpr": 0.0,
+                "feasible": False,
+            }
+        # tps only grows as the threshold falls, so the lowest feasible threshold has the best recall
+        best = int(feasible[-1])
+
+    predicted = tps[best] + fps[best]
+    result = {
+        "optimal_threshold": float(thresholds[best]),
+        "objective": objective,
+        "objective_value": float(values[best]),
+        "precision": float(tps[best] / predicted) if predicted else 0.0,
+        "recall": float(tps[best] / positives) if positives else 0.0,
+        "fpr": float(fps[best] / negatives) if negatives else 0.0,
+    }
+    if objective == "recall_at_fpr":
+        result["feasible"] = True
+    return result
+
+
+def _ratio(numerator, denominator) -> float:
+    return float(numerator / denominator) if denominator else 0.0
+
+
+def confusion_at_threshold(thresholds, tps, fps, positives: int, negatives: int, threshold: float) -> dict:
+    """Confusion counts at one threshold, read off a threshold_curve without rescanning the rows."""
+    # thresholds are decreasing; the first k of them are >= threshold
+    k = int(np.searchsorted(-thresholds, -threshold, side="right"))
+    tp = int(tps[k - 1]) if k else 0
+    fp = int(fps[k - 1]) if k else 0
+    return {"tn": negatives - fp, "fp": fp, "fn": positives - tp, "tp": tp}
+
+
+def classification_metrics(confusion: dict) -> dict:
+    """Accuracy and per-class, weighted and macro precision/recall/F1 of a binary confusion matrix."""
+    tn, fp, fn, tp = confusion["tn"], confusion["fp"], confusion["fn"], confusion["tp"]
+    total = tn + fp + fn + tp
+    per_class = {}
+    for label, (hits, false_alarms, misses) in {0: (tn, fn, fp), 1: (tp, fp, fn)}.items():
+        precision = _ratio(hits, hits + false_alarms)
+        recall = _ratio(hits, hits + misses)
+        per_class[label] = {
+            "precision": precision,
+            "recall": recall,
+            "f1": _ratio(2 * precision * recall, precision + recall),
+            "support": hits + misses,
+        }
+
+    result = {"accuracy": _ratio(tn + tp, total)}
+    for name in ("precision", "recall", "f1"):
+        result[f"{name}_weighted"] = _ratio(sum(c[name] * c["support"] for c in per_class.values()), total)
+        result[f"{name}_macro"] = (per_class[0][name] + per_class[1][name]) / 2
+        result[name] = per_class[1][name]
+    result["balanced_accuracy"] = (per_class[0]["recall"] + per_class[1]["recall"]) / 2
+    return result
+
+
+def calibration_bins(y_true, scores, n_bins: int = 10) -> dict:
+    """Reliability table over equal-width probability bins, with expected calibration error and Brier score."""
+    y_true = np.asarray(y_true, dtype=np.float64).ravel()
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+    index = np.minimum((scores * n_bins).astype(np.int64), n_bins - 1)
+    counts = np.bincount(index, minlength=n_bins)
+    predicted = np.bincount(index, weights=scores, minlength=n_bins)
+    observed = np.bincount(index, weights=y_true, minlength=n_bins)
+
+    bins = []
+    ece = 0.0
+    for i in np.flatnonzero(counts):
+        mean_predicted, fraction_positive = predicted[i] / counts[i], observed[i] / counts[i]
+        ece += counts[i] / len(scores) * abs(mean_predicted - fraction_positive)
+        bins.append({
+            "lower": i / n_bins,
+            "upper": (i + 1) / n_bins,
+            "count": int(counts[i]),
+            "mean_predicted": float(mean_predicted),
+            "fraction_positive": float(fraction_positive),
+        })
+    brier = float(np.mean((scores - y_true) ** 2)) if len(scores) else 0.0
+    return {"bins": bins, "expected_calibration_error": float(ece), "brier_score": brier}
+
+
+def evaluate_scores(y_true, scores, threshold: float = 0.5, n_calibration_bins: int = 10) -> dict:
+    """Every evaluation metric from one sort of the scores.
+
+    A row is predicted positive when its score >= threshold, as at serving
+    time. The confusion matrix at that threshold, the threshold metrics,
+    ROC and precision-recall curves with their areas all come from one
+    threshold_curve. Calibration bins come from one bincount pass.
+    """
+    thresholds, tps, fps, positives, negatives = threshold_curve(y_true, scores)
+    confusion = confusion_at_threshold(thresholds, tps, fps, positives, negatives, threshold)
+    result = {"threshold": float(threshold), **classification_metrics(confusion)}
+
+    fpr = np.r_[0.0, fps / negatives] if negatives else np.zeros(len(fps) + 1)
+    tpr = np.r_[0.0, tps / positives] if positives else np.zeros(len(tps) + 1)
+    precision = np.divide(tps, tps + fps, out=np.ones(len(tps)), where=(tps + fps) > 0)
+    recall = tps / positives if positives else np.zeros(len(tps))
+    result["auc"] = float(np.trapz(tpr, fpr))
+    result["average_precision"] = float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+
+    calibration = calibration_bins(y_true, scores, n_calibration_bins)
+    result["expected_calibration_error"] = calibration["expected_calibration_error"]
+    result["brier_score"] = calibration["brier_score"]
+    return {
+        "metrics": result,
+        "confusion_matrix": confusion,
+        "roc": {"fpr": fpr, "tpr": tpr, "thresholds": np.r_[np.inf, thresholds]},
+        "pr": {"precision": precision, "recall": recall, "thresholds": thresholds},
+        "calibration": calibration["bins"],
+    }
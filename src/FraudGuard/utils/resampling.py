@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import numpy as np
+from pathlib import Path
+from sklearn import config_context
+from sklearn.neighbors import NearestNeighbors
+from FraudGuard import logger
+
+REBALANCE_STRATEGIES = ("smote_tomek", "smote", "random_under", "class_weight", "none")
+
+
+# Seconds between RSS samples while a strategy runs
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def _neighbours(k: int, n_jobs: int) -> NearestNeighbors:
+    # "auto" picks a KD/ball tree on this low-dimensional data instead of a brute-force distance matrix,
+    # and queries are split across n_jobs cores. Tree queries are not chunked by sklearn's working_memory.
+    return NearestNeighbors(n_neighbors=k + 1, algorithm="auto", n_jobs=n_jobs)
+
+
+def make_resampler(strategy: str, random_state: int = 42, k_neighbors: int = 5, n_jobs: int = -1):
+    """imblearn sampler for a rebalancing strategy, or None when the train set is kept as is."""
+    from imblearn.combine import SMOTETomek
+    from imblearn.over_sampling import SMOTE
+    from imblearn.under_sampling import RandomUnderSampler, TomekLinks
+
+    if strategy == "smote_tomek":
+        return SMOTETomek(
+            smote=SMOTE(k_neighbors=_neighbours(k_neighbors, n_jobs), random_state=random_state),
+            tomek=TomekLinks(sampling_strategy="majority", n_jobs=n_jobs),
+            random_state=random_state,
+        )
+    if strategy == "smote":
+        return SMOTE(k_neighbors=_neighbours(k_neighbors, n_jobs), random_state=random_state)
+    if strategy == "random_under":
+        return RandomUnderSampler(random_state=random_state)
+    if strategy in ("class_weight", "none"):
+        return None
+    raise ValueError(f"Unknown rebalance strategy '{strategy}', expected one of {REBALANCE_STRATEGIES}")
+
+
+def class_weight_params(y) -> dict:
+    """scale_pos_weight (negatives / positives) understood by both XGBoost and CatBoost."""
+    y = np.asarray(y)
+    positives = int((y == 1).sum())
+    return {"scale_pos_weight": float((len(y) - positives) / positives) if positives else 1.0}
+
+
+def _class_counts(y) -> dict:
+    labels, counts = np.unique(np.asarray(y), return_counts=True)
+    return {str(label): int(count) for label, count in zip(labels, counts)}
+
+
+def _current_rss() -> int:
+    """Resident set size of this process in bytes, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _max_rss() -> int:
+    """Peak resident set size of this process so far in bytes, or None without the resource module."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssPeak:
+    """Peak growth of the process RSS over a block, sampled on a background thread.
+
+    Costs one /proc read every RSS_SAMPLE_INTERVAL seconds. Without /proc
+    it falls back to the growth of ru_maxrss, which stays at 0 when the
+    process had already peaked higher before the block.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak_bytes = None
+        self._start = None
+        self._peak = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, _current_rss())
+
+    def __enter__(self):
+        self._start = _current_rss()
+        if self._start is not None:
+            self._peak = self._start
+            self._thread = threading.Thread(target=self._sample, name="rss-peak", daemon=True)
+            self._thread.start()
+        else:
+            self._start = _max_rss()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak_bytes = max(self._peak, _current_rss()) - self._start
+        elif self._start is not None:
+            self.peak_bytes = _max_rss() - self._start
+        return False
+
+
+def rebalance(X, y, strategy: str = "smote_tomek", random_state: int = 42, k_neighbors: int = 5,
+              n_jobs: int = -1, working_memory_mb: int = 256, trace_memory: bool = False):
+    """Rebalance a training set and measure what it cost.
+
+    Returns the (possibly resampled) X and y, the model parameters the
+    strategy asks the trainer to use (class weights, otherwise empty) and
+    a report with wall time, peak memory and class counts before and
+    after. Peak memory is the growth of the process RSS, sampled cheaply;
+    with trace_memory it is the peak of Python allocations traced by
+    tracemalloc instead, which is more precise but slows resampling down
+    several times. working_memory_mb caps sklearn's chunked brute-force
+    distance computations; the tree-based neighbour searches used here
+    are not affected by it.
+    """
+    resampler = make_resampler(strategy, random_state=random_state, k_neighbors=k_neighbors, n_jobs=n_jobs)
+    counts_before = _class_counts(y)
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with RssPeak() as rss, config_context(working_memory=working_memory_mb):
+            if resampler is not None:
+                X, y = resampler.fit_resample(X, y)
+        model_params = class_weight_params(y) if strategy == "class_weight" else {}
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else rss.peak_bytes
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    report = {
+        "strategy": strategy,
+        "seconds": round(seconds, 4),
+        "peak_memory_mb": round(peak / 2 ** 20, 2) if peak is not None else None,
+        "memory_measure": "tracemalloc" if trace_memory else "rss",
+        "rows_before": int(sum(counts_before.values())),
+        "rows_after": int(len(y)),
+        "class_counts_before": counts_before,
+        "class_counts_after": _class_counts(y),
+        "model_params": model_params,
+    }
+    logger.info(
+        f"Rebalanced train set with {strategy}: {report['rows_before']} -> {report['rows_after']} rows "
+        f"in {report['seconds']}s, peak {report['peak_memory_mb']} MB ({report['memory_measure']})"
+    )
+    return X, y, model_params, report
+
+
+def update_rebalance_report(path: Path, report: dict) -> dict:
+    """Merge one strategy's report into the per-strategy comparison file."""
+    path = Path(path)
+    reports = json.loads(path.read_text()) if path.exists() else {}
+    reports[report["strategy"]] = report
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(reports, indent=4))
+    return reports
@@ -0,0 +1,211 @@
+import os
+import json
+import math
+import hashlib
+import threading
+import boto3
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from FraudGuard.utils.logging import logger
+
+MiB = 1024 * 1024
+# Part sizes commonly used by uploaders, tried when matching a multipart ETag
+COMMON_PART_SIZES = (8 * MiB, 5 * MiB, 16 * MiB, 15 * MiB, 64 * MiB, 100 * MiB)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(region: str = None, max_pool_connections: int = 32):
+    """Process-wide S3 client per (profile, region), with a connection pool sized for parallel parts.
+
+    boto3 clients are thread-safe; creating a session per call throws away
+    the pooled connections and credential lookups.
+    """
+    profile = os.getenv('AWS_PROFILE')
+    region = region or os.getenv('AWS_REGION', 'us-east-1')
+    key = (profile, region, os.getenv('AWS_ENDPOINT_URL'), max_pool_connections)
+    with _clients_lock:
+        if key not in _clients:
+            session = boto3.Session(profile_name=profile) if profile else boto3.Session()
+            _clients[key] = session.client(
+                's3',
+                region_name=region,
+                config=Config(
+                    max_pool_connections=max_pool_connections,
+                    retries={"max_attempts": 5, "mode": "adaptive"},
+                    tcp_keepalive=True,
+                ),
+            )
+        return _clients[key]
+
+
+def _md5_of_parts(path: Path, part_size: int) -> str:
+    digests = []
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(part_size), b""):
+            digests.append(hashlib.md5(block).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def etag_is_content_md5(head: dict) -> bool:
+    """Whether an object's ETag is derived from MD5s of its data, going by its head_object response.
+
+    Objects encrypted with SSE-KMS or SSE-C get an opaque ETag that no
+    checksum of the downloaded bytes reproduces; SSE-S3 and unencrypted
+    objects keep the MD5 form.
+    """
+    if head.get("SSECustomerAlgorithm"):
+        return False
+    return not str(head.get("ServerSideEncryption", "")).startswith("aws:kms")
+
+
+def etag_matches(path: Path, etag: str, size: int, content_md5: bool = True):
+    """True/False when the file's MD5 can be compared with the S3 ETag, None when it cannot.
+
+    Single-part ETags are the MD5 of the object. Multipart ETags are the MD5
+    of the part MD5s plus "-<parts>"; the uploader's part size is not
+    recorded, so part sizes consistent with the part count are tried.
+    content_md5=False (see etag_is_content_md5) means the ETag is opaque.
+    """
+    if not content_md5:
+        return None
+    etag = etag.strip('"')
+    if "-" not in etag:
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(MiB), b""):
+                md5.update(block)
+        return md5.hexdigest() == etag
+
+    n_parts = int(etag.rsplit("-", 1)[1])
+    candidates = {math.ceil(size / n_parts / MiB) * MiB, *COMMON_PART_SIZES}
+    candidates = sorted(p for p in candidates if p > 0 and math.ceil(size / p) == n_parts)
+    if not candidates:
+        return None
+    return any(_md5_of_parts(path, part_size) == etag for part_size in candidates)
+
+
+class S3Downloader:
+    """Parallel ranged downloads from S3 that resume and verify.
+
+    An object is fetched as byte ranges of part_size on max_concurrency
+    threads sharing one pooled client, written in place into
+    "<file>.part". Finished parts are recorded in "<file>.part.json", so an
+    interrupted download only fetches the missing ranges next time, as
+    long as the object's ETag and size are unchanged. When complete, the
+    file is checked against the object's size and ETag and then renamed
+    into place.
+    """
+
+    def __init__(self, client=None, region: str = None, part_size: int = 8 * MiB, max_concurrency: int = 8,
+                 max_parallel_objects: int = 4, verify_etag: bool = True):
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+        self.max_parallel_objects = max_parallel_objects
+        self.verify_etag = verify_etag
+        self.client = client or get_s3_client(region, max_pool_connections=max_concurrency * max_parallel_objects)
+
+    def _fetch_part(self, bucket: str, key: str, start: int, end: int, etag: str) -> bytes:
+        # IfMatch makes S3 refuse the range if the object was replaced mid-download
+        response = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}", IfMatch=etag)
+        return response["Body"].read()
+
+    @staticmethod
+    def _load_state(state_path: Path, etag: str, size: int, part_size: int) -> set:
+        if not state_path.exists():
+            return set()
+        try:
+            state = json.loads(state_path.read_text())
+        except ValueError:
+            return set()
+        if (state.get("etag"), state.get("size"), state.get("part_size")) != (etag, size, part_size):
+            return set()
+        return set(state.get("done", []))
+
+    def download(self, bucket: str, key: str, local_path: Path) -> Path:
+        """Download s3://bucket/key to local_path, resuming a previous partial download."""
+        local_path = Path(local_path)
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        size, etag = int(head["ContentLength"]), head["ETag"]
+        content_md5 = etag_is_content_md5(head)
+
+        part_path = local_path.with_name(local_path.name + ".part")
+        state_path = local_path.with_name(local_path.name + ".part.json")
+        n_parts = max(1, math.ceil(size / self.part_size))
+        done = self._load_state(state_path, etag, size, self.part_size) if part_path.exists() else set()
+        if done:
+            logger.info(f"Resuming s3://{bucket}/{key}: {len(done)}/{n_parts} parts already downloaded")
+        else:
+            with open(part_path, "wb") as f:
+                f.truncate(size)
+
+        state_lock = threading.Lock()
+
+        def save_state():
+            tmp_path = state_path.with_name(state_path.name + ".tmp")
+            tmp_path.write_text(json.dumps({
+                "etag": etag, "size": size, "part_size": self.part_size, "done": sorted(done)
+            }))
+            os.replace(tmp_path, state_path)
+
+        fd = os.open(part_path, os.O_WRONLY)
+        try:
+            def fetch(index: int):
+                start = index * self.part_size
+                end = min(size, start + self.part_size) - 1
+                data = self._fetch_part(bucket, key, start, end, etag)
+                if len(data) != end - start + 1:
+                    raise IOError(f"Short read for bytes {start}-{end} of s3://{bucket}/{key}")
+                os.pwrite(fd, data, start)
+                with state_lock:
+                    done.add(index)
+                    save_state()
+
+            pending = [index for index in range(n_parts) if index not in done] if size else []
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-part") as pool:
+                for future in [pool.submit(fetch, index) for index in pending]:
+                    future.result()
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        self._verify(part_path, bucket, key, size, etag, content_md5)
+        os.replace(part_path, local_path)
+        if state_path.exists():
+            state_path.unlink()
+        logger.info(f"Downloaded s3://{bucket}/{key} to {local_path} ({size} bytes, {len(pending)} parts fetched)")
+        return local_path
+
+    def _verify(self, path: Path, bucket: str, key: str, size: int, etag: str, content_md5: bool = True):
+        actual_size = path.stat().st_size
+        if actual_size != size:
+            raise IOError(f"Size mismatch for s3://{bucket}/{key}: expected {size}, got {actual_size}")
+        if not self.verify_etag:
+            return
+        matches = etag_matches(path, etag, size, content_md5)
+        if matches is None:
+            logger.warning(f"Cannot check ETag {etag} of s3://{bucket}/{key}; verified size only")
+        elif not matches:
+            # The parts on disk are corrupt; start over next time
+            path.unlink()
+            path.with_name(path.name + ".json").unlink(missing_ok=True)
+            raise IOError(f"ETag mismatch for s3://{bucket}/{key}")
+
+    def list_keys(self, bucket: str, prefix: str) -> list:
+        keys = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            keys.extend(item["Key"] for item in page.get("Contents", []) if not item["Key"].endswith("/"))
+        return sorted(keys)
+
+    def download_many(self, bucket: str, keys: list, local_dir: Path, prefix: str = "") -> list:
+        """Download several objects in parallel, keeping their paths relative to prefix under local_dir."""
+        local_dir = Path(local_dir)
+        with ThreadPoolExecutor(max_workers=self.max_parallel_objects, thread_name_prefix="s3-object") as pool:
+            futures = [
+                pool.submit(self.download, bucket, key, local_dir / key[len(prefix):].lstrip("/"))
+                for key in keys
+            ]
+            return [future.result() for future in futures]
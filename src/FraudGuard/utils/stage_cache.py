@@ -0,0 +1,81 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from FraudGuard import logger
+from FraudGuard.utils.helpers import get_file_hash
+
+STAGE_CACHE_DIR = Path("artifacts/.stage_cache")
+
+
+class StageCache:
+    """Skip a pipeline stage when its inputs, config and code are unchanged since its last run.
+
+    The cache key is a sha256 over the content of every input file, the
+    stage's config slice and the source of the modules that implement it.
+    After a run, the key is recorded under cache_dir together with the size
+    and mtime of each output. A later run with the same key whose outputs
+    are still in place is a hit and does not execute the stage. Set
+    FRAUDGUARD_STAGE_CACHE=0 to always run.
+    """
+
+    def __init__(self, stage: str, inputs: list = (), config: dict = None, code: list = (), outputs: list = (),
+                 cache_dir: Path = STAGE_CACHE_DIR):
+        self.stage = stage
+        self.inputs = [Path(path) for path in inputs]
+        self.config = config or {}
+        self.code = [Path(path) for path in code]
+        self.outputs = [Path(path) for path in outputs]
+        self.record_path = Path(cache_dir) / f"{stage}.json"
+        self.enabled = os.getenv("FRAUDGUARD_STAGE_CACHE", "1") != "0"
+
+    def key(self) -> str:
+        digest = hashlib.sha256(self.stage.encode())
+        digest.update(json.dumps(self.config, sort_keys=True, default=str).encode())
+        for group in (self.inputs, self.code):
+            for path in sorted(group):
+                file_hash = get_file_hash(path) if path.exists() else "missing"
+                digest.update(f"{path}:{file_hash}".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _stat(path: Path) -> dict:
+        stat = path.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def is_fresh(self, key: str) -> bool:
+        if not self.enabled or not self.record_path.exists():
+            return False
+        with open(self.record_path) as f:
+            record = json.load(f)
+        if record.get("key") != key:
+            return False
+        # Outputs must still be the files this stage wrote, not deleted or replaced since
+        return all(
+            Path(path).exists() and self._stat(Path(path)) == stat
+            for path, stat in record["outputs"].items()
+        )
+
+    def save(self, key: str):
+        record = {
+            "stage": self.stage,
+            "key": key,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "outputs": {str(path): self._stat(path) for path in self.outputs if path.exists()},
+        }
+        self.record_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.record_path, "w") as f:
+            json.dump(record, f, indent=4)
+
+    def run(self, fn, load=None):
+        """Run fn unless the cache is fresh; on a hit return load() (or None) instead."""
+        key = self.key()
+        if self.is_fresh(key):
+            logger.info(f"Stage cache hit for {self.stage} ({key[:12]}), reusing {len(self.outputs)} outputs")
+            return load() if load is not None else None
+
+        logger.info(f"Stage cache miss for {self.stage} ({key[:12]}), running stage")
+        result = fn()
+        self.save(key)
+        return result
@@ -0,0 +1,81 @@
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from xgboost import XGBClassifier
+from FraudGuard.components.preprocess import Transform
+from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+from FraudGuard.entity.config_entity import DataTransformationConfig
+from FraudGuard.utils.helpers import read_yaml, save_bin, save_json
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+SCHEMA = read_yaml(REPO_ROOT / "config_file" / "schema.yaml")
+
+CATEGORIES = {
+    "Transaction_Type": ["ATM Withdrawal", "Bill Payment", "Online Purchase", "POS Payment", "Bank Transfer"],
+    "Device_Used": ["Mobile", "Desktop", "Tablet"],
+    "Location": ["New York", "Chicago", "Houston", "Boston", "Miami", "Seattle"],
+    "Payment_Method": ["Credit Card", "Debit Card", "UPI", "Net Banking"],
+}
+
+
+def make_transactions(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Raw transactions shaped like Fraud-data.csv."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "Transaction_ID": [f"T{i}" for i in range(n_rows)],
+        "User_ID": rng.integers(1000, 5000, n_rows),
+        "Transaction_Amount": rng.gamma(2.0, 1500.0, n_rows).round(2),
+        "Time_of_Transaction": rng.integers(0, 24, n_rows).astype(float),
+        "Previous_Fraudulent_Transactions": rng.integers(0, 5, n_rows),
+        "Account_Age": rng.integers(1, 120, n_rows),
+        "Number_of_Transactions_Last_24H": rng.integers(1, 15, n_rows),
+    })
+    for column, values in CATEGORIES.items():
+        data[column] = rng.choice(values, n_rows)
+    risk = (data["Transaction_Amount"] > 6000).astype(int) + (data["Previous_Fraudulent_Transactions"] > 2)
+    data["Fraudulent"] = (rng.random(n_rows) < 0.03 + 0.3 * risk).astype(int)
+    return data[list(SCHEMA["columns"].keys())]
+
+
+@pytest.fixture(scope="session")
+def artifacts_root(tmp_path_factory):
+    """Run the real preprocess stage on synthetic data and train a small model on its output."""
+    root = tmp_path_factory.mktemp("fraudguard")
+    (root / "config_file").mkdir()
+    for name in ("config.yaml", "params.yaml", "schema.yaml"):
+        shutil.copy(REPO_ROOT / "config_file" / name, root / "config_file" / name)
+
+    transform_dir = root / "artifacts" / "transform"
+    data_path = root / "Fraud-data.csv"
+    make_transactions(600).to_csv(data_path, index=False)
+
+    config = DataTransformationConfig(
+        root_dir=transform_dir, data_path=data_path, target_column=SCHEMA["target_column"]["name"],
+        preprocessor_path=transform_dir / "preprocess" / "preprocessor.pkl",
+        label_encoder=transform_dir / "preprocess" / "label_encoders.pkl",
+        categorical_columns=SCHEMA["categorical_columns"], numeric_columns=SCHEMA["numeric_columns"],
+        columns_to_drop=SCHEMA["data_cleaning"]["columns_to_drop"],
+    )
+    transform = Transform(config)
+    train, test = transform.train_test_splitting()
+    transform.preprocess_features(train, test)
+
+    train_data = np.load(transform_dir / "process" / "train_processed.npy", mmap_mode="r")
+    model = XGBClassifier(n_estimators=20, max_depth=3, verbosity=0)
+    model.fit(train_data[:, :-1].astype(float), train_data[:, -1].astype(int))
+
+    trainer_dir = root / "artifacts" / "trainer"
+    trainer_dir.mkdir(parents=True)
+    save_bin(data=model, path=trainer_dir / "model.joblib")
+    CompiledTreeEnsemble.from_model(model).save(trainer_dir / "compiled_model.npz")
+    save_json(path=trainer_dir / "optimal_threshold.json", data={"optimal_threshold": 0.4})
+    return root
+
+
+@pytest.fixture
+def serving_dir(artifacts_root, monkeypatch):
+    """Run from a directory laid out like the deployed app."""
+    monkeypatch.chdir(artifacts_root)
+    return artifacts_root
@@ -1,3 +1,4 @@
+import json
 import pytest
 import pandas as pd
 import numpy as np
@@ -20,7 +21,7 @@ def test_data_validation():
     assert validator.validate_column_presence(data, schema) is True
     assert validator.validate_data_types(data, schema) is True
 
-def test_data_transformation_encoding():
+def test_data_transformation_encoding(tmp_path):
     """Simple test for categorical encoding."""
     data = pd.DataFrame({
         'cat_col': ['A', 'B', 'A'],
@@ -30,7 +31,7 @@ def test_data_transformation_encoding():
     
     config = DataTransformationConfig(
         root_dir=Path("."), data_path=Path("."), target_column='target',
-        preprocessor_path=Path("preprocess/pre.pkl"), label_encoder=Path("preprocess/le.pkl"),
+        preprocessor_path=tmp_path / "preprocess" / "pre.pkl", label_encoder=tmp_path / "preprocess" / "le.pkl",
         categorical_columns=['cat_col'], numeric_columns=['num_col'],
         columns_to_drop=[]
     )
@@ -64,3 +65,748 @@ def test_mlflow_init_idempotency():
     # Should not raise exception
     init_mlflow_tracking()
     init_mlflow_tracking()
+
+def test_model_registry_loads_once(serving_dir):
+    """The registry should hand out the same pipeline and report artifact fingerprints."""
+    from FraudGuard.pipeline.model_registry import ModelRegistry
+    registry = ModelRegistry()
+    assert registry.info()["loaded"] is False
+
+    pipeline = registry.get()
+    assert registry.get() is pipeline
+
+    info = registry.info()
+    assert info["loaded"] is True
+    assert info["load_seconds"] >= 0
+    assert any(path.endswith("model.joblib") for path in info["artifacts"])
+
+def test_predict_batch_matches_single_predictions(serving_dir):
+    """Batch scoring must agree row-for-row with the single-row path."""
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    from tests.conftest import make_transactions
+    pipeline = PredictionPipeline()
+    transactions = make_transactions(25, seed=1).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+
+    batch = pipeline.predict_batch(transactions)
+    assert len(batch) == len(transactions)
+    for i in (0, 7, 24):
+        single = pipeline.predict(transactions.iloc[[i]])
+        assert batch[i]["fraud_status"] == single["fraud_status"]
+        assert batch[i]["confidence"] == single["confidence"]
+        assert np.isclose(batch[i]["fraud_probability"], single["fraud_probability"])
+    assert pipeline.predict_batch(transactions.iloc[:0]) == []
+
+def test_category_lookup_matches_label_encoders(serving_dir):
+    """preprocess_data must encode categories exactly like the LabelEncoders, with unknowns on the fallback code."""
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline, UNKNOWN_CATEGORY_CODE
+    from tests.conftest import make_transactions
+    pipeline = PredictionPipeline()
+    encoder = pipeline.label_encoders["Location"]
+    known = list(encoder.classes_)
+
+    transactions = make_transactions(len(known) + 1, seed=5).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+    transactions["Location"] = known + ["Atlantis"]
+    processed = pipeline.preprocess_data(transactions)
+
+    # Undo the scaler on the Location column to recover the codes preprocess_data produced
+    layout = pipeline.feature_layout
+    index = layout["columns"].index("Location")
+    codes = np.rint(processed[:, index] * layout["scale"][index] + layout["mean"][index]).astype(np.int64)
+
+    assert codes[:-1].tolist() == encoder.transform(known).tolist()
+    assert codes[-1] == UNKNOWN_CATEGORY_CODE
+
+def test_fast_path_is_bit_identical(serving_dir):
+    """transform_record must equal the DataFrame pipeline output cast to float32, bit for bit."""
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    from tests.conftest import make_transactions
+    pipeline = PredictionPipeline()
+    transactions = make_transactions(50, seed=2).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+    transactions.loc[3, "Device_Used"] = "Smartwatch"
+
+    expected = pipeline.preprocess_data(transactions).astype(np.float32)
+    rows = np.stack([pipeline.transform_record(record) for record in transactions.to_dict("records")])
+
+    assert rows.dtype == np.float32
+    assert np.array_equal(rows.view(np.uint32), expected.view(np.uint32))
+    assert pipeline.predict_record(transactions.iloc[0].to_dict()) == pipeline.predict(transactions.iloc[[0]])
+
+@pytest.mark.parametrize("library", ["xgboost", "catboost"])
+def test_compiled_ensemble_matches_predict_proba(library, tmp_path):
+    """The NumPy tree evaluator must reproduce the native probabilities, including missing values."""
+    from FraudGuard.pipeline.compiled_model import CompiledTreeEnsemble
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(400, 5))
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    X[::13, 4] = np.nan
+
+    if library == "xgboost":
+        from xgboost import XGBClassifier
+        model = XGBClassifier(n_estimators=30, max_depth=4, verbosity=0).fit(X, y)
+    else:
+        from catboost import CatBoostClassifier
+        model = CatBoostClassifier(n_estimators=30, depth=4, verbose=0, allow_writing_files=False).fit(X, y)
+
+    compiled = CompiledTreeEnsemble.from_model(model)
+    assert compiled.verify(model, X, atol=1e-5) <= 1e-5
+
+    compiled.save(tmp_path / "compiled.npz")
+    restored = CompiledTreeEnsemble.load(tmp_path / "compiled.npz")
+    assert np.allclose(restored.predict_proba(X), model.predict_proba(X), atol=1e-5)
+    assert CompiledTreeEnsemble.available(tmp_path / "compiled.npz")
+
+    # A skipped export still leaves the tracked file, marked so serving falls back to the joblib model
+    CompiledTreeEnsemble.save_unavailable(tmp_path / "skipped.npz", "verification failed")
+    assert not CompiledTreeEnsemble.available(tmp_path / "skipped.npz")
+    with pytest.raises(ValueError):
+        CompiledTreeEnsemble.load(tmp_path / "skipped.npz")
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    """Concurrent submissions should be scored together and each caller gets its own row back."""
+    import asyncio
+    from FraudGuard.pipeline.batching import MicroBatcher
+    seen_batches = []
+
+    def score(records):
+        if any(record["id"] == "bad" for record in records):
+            raise ValueError("unparseable record")
+        seen_batches.append(len(records))
+        return [{"echo": record["id"]} for record in records]
+
+    async def run():
+        batcher = MicroBatcher(score, max_batch_size=8, max_wait_ms=20)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit({"id": i}) for i in range(20)))
+        stats, coalesced = batcher.stats(), list(seen_batches)
+        # A bad record fails only its own caller, not the rest of its batch
+        mixed = await asyncio.gather(*(batcher.submit({"id": i}) for i in (0, "bad", 2)), return_exceptions=True)
+        await batcher.stop()
+        return results, stats, coalesced, mixed
+
+    results, stats, coalesced, mixed = asyncio.run(run())
+    assert [r["echo"] for r in results] == list(range(20))
+    assert max(coalesced) == 8 and sum(coalesced) == 20
+    assert stats["rows"] == 20 and stats["batches"] == len(coalesced)
+    assert stats["queue_depth"] == 0
+    assert mixed[0] == {"echo": 0} and mixed[2] == {"echo": 2}
+    assert isinstance(mixed[1], ValueError)
+
+    # workers > 1 keeps several batches in flight at once
+    import threading
+    import time
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow_score(records):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return records
+
+    async def run_parallel():
+        batcher = MicroBatcher(slow_score, max_batch_size=2, max_wait_ms=1, workers=3)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit({"id": i}) for i in range(12)))
+        await batcher.stop()
+        return results
+
+    assert [r["id"] for r in asyncio.run(run_parallel())] == list(range(12))
+    assert peak[0] == 3
+
+def test_serving_bundle_is_memory_mapped_and_consistent(serving_dir, tmp_path):
+    """Bundle-backed pipelines map their arrays read-only and score exactly like the joblib artifacts."""
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    from FraudGuard.pipeline.serving_bundle import ServingBundle, build_serving_bundle
+    from tests.conftest import make_transactions
+    transactions = make_transactions(40, seed=4).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+
+    build_serving_bundle(tmp_path / "serving")
+    legacy = PredictionPipeline(use_bundle=False)
+    mapped = PredictionPipeline(use_bundle=False)
+    mapped.bundle_dir = tmp_path / "serving"
+    mapped._load_bundle()
+
+    assert mapped.preprocessor is None
+    assert isinstance(mapped.bundle.arrays["trees.feature"], np.memmap)
+    assert not mapped.bundle.arrays["trees.feature"].flags.writeable
+    assert np.array_equal(mapped.preprocess_data(transactions), legacy.preprocess_data(transactions))
+    assert mapped.predict_batch(transactions) == legacy.predict_batch(transactions)
+    record = transactions.iloc[5].to_dict()
+    assert np.array_equal(mapped.transform_record(record), legacy.transform_record(record))
+
+    # Rebuilding swaps the directory in place; retraining without a rebuild marks the bundle stale
+    build_serving_bundle(tmp_path / "serving")
+    assert not (tmp_path / "serving.old").exists()
+    assert ServingBundle.stale_sources(tmp_path / "serving") == []
+    threshold_path = Path("artifacts/trainer/optimal_threshold.json")
+    original = threshold_path.read_text()
+    try:
+        threshold_path.write_text(json.dumps({"optimal_threshold": 0.9}))
+        assert ServingBundle.stale_sources(tmp_path / "serving") == [str(threshold_path)]
+    finally:
+        threshold_path.write_text(original)
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_batch_scorer_streams_file_in_chunks(serving_dir, tmp_path, suffix):
+    """Chunked file scoring must match in-memory batch scoring row for row."""
+    from FraudGuard.pipeline.batch_scoring import BatchScorer
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    from tests.conftest import make_transactions
+    transactions = make_transactions(230, seed=5).drop(columns=["Fraudulent"])
+    input_path = tmp_path / f"day{suffix}"
+    if suffix == ".csv":
+        transactions.to_csv(input_path, index=False)
+    else:
+        transactions.to_parquet(input_path, index=False)
+
+    pipeline = PredictionPipeline()
+    stats = BatchScorer(pipeline, chunk_size=50).score_file(input_path, tmp_path / f"scored{suffix}")
+    scored = pd.read_csv(tmp_path / "scored.csv") if suffix == ".csv" else pd.read_parquet(tmp_path / "scored.parquet")
+
+    assert stats["rows"] == 230 and stats["chunks"] == 5
+    assert scored["Transaction_ID"].tolist() == transactions["Transaction_ID"].tolist()
+    expected = [row["fraud_probability"] for row in pipeline.predict_batch(transactions)]
+    assert np.allclose(scored["fraud_probability"], expected)
+
+def test_streaming_transform_matches_in_memory_fit(tmp_path):
+    """Chunked encoding and scaler partial_fit must equal a single in-memory fit on the same split."""
+    import joblib
+    from FraudGuard.utils.helpers import load_json
+    from tests.conftest import make_transactions, SCHEMA
+    raw = make_transactions(500, seed=6)
+    raw.to_csv(tmp_path / "data.csv", index=False)
+
+    config = DataTransformationConfig(
+        root_dir=tmp_path / "transform", data_path=tmp_path / "data.csv", target_column="Fraudulent",
+        preprocessor_path=tmp_path / "transform" / "preprocessor.pkl",
+        label_encoder=tmp_path / "transform" / "label_encoders.pkl",
+        categorical_columns=SCHEMA["categorical_columns"], numeric_columns=SCHEMA["numeric_columns"],
+        columns_to_drop=SCHEMA["data_cleaning"]["columns_to_drop"], streaming=True, chunk_size=64
+    )
+    transformer = Transform(config)
+    counts = transformer.streaming_transform()
+
+    is_test = transformer._is_test_row(raw["Transaction_ID"])
+    assert counts == {"train": int((~is_test).sum()), "test": int(is_test.sum())}
+
+    scaler = joblib.load(config.preprocessor_path).named_transformers_["num"].named_steps["scaler"]
+    encoded = Transform(config).preprocess_data(raw)
+    train_x = encoded[~is_test].drop(columns=["Fraudulent"])
+    assert np.allclose(scaler.mean_, train_x.mean().to_numpy())
+    assert np.allclose(scaler.var_, train_x.var(ddof=0).to_numpy())
+
+    processed = np.load(tmp_path / "transform" / "process" / "train_processed.npy", mmap_mode="r")
+    manifest = load_json(tmp_path / "transform" / "process" / "manifest.json")
+    assert processed.dtype == np.float32 and manifest["dtype"] == "float32"
+    assert manifest["splits"]["train"]["rows"] == counts["train"]
+    assert manifest["columns"][-1] == "Fraudulent" and sorted(manifest["feature_columns"]) == sorted(train_x.columns)
+    assert processed.shape == (counts["train"], train_x.shape[1] + 1)
+    assert np.array_equal(processed[:, -1], encoded[~is_test]["Fraudulent"].to_numpy())
+    # Streaming does not resample, and says so in the rebalance report
+    assert load_json(tmp_path / "transform" / "rebalance_report.json")["none"]["rows_after"] == counts["train"]
+
+def test_threshold_search_matches_brute_force():
+    """Cumulative-count threshold search must agree with per-threshold sklearn metrics."""
+    from sklearn.metrics import f1_score
+    from FraudGuard.utils.metrics import find_optimal_threshold
+    rng = np.random.default_rng(7)
+    y = rng.random(300) < 0.2
+    scores = np.round(np.clip(y * 0.3 + rng.random(300) * 0.7, 0, 1), 2)
+
+    best = find_optimal_threshold(y, scores, objective="f1")
+    brute = max(f1_score(y, scores >= t) for t in np.unique(scores))
+    assert np.isclose(best["objective_value"], brute)
+    assert np.isclose(f1_score(y, scores >= best["optimal_threshold"]), brute)
+
+    cost = find_optimal_threshold(y, scores, objective="cost", fp_cost=1, fn_cost=5)
+    costs = [((scores >= t) & ~y).sum() + 5 * ((scores < t) & y).sum() for t in np.unique(scores)]
+    assert cost["objective_value"] == min(costs)
+
+    constrained = find_optimal_threshold(y, scores, objective="recall_at_fpr", max_fpr=0.1)
+    assert constrained["fpr"] <= 0.1 and constrained["feasible"] is True
+
+    # The top score is a negative shared by no positive: no threshold meets max_fpr=0
+    tied = find_optimal_threshold(np.array([0, 1, 0, 1]), np.array([0.9, 0.6, 0.3, 0.2]),
+                                  objective="recall_at_fpr", max_fpr=0.0)
+    assert tied["feasible"] is False and tied["optimal_threshold"] > 0.9
+    assert tied["recall"] == 0.0 and tied["fpr"] == 0.0
+    with pytest.raises(ValueError):
+        find_optimal_threshold(y, scores, objective="accuracy")
+
+def test_hpo_study_resumes_and_warm_starts(serving_dir, tmp_path, monkeypatch):
+    """Journal-backed studies pick up where they stopped and seed new studies from the last best trial."""
+    from FraudGuard.components import training
+    from FraudGuard.entity.config_entity import ModelTrainerConfig
+    monkeypatch.setattr(training, "init_mlflow_tracking", lambda **kwargs: None)
+
+    train_path = serving_dir / "artifacts" / "transform" / "process" / "train_processed.npy"
+    train_data = np.load(train_path, mmap_mode="r")
+    train_x, train_y = train_data[:, :-1], train_data[:, -1].astype(int)
+
+    def make_trainer(n_iter, workers=1, max_estimators=60):
+        return training.Trainer(ModelTrainerConfig(
+            root_dir=tmp_path, train_preprocess=train_path, test_preprocess=train_path, model_name="model.joblib",
+            target_column="Fraudulent", n_iter=n_iter, cv_folds=2, n_jobs=1, hpo_workers=workers,
+            hpo_storage=str(tmp_path / "journal.log"), max_estimators=max_estimators, early_stopping_rounds=5,
+        ))
+
+    study = make_trainer(2).optimize("XGBoost", train_x, train_y, "a" * 64)
+    assert len(study.trials) == 2
+    assert all(len(trial.intermediate_values) == 2 for trial in study.trials)
+    best_scores = study.best_trial.user_attrs["fold_scores"]
+    assert np.isclose(np.mean(best_scores), study.best_value)
+    assert training.fold_score_std(study.best_trial) == pytest.approx(np.std(best_scores))
+    assert all(1 <= n <= 60 for n in study.best_trial.user_attrs["fold_best_iterations"])
+    assert 1 <= training.final_n_estimators(study.best_trial, 60) <= 60
+
+    resumed = make_trainer(4, workers=2).optimize("XGBoost", train_x, train_y, "a" * 64)
+    assert resumed.study_name == study.study_name
+    finished = resumed.get_trials(states=training.FINISHED_STATES)
+    assert 4 <= len(finished) <= 5 and finished[0].params == study.trials[0].params
+
+    assert make_trainer(1, max_estimators=80)._study_name("XGBoost", "a" * 64) != study.study_name
+    fresh = make_trainer(1).optimize("XGBoost", train_x, train_y, "b" * 64)
+    assert fresh.study_name != resumed.study_name
+    assert fresh.trials[0].params == resumed.best_trial.params
+    assert fresh.trials[0].system_attrs.get("fixed_params") == resumed.best_trial.params
+
+
+def test_score_predictions_matches_sklearn_scorers():
+    """Scores computed from out-of-fold probabilities must equal sklearn's scorer on the fitted model."""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import get_scorer
+    from FraudGuard.utils.metrics import score_predictions
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(400, 4))
+    y = (X[:, 0] + rng.normal(scale=1.0, size=400) > 1).astype(int)
+    model = LogisticRegression().fit(X, y)
+    proba = model.predict_proba(X)[:, 1]
+
+    for scoring in ("f1", "recall", "accuracy", "roc_auc", "average_precision", "neg_log_loss"):
+        assert score_predictions(scoring, y, proba) == pytest.approx(get_scorer(scoring)(model, X, y))
+    with pytest.raises(ValueError):
+        score_predictions("r2", y, proba)
+
+
+@pytest.mark.parametrize("strategy", ["smote_tomek", "smote", "random_under", "class_weight", "none"])
+def test_rebalance_strategies(strategy, tmp_path):
+    """Every strategy balances (or weights) the minority class and reports its cost."""
+    from FraudGuard.utils.resampling import rebalance, update_rebalance_report
+    rng = np.random.default_rng(5)
+    X = pd.DataFrame(rng.normal(size=(500, 3)), columns=["a", "b", "c"])
+    y = pd.Series((rng.random(500) < 0.1).astype(int))
+
+    X_out, y_out, model_params, report = rebalance(X, y, strategy=strategy, n_jobs=2, working_memory_mb=1, trace_memory=True)
+    positives, negatives = int(y_out.sum()), int(len(y_out) - y_out.sum())
+    assert report["rows_after"] == len(X_out) == len(y_out)
+    assert report["seconds"] >= 0 and report["peak_memory_mb"] >= 0
+    assert report["memory_measure"] == "tracemalloc"
+    # Without tracemalloc the report still carries memory, from sampled RSS
+    untraced = rebalance(X, y, strategy=strategy, n_jobs=2)[3]
+    assert untraced["memory_measure"] == "rss" and untraced["peak_memory_mb"] >= 0
+    if strategy in ("class_weight", "none"):
+        assert len(y_out) == 500
+    else:
+        assert abs(positives - negatives) <= 0.1 * len(y_out)
+    if strategy == "class_weight":
+        assert model_params == {"scale_pos_weight": pytest.approx(negatives / positives)}
+    else:
+        assert model_params == {}
+
+    reports = update_rebalance_report(tmp_path / "report.json", report)
+    assert reports[strategy]["class_counts_before"] == {"0": int((y == 0).sum()), "1": int(y.sum())}
+
+
+def test_stage_cache_skips_unchanged_stage(tmp_path):
+    """A stage reruns only when its inputs, config or outputs change."""
+    from FraudGuard.utils.stage_cache import StageCache
+    source, output = tmp_path / "in.csv", tmp_path / "out.txt"
+    source.write_text("a,b\n1,2\n")
+    calls = []
+
+    def stage():
+        calls.append(1)
+        output.write_text(source.read_text().upper())
+        return len(calls)
+
+    def run(config):
+        cache = StageCache("demo", inputs=[source], config=config, code=[__file__], outputs=[output],
+                           cache_dir=tmp_path / "cache")
+        return cache.run(stage, load=lambda: "cached")
+
+    assert run({"alpha": 1}) == 1
+    assert run({"alpha": 1}) == "cached"
+    assert run({"alpha": 2}) == 2
+    source.write_text("a,b\n3,4\n")
+    assert run({"alpha": 2}) == 3
+    output.unlink()
+    assert run({"alpha": 2}) == 4
+    assert run({"alpha": 2}) == "cached" and len(calls) == 4
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """A moto-backed S3 bucket and a client for it."""
+    moto = pytest.importorskip("moto")
+    import boto3
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    monkeypatch.delenv("AWS_PROFILE", raising=False)
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="fraudguard")
+        yield client
+
+
+def test_s3_download_is_parallel_resumable_and_verified(s3_bucket, tmp_path, monkeypatch):
+    """Ranged parts reassemble the object, an interrupted download resumes, and multipart ETags verify."""
+    from boto3.s3.transfer import TransferConfig
+    from FraudGuard.utils.s3_transfer import S3Downloader, etag_is_content_md5, etag_matches
+    payload = np.random.default_rng(0).bytes(11 * 1024 * 1024 + 123)
+    source = tmp_path / "source.bin"
+    source.write_bytes(payload)
+    s3_bucket.upload_file(str(source), "fraudguard", "data/big.bin",
+                          Config=TransferConfig(multipart_threshold=5 * 2 ** 20, multipart_chunksize=5 * 2 ** 20))
+    assert s3_bucket.head_object(Bucket="fraudguard", Key="data/big.bin")["ETag"].endswith('-3"')
+
+    downloader = S3Downloader(client=s3_bucket, part_size=1024 * 1024, max_concurrency=4)
+    fetch_part = downloader._fetch_part
+    fetched = []
+
+    def flaky(bucket, key, start, end, etag):
+        if start >= 6 * 1024 * 1024:
+            raise IOError("connection reset")
+        fetched.append(start)
+        return fetch_part(bucket, key, start, end, etag)
+
+    target = tmp_path / "out" / "big.bin"
+    monkeypatch.setattr(downloader, "_fetch_part", flaky)
+    with pytest.raises(IOError):
+        downloader.download("fraudguard", "data/big.bin", target)
+    assert not target.exists() and (tmp_path / "out" / "big.bin.part.json").exists()
+
+    monkeypatch.setattr(downloader, "_fetch_part", lambda *args: fetched.append(args[2]) or fetch_part(*args))
+    downloader.download("fraudguard", "data/big.bin", target)
+    assert target.read_bytes() == payload
+    assert len(fetched) == 12 and len(set(fetched)) == 12
+    assert not (tmp_path / "out" / "big.bin.part").exists()
+
+    # SSE-KMS and SSE-C ETags are not MD5s: size-only verification instead of a false mismatch
+    assert etag_is_content_md5({"ServerSideEncryption": "AES256"})
+    assert not etag_is_content_md5({"ServerSideEncryption": "aws:kms"})
+    assert not etag_is_content_md5({"SSECustomerAlgorithm": "AES256"})
+    assert etag_matches(target, '"0123456789abcdef0123456789abcdef"', len(payload), content_md5=False) is None
+
+
+def test_ingestion_combines_partitions(s3_bucket, tmp_path):
+    """A prefix data_path downloads every partition in parallel and appends them under one header."""
+    from FraudGuard.components.ingestion import Ingestion
+    from FraudGuard.utils.s3_transfer import S3Downloader
+    from FraudGuard.entity.config_entity import DataIngestionConfig
+    from tests.conftest import make_transactions
+    data = make_transactions(90)
+    for day, part in enumerate(np.array_split(data, 3)):
+        s3_bucket.put_object(Bucket="fraudguard", Key=f"daily/2024-01-0{day + 1}.csv",
+                             Body=part.to_csv(index=False).encode())
+
+    config = DataIngestionConfig(root_dir=tmp_path, bucket="fraudguard", data_path="daily/",
+                                 download_data=tmp_path / "Fraud-data.csv")
+    Ingestion(config).download_file(downloader=S3Downloader(client=s3_bucket, part_size=1024, max_concurrency=3))
+    combined = pd.read_csv(tmp_path / "Fraud-data.csv")
+    pd.testing.assert_frame_equal(combined, data.reset_index(drop=True), check_dtype=False)
+    assert not (tmp_path / "partitions").exists()
+
+
+def test_streaming_validation_reports_every_violation(tmp_path):
+    """Chunked profiles match whole-file statistics and every failed check is listed."""
+    from tests.conftest import make_transactions, SCHEMA
+    data = make_transactions(500, seed=4)
+    data.loc[3, "Account_Age"] = -5
+    data.loc[7, "Time_of_Transaction"] = 30
+    data.loc[10:20, "Location"] = np.nan
+    data.loc[40, "Fraudulent"] = 2
+    data.to_csv(tmp_path / "data.csv", index=False)
+
+    config = DataValidationConfig(
+        root_dir=tmp_path, unzip_file=tmp_path / "data.csv", status_file=tmp_path / "status.json",
+        all_schema=SCHEMA["columns"], constraints=SCHEMA["constraints"], chunk_size=64, n_workers=3,
+    )
+    assert Validation(config).validation() is False
+
+    report = json.loads((tmp_path / "status.json").read_text())
+    assert report["rows"] == 500 and report["chunks"] == 8
+    assert report["checks"] == {"column_presence": True, "data_types": True, "constraints": False}
+    assert len(report["errors"]) == 3
+    amount = report["columns"]["Transaction_Amount"]
+    assert amount["mean"] == pytest.approx(data["Transaction_Amount"].mean())
+    assert amount["std"] == pytest.approx(data["Transaction_Amount"].std(ddof=0))
+    assert report["columns"]["Location"]["nulls"] == 11
+    assert report["columns"]["Device_Used"]["categories"] == sorted(data["Device_Used"].unique())
+    assert report["columns"]["Account_Age"]["below_min"] == 1
+    assert report["columns"]["Fraudulent"]["not_allowed"] == 1
+
+
+def test_drift_monitor_tracks_serving_inputs(serving_dir):
+    """Per-record and per-frame observation agree, unknowns are counted and shifted inputs raise PSI."""
+    import time
+    from tests.conftest import make_transactions
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    pipeline = PredictionPipeline(use_bundle=False)
+    monitor = pipeline.monitor
+    assert monitor is not None
+
+    raw = make_transactions(400, seed=9).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+    raw.loc[0, "Location"] = "Atlantis"
+    raw.loc[1, "Account_Age"] = 10_000
+    records = raw.to_dict(orient="records")
+
+    monitor.reset()
+    start = time.perf_counter()
+    for record in records:
+        monitor.observe_record(record)
+    per_record_us = (time.perf_counter() - start) / len(records) * 1e6
+    by_record = monitor.snapshot()
+
+    monitor.reset()
+    pipeline.predict_batch(raw)
+    by_frame = monitor.snapshot()
+    assert by_record == by_frame
+    # Without the pipeline's category codes the monitor looks the raw values up itself
+    monitor.reset()
+    monitor.observe_frame(raw)
+    assert monitor.snapshot() == by_frame
+    assert by_frame["rows"] == 400
+    assert by_frame["features"]["Location"]["unknown"] == 1
+    assert by_frame["features"]["Location"]["unknown_examples"] == ["Atlantis"]
+    assert by_frame["features"]["Account_Age"]["out_of_range"] >= 1
+    assert all(stats["psi"] < 0.2 for stats in by_frame["features"].values())
+    assert per_record_us < 200
+
+    monitor.reset()
+    shifted = raw.assign(Transaction_Amount=raw["Transaction_Amount"] * 5, Device_Used="Smartwatch")
+    pipeline.predict_records(shifted.to_dict(orient="records"))
+    drifted = monitor.snapshot()["drifted_features"]
+    assert "Transaction_Amount" in drifted and "Device_Used" in drifted
+
+
+def test_metrics_endpoint_exposes_stage_latency_and_outcomes(serving_dir):
+    """Serving calls feed the stage histograms and outcome counters rendered at /metrics."""
+    import logging
+    from fastapi.testclient import TestClient
+    from tests.conftest import make_transactions
+    from FraudGuard.utils.telemetry import Histogram, INFERENCE_LATENCY, PREDICTIONS
+    import app as app_module
+
+    histogram = Histogram("example_seconds", "Example.", labelnames=("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage="model")
+    lines = list(histogram.samples())
+    assert 'example_seconds_bucket{stage="model",le="0.1"} 1' in lines
+    assert 'example_seconds_bucket{stage="model",le="+Inf"} 3' in lines
+    assert 'example_seconds_count{stage="model"} 3' in lines
+
+    transactions = make_transactions(30, seed=4).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+    before = {stage: INFERENCE_LATENCY.count(endpoint="batch", stage=stage)
+              for stage in ("parse", "preprocess", "model", "postprocess", "total")}
+    scored_before = sum(PREDICTIONS.value(endpoint="batch", outcome=outcome) for outcome in ("fraud", "legit"))
+
+    with TestClient(app_module.app) as client:
+        # Serving logs through a background listener instead of writing on the request thread
+        assert any(type(handler).__name__ == "QueueHandler" for handler in logging.getLogger().handlers)
+        response = client.post("/predict/batch", json={"transactions": transactions.to_dict(orient="records")})
+        assert response.status_code == 200
+        assert client.get("/health").json()["status"] == "healthy"
+        scored_singles = INFERENCE_LATENCY.count(endpoint="predict", stage="score")
+        assert client.post("/predict", data=transactions.iloc[0].to_dict()).status_code == 200
+        assert INFERENCE_LATENCY.count(endpoint="predict", stage="score") == scored_singles + 1
+        metrics = client.get("/metrics")
+
+    assert not any(type(handler).__name__ == "QueueHandler" for handler in logging.getLogger().handlers)
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert "# TYPE fraudguard_inference_stage_seconds histogram" in metrics.text
+    assert 'fraudguard_predictions_total{endpoint="batch",outcome="legit"}' in metrics.text
+    for stage, count in before.items():
+        assert INFERENCE_LATENCY.count(endpoint="batch", stage=stage) == count + 1
+    scored = sum(PREDICTIONS.value(endpoint="batch", outcome=outcome) for outcome in ("fraud", "legit"))
+    assert scored - scored_before == len(transactions)
+
+
+def test_shap_stage_is_stratified_parallel_and_cached(serving_dir):
+    """Pooled SHAP values match in-process ones, fraud rows are sampled and reruns reuse the artifact."""
+    from FraudGuard.entity.config_entity import ModelExplanationConfig
+    from FraudGuard.components.explanation import Explanation, compute_shap_values, load_shap_values, stratified_sample_indices
+
+    y = np.array([0] * 950 + [1] * 50)
+    indices = stratified_sample_indices(y, sample_size=100, min_per_class=20)
+    assert len(np.unique(indices)) == len(indices)
+    assert (y[indices] == 1).sum() == 20 and (y[indices] == 0).sum() == 95
+
+    explain_dir = serving_dir / "artifacts" / "explanation"
+    config = ModelExplanationConfig(
+        root_dir=explain_dir,
+        test_preprocess=serving_dir / "artifacts/transform/process/test_processed.npy",
+        manifest_path=serving_dir / "artifacts/transform/process/manifest.json",
+        model_path=serving_dir / "artifacts/trainer/model.joblib",
+        shap_values_path=explain_dir / "shap_values.npz",
+        target_column="Fraudulent", sample_size=60, min_per_class=10, chunk_size=16, n_workers=2,
+    )
+    path = Explanation(config).run()
+    shap_data = load_shap_values(path)
+    assert shap_data["values"].shape == shap_data["X"].shape
+    assert len(shap_data["X"]) >= 60 and (shap_data["y"] == 1).sum() >= min(10, len(shap_data["y"]))
+
+    in_process, base_value = compute_shap_values(config.model_path, shap_data["X"], chunk_size=16, n_workers=1)
+    np.testing.assert_allclose(shap_data["values"], in_process, rtol=1e-5, atol=1e-6)
+    assert np.isclose(float(shap_data["base_value"]), base_value)
+
+    written = path.stat().st_mtime_ns
+    Explanation(config).run()
+    assert path.stat().st_mtime_ns == written
+
+
+@pytest.mark.parametrize("library", ["xgboost", "catboost"])
+def test_native_contributions_explain_the_probability(library):
+    """Contributions sum to the model's log-odds, top-k is ordered and repeat rows come from the cache."""
+    from FraudGuard.pipeline.explainer import NativeExplainer
+    rng = np.random.default_rng(5)
+    X = rng.normal(size=(300, 5)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0).astype(int)
+    if library == "xgboost":
+        from xgboost import XGBClassifier
+        model = XGBClassifier(n_estimators=30, max_depth=4, verbosity=0).fit(X, y)
+    else:
+        from catboost import CatBoostClassifier
+        model = CatBoostClassifier(n_estimators=30, depth=4, verbose=0, allow_writing_files=False).fit(X, y)
+
+    explainer = NativeExplainer(model, [f"f{i}" for i in range(5)], cache_size=100)
+    proba, contributions = explainer.contributions(X[:50])
+    assert np.allclose(proba, model.predict_proba(X[:50])[:, 1], atol=1e-5)
+
+    top = explainer.top_contributions(contributions, 3)
+    assert all(len(row) == 3 for row in top)
+    magnitudes = [abs(item["contribution"]) for item in top[0]]
+    assert magnitudes == sorted(magnitudes, reverse=True)
+    assert magnitudes[0] == np.abs(contributions[0, :-1]).max()
+
+    misses = explainer.cache.misses
+    again, _ = explainer.contributions(X[40:60])
+    assert explainer.cache.hits == 10 and explainer.cache.misses == misses + 10
+    assert np.allclose(again[:10], proba[40:])
+
+
+def test_batch_endpoint_returns_explanations_within_budget(serving_dir):
+    """explain=true adds top-k contributions per row without changing the decisions."""
+    import time
+    from tests.conftest import make_transactions
+    from FraudGuard.pipeline.inference_pipeline import PredictionPipeline
+    pipeline = PredictionPipeline()
+    transactions = make_transactions(200, seed=6).drop(columns=["Transaction_ID", "User_ID", "Fraudulent"])
+
+    plain = pipeline.predict_batch(transactions)
+    explained = pipeline.predict_batch(transactions, top_k=3)
+    assert [r["fraud_status"] for r in plain] == [r["fraud_status"] for r in explained]
+    assert np.allclose([r["fraud_probability"] for r in plain], [r["fraud_probability"] for r in explained], atol=1e-5)
+    assert all(len(r["top_contributions"]) == 3 for r in explained)
+    assert {item["feature"] for r in explained for item in r["top_contributions"]} <= set(pipeline._feature_names())
+
+    records = transactions.to_dict(orient="records")
+    pipeline.explainer.cache = type(pipeline.explainer.cache)(maxsize=0)
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        pipeline.predict_records([record], top_k=3)
+        latencies.append(time.perf_counter() - start)
+    assert np.percentile(latencies, 99) * 1000 < 10 * pipeline.explainer.budget_ms
+
+
+@pytest.mark.parametrize("threshold", [0.37, 0.5])
+def test_single_pass_metrics_match_sklearn(threshold):
+    """Metrics derived from one sorted pass agree with sklearn's per-metric functions."""
+    from sklearn import metrics as skm
+    from sklearn.calibration import calibration_curve
+    from FraudGuard.utils.metrics import calibration_bins, evaluate_scores
+    rng = np.random.default_rng(11)
+    y = (rng.random(2000) < 0.15).astype(int)
+    scores = np.round(np.clip(y * 0.35 + rng.random(2000) * 0.65, 0, 1), 3)
+    predicted = (scores >= threshold).astype(int)
+
+    result = evaluate_scores(y, scores, threshold=threshold)
+    metrics = result["metrics"]
+    assert list(result["confusion_matrix"].values()) == skm.confusion_matrix(y, predicted).ravel().tolist()
+    assert np.isclose(metrics["accuracy"], skm.accuracy_score(y, predicted))
+    for average in ("weighted", "macro"):
+        assert np.isclose(metrics[f"precision_{average}"], skm.precision_score(y, predicted, average=average))
+        assert np.isclose(metrics[f"recall_{average}"], skm.recall_score(y, predicted, average=average))
+        assert np.isclose(metrics[f"f1_{average}"], skm.f1_score(y, predicted, average=average))
+    assert np.isclose(metrics["f1"], skm.f1_score(y, predicted))
+    assert np.isclose(metrics["auc"], skm.roc_auc_score(y, scores))
+    assert np.isclose(metrics["average_precision"], skm.average_precision_score(y, scores))
+    assert np.isclose(metrics["brier_score"], skm.brier_score_loss(y, scores))
+
+    # Unrounded scores: sklearn puts values on a bin edge in the lower bin, calibration_bins in the upper one
+    raw = np.clip(y * 0.35 + rng.random(2000) * 0.65, 0, 1)
+    fraction_positive, mean_predicted = calibration_curve(y, raw, n_bins=10)
+    bins = calibration_bins(y, raw, n_bins=10)["bins"]
+    assert np.allclose([b["fraction_positive"] for b in bins], fraction_positive)
+    assert np.allclose([b["mean_predicted"] for b in bins], mean_predicted)
+
+
+def test_replay_scores_raw_holdout_through_serving_path(serving_dir):
+    """Decoded holdout rows scored by the serving path agree with the offline scores and are timed per stage."""
+    import joblib
+    from FraudGuard.components.evaluation import replay_holdout
+    from FraudGuard.utils.metrics import evaluate_scores
+    transform_dir = serving_dir / "artifacts" / "transform"
+    manifest = json.loads((transform_dir / "process" / "manifest.json").read_text())
+    test_data = np.load(transform_dir / "process" / "test_processed.npy")
+    target_index = manifest["columns"].index("Fraudulent")
+    model = joblib.load(serving_dir / "artifacts" / "trainer" / "model.joblib")
+    offline = model.predict_proba(np.delete(test_data, target_index, axis=1))[:, 1]
+
+    report = replay_holdout(
+        transform_dir / "split" / "test.parquet", transform_dir / "preprocess" / "label_encoders.pkl",
+        "Fraudulent", chunk_rows=37, offline_proba=offline,
+    )
+    assert report["rows"] == len(test_data)
+    assert report["max_probability_gap"] < 1e-4
+    assert report["rows_per_second"] > 0
+    assert set(report["stage_seconds"]) == {"decode", "preprocess", "model", "postprocess"}
+    assert all(seconds > 0 for seconds in report["stage_seconds"].values())
+    expected = evaluate_scores(test_data[:, target_index].astype(int), offline, threshold=0.4)["metrics"]
+    assert report["metrics"]["f1_weighted"] == pytest.approx(expected["f1_weighted"])
+
+
+def test_benchmark_data_follows_schema_and_regressions_are_flagged():
+    """Synthetic benchmark data honours schema.yaml, and slowdowns beyond the tolerance are reported."""
+    from benchmarks.synthetic import make_synthetic_transactions
+    from benchmarks.run_benchmarks import compare_results
+    from tests.conftest import SCHEMA
+    data = make_synthetic_transactions(SCHEMA, 5000, seed=3)
+    assert list(data.columns) == list(SCHEMA["columns"])
+    for column, limits in SCHEMA["constraints"].items():
+        if "min" in limits:
+            assert data[column].min() >= limits["min"]
+        if "max" in limits:
+            assert data[column].max() <= limits["max"]
+        if "allowed" in limits:
+            assert set(data[column].unique()) <= set(limits["allowed"])
+    assert 0.01 < data[SCHEMA["target_column"]["name"]].mean() < 0.2
+    assert data["Transaction_ID"].is_unique
+
+    baseline = {
+        "predict_latency_p99_ms": {"value": 10.0, "unit": "ms", "better": "lower"},
+        "batch_100_rows_per_second": {"value": 8000.0, "unit": "rows/s", "better": "higher"},
+        "peak_rss_mb": {"value": 400.0, "unit": "MB", "better": "lower"},
+    }
+    current = {
+        "predict_latency_p99_ms": {"value": 14.0, "unit": "ms", "better": "lower"},
+        "batch_100_rows_per_second": {"value": 5000.0, "unit": "rows/s", "better": "higher"},
+        "peak_rss_mb": {"value": 420.0, "unit": "MB", "better": "lower"},
+        "hpo_trial_seconds": {"value": 3.0, "unit": "s", "better": "lower"},
+    }
+    regressions = compare_results(current, baseline, tolerance=0.25)
+    assert [r["name"] for r in regressions] == ["predict_latency_p99_ms", "batch_100_rows_per_second"]
+    assert compare_results(current, current) == []